@@ -0,0 +1,117 @@
+# analytics_pipeline.py
+import queue
+import threading
+from datetime import datetime
+
+class AnalyticsPipeline:
+    """In-process queue of analytics events flushed to MongoDB in batches
+
+    `publish` never blocks the caller: events go onto a bounded queue and a
+    background thread writes them with one insert_many per batch. When the
+    queue is full the event is dropped and counted rather than slowing the
+    request down. Analytics are informational, so a batch that fails to
+    write is counted as failed and not retried.
+    """
+
+    def __init__(self, sink, max_queue_size=10000, batch_size=200, flush_interval=2.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._counter_lock = threading.Lock()
+
+        self.published = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error = None
+
+    def publish(self, event_type, user_id=None, product_id=None, metadata=None, timestamp=None):
+        """Queue an analytics event; returns False if it had to be dropped"""
+        event = {
+            'event_type': event_type,
+            'user_id': user_id,
+            'product_id': product_id,
+            'timestamp': timestamp or datetime.now(),
+            'metadata': metadata or {}
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+            return False
+
+        with self._counter_lock:
+            self.published += 1
+        return True
+
+    def _take_batch(self, timeout):
+        """Block up to `timeout` for the first event, then take what is ready"""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.sink(batch)
+            with self._counter_lock:
+                self.flushed += len(batch)
+                self.batches += 1
+        except Exception as e:
+            with self._counter_lock:
+                self.failed += len(batch)
+                self.last_error = str(e)
+            print(f"❌ Analytics flush failed, {len(batch)} events lost: {e}")
+
+    def flush(self):
+        """Synchronously write everything currently queued"""
+        while True:
+            batch = self._take_batch(timeout=0)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._take_batch(timeout=self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='analytics-pipeline', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                'published': self.published,
+                'dropped': self.dropped,
+                'flushed': self.flushed,
+                'failed': self.failed,
+                'batches': self.batches,
+                'queued': self._queue.qsize(),
+                'last_error': self.last_error,
+                'running': self._thread is not None and self._thread.is_alive()
+            }
@@ -0,0 +1,108 @@
+# ann_index.py
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from topk import top_k_indices
+
+class RandomProjectionLSH:
+    """Approximate cosine nearest neighbours by random-hyperplane hashing
+
+    Each of `n_tables` tables hashes a vector to the sign pattern of its
+    projection on `n_bits` random hyperplanes, so similar vectors tend to
+    share a bucket. Buckets are stored as one sorted code array and one
+    row-order array per table (no Python dicts), found with searchsorted.
+    A query reranks the union of its buckets, plus the buckets one bit
+    away when that is too small, by exact cosine similarity.
+
+    Memory is the float32 vectors plus 2 x n_tables integers per row,
+    against N x N floats for a full similarity matrix. Accepts dense
+    arrays or scipy sparse matrices.
+    """
+
+    def __init__(self, vectors, n_tables=8, n_bits=None, bucket_size=16, seed=42, chunk_size=100_000):
+        self.vectors = normalize(vectors.astype(np.float32) if sparse.issparse(vectors)
+                                 else np.asarray(vectors, dtype=np.float32))
+        n_rows, n_features = self.vectors.shape
+        if n_bits is None:
+            n_bits = int(np.clip(np.round(np.log2(max(n_rows, 1) / bucket_size)), 1, 24))
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.chunk_size = chunk_size
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_features, n_tables * n_bits)).astype(np.float32)
+        self._weights = (1 << np.arange(n_bits)).astype(np.int32)
+
+        codes = np.concatenate([
+            self._hash(self.vectors[start:start + chunk_size])
+            for start in range(0, n_rows, chunk_size)
+        ]) if n_rows else np.empty((0, n_tables), dtype=np.int32)
+
+        self.orders = np.empty((n_tables, n_rows), dtype=np.int32)
+        self.codes = np.empty((n_tables, n_rows), dtype=np.int32)
+        for table in range(n_tables):
+            order = np.argsort(codes[:, table], kind='stable')
+            self.orders[table] = order
+            self.codes[table] = codes[order, table]
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def _hash(self, vectors):
+        """Bucket code of each row in every table, shape (rows, n_tables)"""
+        projected = np.asarray(vectors @ self.planes)
+        bits = (projected > 0).reshape(-1, self.n_tables, self.n_bits)
+        return bits.astype(np.int32) @ self._weights
+
+    def _bucket(self, table, code):
+        codes = self.codes[table]
+        lo = np.searchsorted(codes, code, side='left')
+        hi = np.searchsorted(codes, code, side='right')
+        return self.orders[table, lo:hi]
+
+    def _candidates(self, codes, wanted, probe):
+        buckets = [self._bucket(table, code) for table, code in enumerate(codes)]
+        candidates = np.unique(np.concatenate(buckets))
+        if len(candidates) < wanted and probe:
+            # Multi-probe: also look in every bucket one hyperplane away
+            buckets += [self._bucket(table, code ^ (1 << bit))
+                        for table, code in enumerate(codes) for bit in range(self.n_bits)]
+            candidates = np.unique(np.concatenate(buckets))
+        return candidates
+
+    def _similarities(self, rows, query):
+        scores = self.vectors[rows] @ query.T
+        return np.asarray(scores.todense() if sparse.issparse(scores) else scores).ravel()
+
+    def query(self, vector, k=5, exclude=None, probe=True):
+        """Up to k (row, cosine similarity) pairs most similar to `vector`, best first"""
+        query = normalize(vector.astype(np.float32) if sparse.issparse(vector)
+                          else np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        wanted = k + (1 if exclude is not None else 0)
+        candidates = self._candidates(self._hash(query)[0], wanted, probe)
+
+        if len(candidates) < wanted:
+            # Too few neighbours hash nearby; fall back to an exact scan
+            candidates = np.arange(len(self))
+
+        scores = self._similarities(candidates, query)
+        top = top_k_indices(scores, k, exclude=candidates == exclude if exclude is not None else None)
+        return list(zip(candidates[top].tolist(), scores[top].tolist()))
+
+    def query_row(self, row, k=5, probe=True):
+        """Neighbours of an indexed row, excluding the row itself"""
+        return self.query(self.vectors[row], k, exclude=row, probe=probe)
+
+    def exact_query_row(self, row, k=5):
+        """Brute-force neighbours of an indexed row, for measuring recall"""
+        scores = self._similarities(np.arange(len(self)), self.vectors[row])
+        top = top_k_indices(scores, k, exclude=[row])
+        return list(zip(top.tolist(), scores[top].tolist()))
+
+    def memory_bytes(self):
+        vectors = self.vectors
+        if sparse.issparse(vectors):
+            vector_bytes = vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes
+        else:
+            vector_bytes = vectors.nbytes
+        return vector_bytes + self.orders.nbytes + self.codes.nbytes + self.planes.nbytes
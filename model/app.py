@@ -11,6 +11,16 @@ import os
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from functools import wraps
+import atexit
+import threading
+from interaction_spool import InteractionSpool
+from analytics_pipeline import AnalyticsPipeline
+from derived_fields import DerivedFieldRefresher
+from expiry_index import ExpiryIndex, ExpiryRollover
+from pricing import calculate_urgency_score, calculate_discount, urgency_score_for_days, price_catalog
+from markdown_optimizer import run_markdown_job
+from sell_through import SellThroughEstimator
+from interaction_log import ACTION_TYPES
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
@@ -25,6 +35,21 @@ from dotenv import load_dotenv
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 
+# Repeated events of these actions for the same user and product are merged
+# into one document (with a count) when they fall inside the window
+app.config['INTERACTION_COALESCE_WINDOWS'] = {
+    'viewed': timedelta(seconds=int(os.getenv('VIEW_COALESCE_SECONDS', 1800)))
+}
+# Interactions are appended to this local spool and written to MongoDB in the
+# background; set INTERACTION_SPOOL_DIR to an empty string to write directly
+app.config['INTERACTION_SPOOL_DIR'] = os.getenv(
+    'INTERACTION_SPOOL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool')
+)
+app.config['INTERACTION_SPOOL_FSYNC'] = os.getenv('INTERACTION_SPOOL_FSYNC', 'false').lower() == 'true'
+# How often stored days_to_expiry/urgency_score/discount are brought up to date
+app.config['DERIVED_REFRESH_INTERVAL'] = timedelta(seconds=int(os.getenv('DERIVED_REFRESH_SECONDS', 3600)))
+
 # MongoDB remote connection string
 MONGO_URI = MONGODB_URI
 # Replace with your actual MongoDB Atlas connection string
@@ -39,6 +64,10 @@ try:
     users_collection = db['users']
     recommendations_collection = db['recommendations']
     analytics_collection = db['analytics']
+    markdown_proposals_collection = db['markdown_proposals']
+    sell_through_collection = db['sell_through']
+    
+    sell_through = SellThroughEstimator(sell_through_collection)
     
     print("✅ Connected to MongoDB successfully!")
 except Exception as e:
@@ -66,26 +95,287 @@ def serialize_doc(doc):
     
     return doc
 
-def calculate_urgency_score(expiry_date):
-    """Calculate urgency score based on expiry date"""
-    if isinstance(expiry_date, str):
-        expiry_date = datetime.fromisoformat(expiry_date.replace('Z', '+00:00'))
-    
-    days_to_expiry = (expiry_date - datetime.now()).days
-    urgency_score = max(0, (30 - days_to_expiry) / 30)
-    return urgency_score, days_to_expiry
-
-def calculate_discount(days_to_expiry):
-    """Calculate discount based on days to expiry"""
-    if days_to_expiry <= 3:
-        return 0.4  # 40% off
-    elif days_to_expiry <= 7:
-        return 0.3  # 30% off
-    elif days_to_expiry <= 14:
-        return 0.2  # 20% off
-    elif days_to_expiry <= 30:
-        return 0.1  # 10% off
-    return 0
+# The interaction log weights every action the API accepts
+VALID_ACTIONS = ACTION_TYPES
+MAX_INTERACTION_BATCH = 500
+
+# Ids of the last batches that sold a product, kept on the product so a batch can
+# tell which of its guarded decrements applied; capped, and never sent to clients
+STOCK_BATCH_HISTORY = 20
+PRODUCT_PROJECTION = {'stock_batches': 0}
+
+def validate_interaction(data):
+    """Return an error message for an invalid interaction payload, else None"""
+    if not isinstance(data, dict):
+        return 'Interaction must be an object'
+
+    required_fields = ['userId', 'productId', 'actionType']
+    if not all(field in data for field in required_fields):
+        return 'Missing required interaction fields'
+
+    if data['actionType'] not in VALID_ACTIONS:
+        return f'Invalid actionType. Must be one of: {VALID_ACTIONS}'
+
+    if data['actionType'] == 'bought':
+        quantity = data.get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return 'quantity must be a positive integer'
+
+    return None
+
+def build_interaction_doc(data, timestamp):
+    """Build the interactions collection document for a validated payload"""
+    return {
+        'userId': data['userId'],
+        'productId': data['productId'],
+        'actionType': data['actionType'],
+        'quantity': data.get('quantity', 1) if data['actionType'] == 'bought' else None,
+        'timestamp': timestamp,
+        'session_id': data.get('session_id'),
+        'metadata': data.get('metadata', {})
+    }
+
+def coalesce_window(action_type):
+    """Return the coalescing window for an action, or None if it is never merged"""
+    window = app.config['INTERACTION_COALESCE_WINDOWS'].get(action_type)
+    return window if window and window.total_seconds() > 0 else None
+
+def coalesce_update(doc, window, count=1, last_timestamp=None, event_ids=None):
+    """Build the (filter, update) pair that merges doc into a recent matching event
+
+    `event_ids` (the spooled ids of the merged events) are recorded on the
+    stored document so a replay can tell which events it already holds.
+    """
+    key_fields = ('userId', 'productId', 'actionType')
+    query = {field: doc[field] for field in key_fields}
+    query['timestamp'] = {'$gte': doc['timestamp'] - window}
+
+    on_insert = {k: v for k, v in doc.items() if k not in key_fields and k != 'updated_at'}
+    update = {
+        '$inc': {'count': count},
+        '$set': {'last_timestamp': last_timestamp or doc['timestamp'], 'updated_at': datetime.now()},
+        '$setOnInsert': on_insert
+    }
+    if event_ids:
+        update['$addToSet'] = {'event_ids': {'$each': event_ids}}
+    return query, update
+
+def record_interaction(doc):
+    """Store one interaction, merging it into a recent duplicate when coalescing applies
+
+    Returns (interaction_id, coalesced).
+    """
+    window = coalesce_window(doc['actionType'])
+    if window is None:
+        # Stamped at write time: the snapshot cache picks up new interactions by updated_at
+        doc['updated_at'] = datetime.now()
+        result = interactions_collection.insert_one(doc)
+        return str(result.inserted_id), False
+
+    query, update = coalesce_update(doc, window)
+    stored = interactions_collection.find_one_and_update(
+        query, update,
+        projection={'_id': 1, 'count': 1},
+        upsert=True,
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    return str(stored['_id']), stored.get('count', 1) > 1
+
+def record_interactions(docs, track_events=False):
+    """Store many interactions with at most one bulk_write and one insert_many
+
+    Coalescable events are first collapsed within the batch, then merged into
+    recent duplicates with upserts. Returns one (interaction_id, coalesced)
+    pair per doc; the id is None when an event was merged into an existing one.
+    With track_events, the `_id`s of merged docs are kept in the stored
+    document's event_ids.
+    """
+    outcomes = [None] * len(docs)
+    plain = []
+    group_positions = []
+    open_groups = {}
+
+    for position, doc in enumerate(docs):
+        window = coalesce_window(doc['actionType'])
+        if window is None:
+            plain.append(position)
+            continue
+
+        # Events further apart than the window start a new group
+        key = (doc['userId'], doc['productId'], doc['actionType'])
+        group = open_groups.get(key)
+        if group is None or doc['timestamp'] - docs[group[0]]['timestamp'] > window:
+            group = []
+            open_groups[key] = group
+            group_positions.append(group)
+        group.append(position)
+
+    if group_positions:
+        operations = []
+        for positions in group_positions:
+            doc = docs[positions[0]]
+            event_ids = [docs[p]['_id'] for p in positions] if track_events else None
+            query, update = coalesce_update(doc, coalesce_window(doc['actionType']),
+                                            len(positions), docs[positions[-1]]['timestamp'], event_ids)
+            operations.append(pymongo.UpdateOne(query, update, upsert=True))
+
+        # Ordered, so a later group can merge into the document an earlier one created
+        bulk_result = interactions_collection.bulk_write(operations, ordered=True)
+        upserted_ids = bulk_result.upserted_ids or {}
+
+        for op_index, positions in enumerate(group_positions):
+            inserted_id = upserted_ids.get(op_index)
+            for n, position in enumerate(positions):
+                if n == 0 and inserted_id is not None:
+                    outcomes[position] = (str(inserted_id), False)
+                else:
+                    outcomes[position] = (None, True)
+
+    if plain:
+        # Stamped at write time, not when the doc was built: spooled docs are written
+        # long after their _id was assigned, and the snapshot cache watermarks updated_at
+        now = datetime.now()
+        for p in plain:
+            docs[p]['updated_at'] = now
+        insert_result = interactions_collection.insert_many([docs[p] for p in plain], ordered=False)
+        for position, inserted_id in zip(plain, insert_result.inserted_ids):
+            outcomes[position] = (str(inserted_id), False)
+
+    return outcomes
+
+def write_spooled_interactions(docs):
+    """Spool sink: store a replayed batch, skipping events that were already written
+
+    Plain events are inserted under their spooled `_id`. Coalesced events add
+    their `_id` to the merged document's event_ids, so the interactionId
+    returned for a queued event finds it by either field, and a replay skips
+    events whose ids are already there instead of counting them again.
+    """
+    plain = [doc for doc in docs if coalesce_window(doc['actionType']) is None]
+    merged = [doc for doc in docs if coalesce_window(doc['actionType']) is not None]
+
+    if plain:
+        try:
+            record_interactions(plain)
+        except pymongo.errors.BulkWriteError as e:
+            # Spooled docs carry their own _id, so duplicates are earlier deliveries
+            if e.details.get('writeConcernErrors') or any(
+                err.get('code') != 11000 for err in e.details.get('writeErrors', [])
+            ):
+                raise
+    if merged:
+        applied = {
+            event_id
+            for stored in interactions_collection.find(
+                {'event_ids': {'$in': [doc['_id'] for doc in merged]}}, {'event_ids': 1}
+            )
+            for event_id in stored['event_ids']
+        }
+        merged = [doc for doc in merged if doc['_id'] not in applied]
+        if merged:
+            record_interactions(merged, track_events=True)
+
+interaction_spool = None
+_spool_lock = threading.Lock()
+
+def get_interaction_spool():
+    """Return the interaction spool, starting its drainer on first use
+
+    Started lazily so that only a process that actually serves requests
+    (not e.g. the debug reloader's parent) drains the spool directory.
+    """
+    global interaction_spool
+    if not app.config['INTERACTION_SPOOL_DIR']:
+        return None
+
+    with _spool_lock:
+        if interaction_spool is None:
+            interaction_spool = InteractionSpool(
+                app.config['INTERACTION_SPOOL_DIR'],
+                write_spooled_interactions,
+                fsync=app.config['INTERACTION_SPOOL_FSYNC']
+            ).start()
+            atexit.register(interaction_spool.stop)
+    return interaction_spool
+
+analytics_pipeline = None
+_analytics_lock = threading.Lock()
+
+def publish_analytics(event_type, user_id=None, product_id=None, metadata=None):
+    """Queue an analytics event without waiting for MongoDB"""
+    global analytics_pipeline
+    with _analytics_lock:
+        if analytics_pipeline is None:
+            analytics_pipeline = AnalyticsPipeline(
+                lambda events: analytics_collection.insert_many(events, ordered=False)
+            ).start()
+            atexit.register(analytics_pipeline.stop)
+    return analytics_pipeline.publish(event_type, user_id, product_id, metadata)
+
+derived_refresher = None
+_refresher_lock = threading.Lock()
+
+def get_derived_refresher():
+    """Return the derived-field refresher, starting its schedule on first use"""
+    global derived_refresher
+    with _refresher_lock:
+        if derived_refresher is None:
+            derived_refresher = DerivedFieldRefresher(
+                products_collection, app.config['DERIVED_REFRESH_INTERVAL']
+            ).start()
+            atexit.register(derived_refresher.stop)
+    return derived_refresher
+
+def stored_derived_fields_fresh():
+    """True when stored derived product fields are current enough to serve as-is"""
+    return get_derived_refresher().is_fresh()
+
+def record_sell_through(sales):
+    """Fold completed sales into the sell-through rates; never fails the sale itself"""
+    try:
+        sell_through.record_sales(sales)
+    except Exception as e:
+        print(f"⚠️ Sell-through update failed: {e}")
+
+expiry_index = None
+expiry_rollover = None
+_expiry_index_lock = threading.Lock()
+
+def publish_expiry_rollover(changes, now):
+    """Write re-scored products to MongoDB and drop cached recommendations that used old tiers"""
+    operations = []
+    for product_id, days_to_expiry in changes.rescored.items():
+        discount = calculate_discount(days_to_expiry)
+        operations.append(pymongo.UpdateOne({'productId': product_id}, [{'$set': {
+            'days_to_expiry': days_to_expiry,
+            'urgency_score': urgency_score_for_days(days_to_expiry),
+            'discount': discount,
+            'discounted_price': {'$multiply': ['$price', 1 - discount]},
+            'derived_at': now
+        }}]))
+
+    for i in range(0, len(operations), 1000):
+        products_collection.bulk_write(operations[i:i + 1000], ordered=False)
+
+    if changes.retiered:
+        recommendations_collection.delete_many({'recommendations': {'$in': list(changes.retiered)}})
+
+def get_expiry_index():
+    """Return the in-process expiry index, loading it and starting daily rollover on first use"""
+    global expiry_index, expiry_rollover
+    with _expiry_index_lock:
+        if expiry_index is None:
+            index = ExpiryIndex()
+            for product in products_collection.find(
+                {'status': 'active', 'expiryDate': {'$exists': True}},
+                {'productId': 1, 'expiryDate': 1}
+            ):
+                index.add(product['productId'], product['expiryDate'])
+
+            expiry_rollover = ExpiryRollover(index, publish_expiry_rollover).start()
+            atexit.register(expiry_rollover.stop)
+            expiry_index = index
+    return expiry_index
 
 # Authentication decorator
 def token_required(f):
@@ -190,6 +480,8 @@ def login():
             'exp': datetime.utcnow() + app.config['JWT_EXPIRATION_DELTA']
         }, app.config['SECRET_KEY'])
         
+        publish_analytics('user_login', user_id=str(user['_id']), metadata={'role': user['role']})
+        
         return jsonify({
             'message': 'Login successful',
             'token': token,
@@ -247,17 +539,13 @@ def add_product(current_user):
         }
         
         result = products_collection.insert_one(product_doc)
+        if expiry_index is not None:
+            expiry_index.add(product_doc['productId'], expiry_date)
         
         # Log analytics
-        analytics_collection.insert_one({
-            'event_type': 'product_added',
-            'user_id': str(current_user['_id']),
-            'product_id': product_doc['productId'],
-            'timestamp': datetime.now(),
-            'metadata': {
-                'category': data['category'],
-                'price': data['price']
-            }
+        publish_analytics('product_added', str(current_user['_id']), product_doc['productId'], {
+            'category': data['category'],
+            'price': data['price']
         })
         
         return jsonify({
@@ -281,6 +569,8 @@ def get_products():
         skip = int(request.args.get('skip', 0))
         urgent_only = request.args.get('urgent_only', 'false').lower() == 'true'
         discount_only = request.args.get('discount_only', 'false').lower() == 'true'
+        # Decided before querying so filters and returned values agree
+        trust_stored = stored_derived_fields_fresh()
         
         print(f"🔍 Fetching products from MongoDB...")
         print(f"Database: {db.name}")
@@ -333,23 +623,24 @@ def get_products():
         sort_criteria = sort_options.get(sort_by, [('urgency_score', -1)])
         
         # Execute query
-        products = list(products_collection.find(query)
+        products = list(products_collection.find(query, PRODUCT_PROJECTION)
                        .sort(sort_criteria)
                        .skip(skip)
                        .limit(limit))
         
         print(f"✅ Found {len(products)} products in database")
         
-        # Update calculated fields for current time
-        for product in products:
-            if 'expiryDate' in product:
-                urgency_score, days_to_expiry = calculate_urgency_score(product['expiryDate'])
-                discount = calculate_discount(days_to_expiry)
+        # Stored values can be trusted while the refresh job keeps them current
+        if not trust_stored:
+            for product in products:
+                if 'expiryDate' in product:
+                    urgency_score, days_to_expiry = calculate_urgency_score(product['expiryDate'])
+                    discount = calculate_discount(days_to_expiry)
                 
-                product['urgency_score'] = urgency_score
-                product['days_to_expiry'] = days_to_expiry
-                product['discount'] = discount
-                product['discounted_price'] = product['price'] * (1 - discount)
+                    product['urgency_score'] = urgency_score
+                    product['days_to_expiry'] = days_to_expiry
+                    product['discount'] = discount
+                    product['discounted_price'] = product['price'] * (1 - discount)
         
         # Get total count
         total_count = products_collection.count_documents(query)
@@ -370,6 +661,74 @@ def get_products():
         print(f"❌ Error in get_products: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/products/refresh-derived', methods=['GET', 'POST'])
+@token_required
+def refresh_derived(current_user):
+    """Report on, or with POST immediately run, the derived-field refresh job"""
+    try:
+        refresher = get_derived_refresher()
+        if request.method == 'POST':
+            summary = refresher.run_once()
+            return jsonify({'message': f"Refreshed {summary['modified']} products", **serialize_doc(summary)})
+        return jsonify(refresher.stats())
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/markdowns/optimize', methods=['POST'])
+@token_required
+def optimize_markdowns(current_user):
+    """Run the markdown optimizer over the catalogue and store its proposals for review"""
+    if not current_user or current_user.get('role') != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    try:
+        data = request.json or {}
+        max_discount = data.get('max_discount')
+        summary = run_markdown_job(
+            products_collection, interactions_collection, markdown_proposals_collection,
+            sell_through=sell_through,
+            lookback_days=int(data.get('lookback_days', 28)),
+            elasticity=float(data.get('elasticity', 2.0)),
+            max_discount=float(max_discount) if max_discount is not None else None
+        )
+        return jsonify({'message': f"Proposed {summary['proposals']} markdowns", **serialize_doc(summary)}), 201
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/markdowns/proposals', methods=['GET'])
+def get_markdown_proposals():
+    """Proposals from one optimizer run (the latest by default), largest revenue gain first"""
+    try:
+        run_id = request.args.get('run_id')
+        limit = int(request.args.get('limit', 50))
+        skip = int(request.args.get('skip', 0))
+        
+        if not run_id:
+            latest = markdown_proposals_collection.find_one({}, {'run_id': 1}, sort=[('created_at', -1)])
+            if not latest:
+                return jsonify({'proposals': [], 'run_id': None, 'total_count': 0})
+            run_id = latest['run_id']
+        
+        query = {'run_id': run_id}
+        if request.args.get('status'):
+            query['status'] = request.args.get('status')
+        if request.args.get('category'):
+            query['category'] = request.args.get('category')
+        
+        total_count = markdown_proposals_collection.count_documents(query)
+        proposals = list(markdown_proposals_collection.find(query).sort([('expected_revenue', -1)]).skip(skip).limit(limit))
+        
+        return jsonify({
+            'proposals': serialize_doc(proposals),
+            'run_id': run_id,
+            'total_count': total_count
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Add endpoint to check database status
 @app.route('/api/database/status', methods=['GET'])
 def database_status():
@@ -434,46 +793,37 @@ def populate_database():
             'First Aid': ['Bandages', 'Antiseptic', 'Pain Killer', 'Cough Syrup', 'Fever Reducer', 'Allergy Medicine']
         }
         
+        n_products = 100
+        chosen_categories = np.random.choice(categories, n_products)
+        days_to_expiry = np.random.randint(1, 180, n_products)
+        prices = np.round(np.random.uniform(5, 100, n_products), 2)
+        now = datetime.utcnow()
+        
+        # Calculate discount based on expiry for the whole batch at once
+        pricing = price_catalog(prices, days=days_to_expiry)
+        
         sample_products = []
         
-        for i in range(100):
-            category = np.random.choice(categories)
+        for i in range(n_products):
+            category = chosen_categories[i]
             product_name = np.random.choice(product_names[category])
             
-            days_to_expiry = np.random.randint(1, 180)
-            expiry_date = datetime.utcnow() + timedelta(days=days_to_expiry)
-            price = round(np.random.uniform(5, 100), 2)
-            
-            # Calculate discount based on expiry
-            if days_to_expiry <= 3:
-                discount = 0.4
-            elif days_to_expiry <= 7:
-                discount = 0.3
-            elif days_to_expiry <= 14:
-                discount = 0.2
-            elif days_to_expiry <= 30:
-                discount = 0.1
-            else:
-                discount = 0
-            
-            urgency_score = max(0, (30 - days_to_expiry) / 30)
-            
             product = {
                 'productId': f'PROD_{i+1:04d}',
                 'name': f'{product_name} {np.random.choice(["Premium", "Classic", "Advanced", "Pro", "Ultra"])}',
-                'category': category,
-                'price': price,
-                'discounted_price': round(price * (1 - discount), 2),
-                'discount': discount,
-                'expiryDate': expiry_date,
+                'category': str(category),
+                'price': float(prices[i]),
+                'discounted_price': round(float(pricing['discounted_price'][i]), 2),
+                'discount': float(pricing['discount'][i]),
+                'expiryDate': now + timedelta(days=int(days_to_expiry[i])),
                 'stock': np.random.randint(0, 100),
-                'days_to_expiry': days_to_expiry,
-                'urgency_score': urgency_score,
+                'days_to_expiry': int(days_to_expiry[i]),
+                'urgency_score': float(pricing['urgency_score'][i]),
                 'description': f'High-quality {category.lower()} product for daily use',
                 'sku': f'SKU{i+1:06d}',
                 'supplier': f'Supplier {np.random.randint(1, 10)}',
                 'location': f'Aisle {np.random.randint(1, 20)}-{np.random.randint(1, 10)}',
-                'created_at': datetime.utcnow(),
+                'created_at': now,
                 'status': 'active'
             }
             sample_products.append(product)
@@ -539,7 +889,7 @@ def populate_database():
         sort_criteria = sort_options.get(sort_by, [('urgency_score', -1)])
         
         # Execute query
-        products = list(products_collection.find(query)
+        products = list(products_collection.find(query, PRODUCT_PROJECTION)
                        .sort(sort_criteria)
                        .skip(skip)
                        .limit(limit))
@@ -571,16 +921,42 @@ def populate_database():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/products/expiring', methods=['GET'])
+def get_expiring_products():
+    """Products expiring within `days`, looked up as a range of expiry-day buckets"""
+    try:
+        days = int(request.args.get('days', 7))
+        category = request.args.get('category')
+        
+        product_ids = get_expiry_index().expiring_within(days)
+        
+        query = {'productId': {'$in': product_ids}, 'status': 'active', 'stock': {'$gt': 0}}
+        if category:
+            query['category'] = category
+        
+        products = list(products_collection.find(query, PRODUCT_PROJECTION).sort([('expiryDate', 1)]))
+        
+        return jsonify({
+            'expiring_products': serialize_doc(products),
+            'days_threshold': days,
+            'category_filter': category,
+            'count': len(products)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/products/<product_id>', methods=['GET'])
 def get_product(product_id):
     try:
-        product = products_collection.find_one({'productId': product_id})
+        trust_stored = stored_derived_fields_fresh()
+        product = products_collection.find_one({'productId': product_id}, PRODUCT_PROJECTION)
         
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        # Update calculated fields
-        if 'expiryDate' in product:
+        # Update calculated fields unless the refresh job already did
+        if 'expiryDate' in product and not trust_stored:
             urgency_score, days_to_expiry = calculate_urgency_score(product['expiryDate'])
             discount = calculate_discount(days_to_expiry)
             
@@ -639,6 +1015,13 @@ def update_product(current_user, product_id):
         if result.modified_count == 0:
             return jsonify({'error': 'No changes made'}), 400
         
+        if expiry_index is not None and 'expiryDate' in update_doc:
+            expiry_index.add(product_id, update_doc['expiryDate'])
+        
+        publish_analytics('product_updated', str(current_user['_id']), product_id, {
+            'fields': sorted(k for k in update_doc if k not in ('updated_at', 'updated_by'))
+        })
+        
         return jsonify({'message': 'Product updated successfully'})
         
     except Exception as e:
@@ -654,6 +1037,7 @@ def delete_product(current_user, product_id):
             {'$set': {
                 'status': 'deleted',
                 'deleted_at': datetime.now(),
+                'updated_at': datetime.now(),
                 'deleted_by': str(current_user['_id'])
             }}
         )
@@ -661,6 +1045,11 @@ def delete_product(current_user, product_id):
         if result.modified_count == 0:
             return jsonify({'error': 'Product not found'}), 404
         
+        if expiry_index is not None:
+            expiry_index.remove(product_id)
+        
+        publish_analytics('product_deleted', str(current_user['_id']), product_id)
+        
         return jsonify({'message': 'Product deleted successfully'})
         
     except Exception as e:
@@ -671,14 +1060,10 @@ def delete_product(current_user, product_id):
 def add_interaction():
     try:
         data = request.json
-        required_fields = ['userId', 'productId', 'actionType']
-        
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required interaction fields'}), 400
 
-        valid_actions = ['viewed', 'added', 'skipped', 'bought', 'favorited', 'shared']
-        if data['actionType'] not in valid_actions:
-            return jsonify({'error': f'Invalid actionType. Must be one of: {valid_actions}'}), 400
+        validation_error = validate_interaction(data)
+        if validation_error:
+            return jsonify({'error': validation_error}), 400
 
         # Handle stock reduction for 'bought' action
         if data['actionType'] == 'bought':
@@ -712,7 +1097,7 @@ def add_interaction():
                     'productId': data['productId'], 
                     'stock': {'$gte': quantity}
                 },
-                {'$inc': {'stock': -quantity}}
+                {'$inc': {'stock': -quantity}, '$set': {'updated_at': datetime.now()}}
             )
 
             if update_result.modified_count == 0:
@@ -721,29 +1106,33 @@ def add_interaction():
                     'can_sell': False
                 }), 400
 
+            record_sell_through([(data['productId'], product.get('category'), quantity, datetime.utcnow())])
+
             # Get updated product to return new stock
             updated_product = products_collection.find_one({'productId': data['productId']})
             new_stock = updated_product.get('stock', 0)
 
         # Record the interaction
-        interaction_doc = {
-            'userId': data['userId'],
-            'productId': data['productId'],
-            'actionType': data['actionType'],
-            'quantity': data.get('quantity', 1) if data['actionType'] == 'bought' else None,
-            'timestamp': datetime.utcnow(),
-            'session_id': data.get('session_id'),
-            'metadata': data.get('metadata', {})
-        }
-        
-        result = interactions_collection.insert_one(interaction_doc)
+        interaction_doc = build_interaction_doc(data, datetime.utcnow())
+        spool = get_interaction_spool()
 
-        # Return response with updated stock info
-        response_data = {
-            'message': 'Interaction recorded successfully',
-            'interactionId': str(result.inserted_id),
-            'can_sell': True
-        }
+        if spool:
+            interaction_doc['_id'] = ObjectId()
+            spool.append(interaction_doc)
+            response_data = {
+                'message': 'Interaction recorded successfully',
+                'interactionId': str(interaction_doc['_id']),
+                'queued': True,
+                'can_sell': True
+            }
+        else:
+            interaction_id, coalesced = record_interaction(interaction_doc)
+            response_data = {
+                'message': 'Interaction recorded successfully',
+                'interactionId': interaction_id,
+                'coalesced': coalesced,
+                'can_sell': True
+            }
 
         # Add stock info for 'bought' actions
         if data['actionType'] == 'bought':
@@ -758,6 +1147,159 @@ def add_interaction():
     except Exception as e:
         return jsonify({'error': str(e), 'can_sell': False}), 500
 
+@app.route('/api/interactions/batch', methods=['POST'])
+def add_interactions_batch():
+    """Record many interactions with one stock bulk_write and batched inserts"""
+    try:
+        data = request.json
+        events = data.get('interactions') if isinstance(data, dict) else data
+
+        if not isinstance(events, list) or not events:
+            return jsonify({'error': 'Request body must be a non-empty array of interactions'}), 400
+
+        if len(events) > MAX_INTERACTION_BATCH:
+            return jsonify({'error': f'Batch too large. Maximum is {MAX_INTERACTION_BATCH} interactions'}), 400
+
+        results = [None] * len(events)
+        accepted = []
+
+        # Validate everything in one pass
+        for index, event in enumerate(events):
+            validation_error = validate_interaction(event)
+            if validation_error:
+                results[index] = {'index': index, 'recorded': False, 'error': validation_error}
+            else:
+                accepted.append(index)
+
+        bought = [i for i in accepted if events[i]['actionType'] == 'bought']
+        failed_products = set()
+
+        if bought:
+            # One read for the stock of every product sold in this batch
+            product_ids = list({events[i]['productId'] for i in bought})
+            stock_by_product = {}
+            category_by_product = {}
+            for p in products_collection.find({'productId': {'$in': product_ids}},
+                                              {'productId': 1, 'stock': 1, 'category': 1}):
+                stock_by_product[p['productId']] = p.get('stock', 0)
+                category_by_product[p['productId']] = p.get('category')
+
+            # Allocate stock to events in arrival order
+            allocated = {}
+            sold = []
+            for index in bought:
+                event = events[index]
+                product_id = event['productId']
+                quantity = event.get('quantity', 1)
+
+                if product_id not in stock_by_product:
+                    results[index] = {'index': index, 'recorded': False,
+                                      'error': 'Product not found', 'can_sell': False}
+                    continue
+
+                remaining = stock_by_product[product_id] - allocated.get(product_id, 0)
+                if remaining < quantity:
+                    results[index] = {'index': index, 'recorded': False,
+                                      'error': 'Insufficient stock', 'can_sell': False,
+                                      'current_stock': remaining}
+                    continue
+
+                allocated[product_id] = allocated.get(product_id, 0) + quantity
+                results[index] = {'index': index, 'new_stock': remaining - quantity,
+                                  'quantity_sold': quantity}
+                sold.append(index)
+
+            if allocated:
+                # Guarded decrement per product, tagged so losers of a race can be identified
+                batch_id = str(ObjectId())
+                operations = [
+                    pymongo.UpdateOne(
+                        {'productId': product_id, 'stock': {'$gte': quantity}},
+                        {
+                            '$inc': {'stock': -quantity},
+                            '$set': {'updated_at': datetime.now()},
+                            '$push': {'stock_batches': {'$each': [batch_id], '$slice': -STOCK_BATCH_HISTORY}}
+                        }
+                    )
+                    for product_id, quantity in allocated.items()
+                ]
+                bulk_result = products_collection.bulk_write(operations, ordered=False)
+
+                if bulk_result.modified_count < len(operations):
+                    applied = {
+                        p['productId'] for p in products_collection.find(
+                            {'productId': {'$in': list(allocated)}, 'stock_batches': batch_id},
+                            {'productId': 1}
+                        )
+                    }
+                    failed_products = set(allocated) - applied
+
+            sales = []
+            for index in sold:
+                product_id = events[index]['productId']
+                if product_id in failed_products:
+                    results[index] = {'index': index, 'recorded': False,
+                                      'error': 'Stock became insufficient during transaction',
+                                      'can_sell': False}
+                else:
+                    sales.append((product_id, category_by_product.get(product_id),
+                                  results[index]['quantity_sold'], datetime.utcnow()))
+            if sales:
+                record_sell_through(sales)
+
+        # Store every surviving interaction with as few round-trips as possible
+        now = datetime.utcnow()
+        to_insert = [
+            i for i in accepted
+            if results[i] is None or 'error' not in results[i]
+        ]
+        if to_insert:
+            docs = [build_interaction_doc(events[i], now) for i in to_insert]
+            spool = get_interaction_spool()
+
+            if spool:
+                for doc in docs:
+                    doc['_id'] = ObjectId()
+                spool.append_many(docs)
+                outcomes = [(str(doc['_id']), None) for doc in docs]
+            else:
+                outcomes = record_interactions(docs)
+
+            for index, (interaction_id, coalesced) in zip(to_insert, outcomes):
+                result = results[index] or {'index': index}
+                result.update({'recorded': True, 'interactionId': interaction_id, 'can_sell': True})
+                if spool:
+                    result['queued'] = True
+                else:
+                    result['coalesced'] = coalesced
+                if events[index]['actionType'] == 'bought':
+                    result['stock_updated'] = True
+                results[index] = result
+
+        successful = sum(1 for r in results if r.get('recorded'))
+
+        return jsonify({
+            'message': f'Recorded {successful} of {len(events)} interactions',
+            'results': results,
+            'total_processed': len(results),
+            'successful': successful,
+            'failed': len(results) - successful
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/interactions/spool', methods=['GET'])
+@token_required
+def interaction_spool_status(current_user):
+    """Spool backlog and drain counters, for operators"""
+    if not current_user or current_user.get('role') != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    spool = get_interaction_spool()
+    if not spool:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **spool.stats()})
 
 @app.route('/api/interactions', methods=['GET'])
 def get_interactions():
@@ -797,6 +1339,7 @@ def get_recommendations(user_id):
     try:
         top_k = int(request.args.get('top_k', 10))
         rec_type = request.args.get('type', 'hybrid')
+        trust_stored = stored_derived_fields_fresh()
         
         # Get user's interaction history
         user_interactions = list(interactions_collection.find({'userId': user_id}))
@@ -833,17 +1376,17 @@ def get_recommendations(user_id):
             urgent_products = list(products_collection.find({
                 **query,
                 'days_to_expiry': {'$lte': 7}
-            }).limit(top_k // 3))
+            }, PRODUCT_PROJECTION).limit(top_k // 3))
             
             category_products = list(products_collection.find({
                 **query,
                 'category': {'$in': preferred_categories}
-            }).limit(top_k // 3)) if preferred_categories else []
+            }, PRODUCT_PROJECTION).limit(top_k // 3)) if preferred_categories else []
             
             discount_products = list(products_collection.find({
                 **query,
                 'discount': {'$gt': 0}
-            }).limit(top_k // 3))
+            }, PRODUCT_PROJECTION).limit(top_k // 3))
             
             # Combine and deduplicate
             all_products = urgent_products + category_products + discount_products
@@ -857,20 +1400,21 @@ def get_recommendations(user_id):
                     if len(recommendations) >= top_k:
                         break
         else:
-            recommendations = list(products_collection.find(query)
+            recommendations = list(products_collection.find(query, PRODUCT_PROJECTION)
                                  .sort([('urgency_score', -1)])
                                  .limit(top_k))
         
-        # Update calculated fields
-        for product in recommendations:
-            if 'expiryDate' in product:
-                urgency_score, days_to_expiry = calculate_urgency_score(product['expiryDate'])
-                discount = calculate_discount(days_to_expiry)
+        # Update calculated fields unless the refresh job already did
+        if not trust_stored:
+            for product in recommendations:
+                if 'expiryDate' in product:
+                    urgency_score, days_to_expiry = calculate_urgency_score(product['expiryDate'])
+                    discount = calculate_discount(days_to_expiry)
                 
-                product['urgency_score'] = urgency_score
-                product['days_to_expiry'] = days_to_expiry
-                product['discount'] = discount
-                product['discounted_price'] = product['price'] * (1 - discount)
+                    product['urgency_score'] = urgency_score
+                    product['days_to_expiry'] = days_to_expiry
+                    product['discount'] = discount
+                    product['discounted_price'] = product['price'] * (1 - discount)
         
         # Cache recommendations
         recommendations_collection.update_one(
@@ -904,6 +1448,9 @@ def get_recommendations(user_id):
 @token_required
 def get_dashboard_analytics(current_user):
     try:
+        # The counts below filter on stored derived fields
+        get_derived_refresher()
+        
         # Product statistics
         total_products = products_collection.count_documents({'status': 'active'})
         urgent_products = products_collection.count_documents({
@@ -971,6 +1518,39 @@ def get_dashboard_analytics(current_user):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/analytics/sell-through', methods=['GET'])
+def get_sell_through():
+    """Smoothed units sold per day by category, or by product with ?scope=product"""
+    try:
+        scope = request.args.get('scope', 'category')
+        limit = int(request.args.get('limit', 50))
+        
+        if scope == 'product':
+            product_ids = request.args.get('productIds')
+            rates = sell_through.product_rates(product_ids.split(',') if product_ids else None)
+        elif scope == 'category':
+            rates = sell_through.category_rates()
+        else:
+            return jsonify({'error': 'scope must be product or category'}), 400
+        
+        ranked = sorted(rates.items(), key=lambda item: item[1], reverse=True)[:limit]
+        
+        return jsonify({
+            'scope': scope,
+            'half_life_days': sell_through.half_life_days,
+            'rates': [{'key': key, 'units_per_day': round(rate, 4)} for key, rate in ranked],
+            'count': len(rates)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics/pipeline', methods=['GET'])
+def analytics_pipeline_status():
+    if analytics_pipeline is None:
+        return jsonify({'running': False, 'published': 0})
+    return jsonify(analytics_pipeline.stats())
+
 # Bulk Operations
 @app.route('/api/products/bulk', methods=['POST'])
 @token_required
@@ -991,6 +1571,7 @@ def bulk_operations(current_user):
         
         if operation == 'mark_sold':
             quantity = data.get('quantity', 1)
+            sales = []
             
             for product_id in product_ids:
                 # CHECK STOCK BEFORE MARKING AS SOLD
@@ -1025,20 +1606,31 @@ def bulk_operations(current_user):
                         'productId': product_id,
                         'stock': {'$gte': quantity}
                     },
-                    {'$inc': {'stock': -quantity}}
+                    {'$inc': {'stock': -quantity}, '$set': {'updated_at': datetime.now()}}
                 )
                 
                 if update_result.modified_count > 0:
                     results.append({'product_id': product_id, 'sold': True, 'quantity_sold': quantity})
+                    sales.append((product_id, product.get('category'), quantity, datetime.utcnow()))
                 else:
                     results.append({'product_id': product_id, 'error': 'Stock insufficient during transaction', 'sold': False})
+            
+            if sales:
+                record_sell_through(sales)
         
+        successful = sum(1 for r in results if r.get('sold', r.get('modified', False)))
+        
+        publish_analytics('bulk_operation', str(current_user['_id']), metadata={
+            'operation': operation,
+            'product_ids': product_ids,
+            'successful': successful
+        })
         
         return jsonify({
             'message': f'Bulk {operation} completed',
             'results': results,
             'total_processed': len(results),
-            'successful': sum(1 for r in results if r.get('sold', r.get('modified', False)))
+            'successful': successful
         })
         
     except Exception as e:
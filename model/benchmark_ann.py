@@ -0,0 +1,59 @@
+# benchmark_ann.py
+import time
+import numpy as np
+import pandas as pd
+from recommendation_system import ContentBasedFilter
+
+def synthetic_products(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    days = rng.integers(1, 180, n_rows)
+    discount = np.select([days <= 3, days <= 7, days <= 14, days <= 30], [0.4, 0.3, 0.2, 0.1], 0.0)
+    price = rng.uniform(5, 50, n_rows).round(2)
+    return pd.DataFrame({
+        'productId': np.arange(n_rows),
+        'name': rng.choice(['Face Cream', 'Vitamin C', 'Shampoo', 'Toothpaste', 'Body Wash', 'Sunscreen',
+                            'Multivitamin', 'Hair Oil', 'Mouthwash', 'Lotion'], n_rows),
+        'category': rng.choice(['Skincare', 'Health', 'Haircare', 'Oral Care', 'Personal Care'], n_rows),
+        'price': price,
+        'discounted_price': price * (1 - discount),
+        'discount': discount,
+        'stock': rng.integers(0, 100, n_rows),
+        'days_to_expiry': days,
+        'urgency_score': np.maximum(0, (30 - days) / 30)
+    })
+
+def run_benchmark(sizes=(10_000, 100_000, 1_000_000), n_queries=200, k=10, seed=42):
+    rng = np.random.default_rng(seed)
+    report = []
+    for n_rows in sizes:
+        start = time.perf_counter()
+        index = ContentBasedFilter(synthetic_products(n_rows, seed)).similarity_index
+        build = time.perf_counter() - start
+        rows = rng.choice(n_rows, n_queries, replace=False)
+
+        start = time.perf_counter()
+        exact = [index.exact_query_row(row, k) for row in rows]
+        exact_ms = (time.perf_counter() - start) / n_queries * 1000
+
+        start = time.perf_counter()
+        approx = [index.query_row(row, k) for row in rows]
+        ann_ms = (time.perf_counter() - start) / n_queries * 1000
+
+        # Ties are common in low-dimensional features, so a neighbour counts as
+        # found when its similarity reaches the exact k-th best
+        recall = np.mean([
+            sum(score >= truth[-1][1] - 1e-6 for _, score in found) / k
+            for found, truth in zip(approx, exact)
+        ])
+
+        dense_mb = n_rows * n_rows * 8 / 1e6
+        index_mb = index.memory_bytes() / 1e6
+        report.append({'rows': n_rows, 'recall': recall, 'ann_ms': ann_ms, 'exact_ms': exact_ms,
+                       'index_mb': index_mb, 'dense_matrix_mb': dense_mb, 'build_seconds': build})
+        print(f"📊 {n_rows:>9,} products: recall@{k} {recall:.3f} | "
+              f"ANN {ann_ms:.2f} ms vs exact {exact_ms:.2f} ms per query | "
+              f"index {index_mb:.1f} MB vs N x N matrix {dense_mb:,.0f} MB | build {build:.2f}s")
+    return report
+
+if __name__ == '__main__':
+    run_benchmark()
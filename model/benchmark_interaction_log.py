@@ -0,0 +1,37 @@
+# benchmark_interaction_log.py
+import time
+import numpy as np
+import pandas as pd
+from interaction_log import InteractionLog, ACTION_TYPES
+
+def synthetic_interactions(n_events, n_users=100_000, n_products=200_000, seed=42):
+    rng = np.random.default_rng(seed)
+    users = np.array([f'staff_{i}' for i in range(n_users)], dtype=object)
+    start = np.datetime64('2025-01-01T00:00:00')
+    return pd.DataFrame({
+        'userId': users[rng.integers(0, n_users, n_events)],
+        'productId': rng.integers(0, n_products, n_events),
+        'actionType': np.array(ACTION_TYPES, dtype=object)[rng.integers(0, len(ACTION_TYPES), n_events)],
+        'timestamp': start + rng.integers(0, 90 * 86400, n_events).astype('timedelta64[s]')
+    })
+
+def run_benchmark(n_events=1_000_000, target_events=50_000_000):
+    interactions_df = synthetic_interactions(n_events)
+    frame_bytes = interactions_df.memory_usage(deep=True).sum()
+
+    start = time.perf_counter()
+    log = InteractionLog.from_frame(interactions_df)
+    encode_seconds = time.perf_counter() - start
+    log_bytes = log.memory_bytes()
+
+    scale = target_events / n_events
+    print(f"🔄 {n_events:,} events encoded in {encode_seconds:.2f}s")
+    print(f"📊 DataFrame: {frame_bytes / n_events:.0f} bytes/event, "
+          f"~{frame_bytes * scale / 1e9:.1f} GB for {target_events:,}")
+    print(f"📊 InteractionLog: {log_bytes / n_events:.0f} bytes/event, "
+          f"~{log_bytes * scale / 1e9:.2f} GB for {target_events:,}")
+    return {'events': n_events, 'frame_bytes': int(frame_bytes), 'log_bytes': int(log_bytes),
+            'encode_seconds': encode_seconds}
+
+if __name__ == '__main__':
+    run_benchmark()
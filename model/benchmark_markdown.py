@@ -0,0 +1,31 @@
+# benchmark_markdown.py
+import time
+import numpy as np
+from markdown_optimizer import optimize_markdowns, estimate_base_rates
+
+def run_benchmark(n_rows=1_000_000, seed=42):
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(1, 100, n_rows).round(2)
+    stock = rng.integers(1, 200, n_rows)
+    days = rng.integers(0, 60, n_rows)
+    categories = rng.choice(['Dairy', 'Bakery', 'Produce', 'Meat', 'Frozen'], n_rows)
+    units_sold = rng.poisson(rng.gamma(1.0, 20.0, n_rows))
+
+    print(f"🔄 Optimizing markdowns for {n_rows:,} SKUs")
+
+    start = time.perf_counter()
+    base_rate = estimate_base_rates(categories, units_sold, window_days=28)
+    estimated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = optimize_markdowns(prices, stock, days, base_rate)
+    optimized = time.perf_counter() - start
+
+    print(f"✅ Sell-through estimation: {estimated:.3f}s")
+    print(f"✅ Discount optimization: {optimized:.3f}s")
+    values, counts = np.unique(result['discount'], return_counts=True)
+    print("📊 Proposed discounts: " + ", ".join(f"{v:.0%}: {c:,}" for v, c in zip(values, counts)))
+    return {'rows': n_rows, 'estimate_seconds': estimated, 'optimize_seconds': optimized}
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,139 @@
+# benchmark_recommenders.py
+import json
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from coo_loader import peak_rss_mb
+from evaluation import make_splits, relevant_test_users, score_recommendations
+from recommendation_system import HybridRecommendationSystem, generate_sample_data
+
+# Recommender variants to compare; 'config' goes to HybridRecommendationSystem,
+# 'weights' to recommend_hybrid
+VARIANTS = {
+    'item_cf': {'kind': 'item_cf'},
+    'user_cf': {'kind': 'user_cf'},
+    'content': {'kind': 'content'},
+    'hybrid': {'kind': 'hybrid', 'weights': {'collab': 0.4, 'content': 0.3, 'urgency': 0.3}},
+    'hybrid_collab_heavy': {'kind': 'hybrid', 'weights': {'collab': 0.6, 'content': 0.2, 'urgency': 0.2}},
+    'hybrid_urgency_heavy': {'kind': 'hybrid', 'weights': {'collab': 0.2, 'content': 0.2, 'urgency': 0.6}},
+}
+QUALITY_METRICS = ['avg_precision', 'avg_recall', 'avg_f1', 'avg_ndcg', 'avg_map', 'avg_novelty', 'coverage']
+
+def recommender_for(system, variant):
+    """A function user_id, k -> list of productIds, as served for one request"""
+    kind = variant['kind']
+    if kind == 'item_cf':
+        return system.collaborative_filter.recommend_item_based
+    if kind == 'user_cf':
+        return system.collaborative_filter.recommend_user_based
+    if kind == 'content':
+        return lambda user_id, k: system.content_filter.recommend_by_category_urgency(
+            system.get_user_preferences(user_id), k)
+    if kind == 'hybrid':
+        weights = variant.get('weights', VARIANTS['hybrid']['weights'])
+        return lambda user_id, k: system.recommend_hybrid(user_id, k, weights)['productId'].tolist()
+    if kind == 'two_stage':
+        return lambda user_id, k: system.recommend_two_stage(user_id, k)['productId'].tolist()
+    raise ValueError(f"Unknown recommender kind: {kind}")
+
+def latency_percentiles(seconds):
+    if not len(seconds):
+        return {'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'mean_ms': float(ms.mean()), 'p50_ms': float(p50), 'p95_ms': float(p95),
+            'p99_ms': float(p99), 'max_ms': float(ms.max())}
+
+def build_peak_mb(products_df, train_df, config=None):
+    """Peak memory the Python allocators (numpy arrays included) saw while building a system
+
+    A separate build from the timed one: tracing every allocation slows
+    the build down several times over.
+    """
+    tracemalloc.start()
+    try:
+        HybridRecommendationSystem(products_df, train_df, config=config)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def run_variant(products_df, train_df, test_df, variant, k=5):
+    """Train one variant on a fold, then time one request per evaluated user"""
+    start = time.perf_counter()
+    system = HybridRecommendationSystem(products_df, train_df, config=variant.get('config'))
+    build_seconds = time.perf_counter() - start
+
+    recommend = recommender_for(system, variant)
+    relevant_df, user_ids = relevant_test_users(train_df, test_df)
+    recommendations, latencies = [], []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        recommendations.append(recommend(user_id, k))
+        latencies.append(time.perf_counter() - start)
+
+    result = score_recommendations(recommendations, user_ids, train_df, relevant_df,
+                                   system.product_store.column('productId'), k)
+    result.update({
+        'build_seconds': build_seconds,
+        'build_peak_mb': build_peak_mb(products_df, train_df, variant.get('config')),
+        'latency': latency_percentiles(latencies),
+        'cold_start_users': int(test_df.loc[~test_df['userId'].isin(train_df['userId']), 'userId'].nunique())
+    })
+    return result
+
+def summarize(results, variants):
+    """Mean and standard deviation across folds of every quality metric, build time and p95 latency"""
+    summary = {}
+    for name in variants:
+        runs = [result for result in results if result['variant'] == name]
+        values = {metric: [run[metric] for run in runs] for metric in QUALITY_METRICS + ['build_seconds']}
+        values['p95_ms'] = [run['latency']['p95_ms'] for run in runs]
+        summary[name] = {metric: {'mean': float(np.mean(vals)), 'std': float(np.std(vals))}
+                         for metric, vals in values.items()}
+    return summary
+
+def run_benchmark(products_df=None, interactions_df=None, split='temporal', n_folds=3, k=5,
+                  variants=VARIANTS, output='benchmark_recommenders.json'):
+    """Train every variant once per fold and write a JSON report of quality, build time, latency and memory
+
+    `split` is 'temporal' (rolling-origin folds over the timeline; one
+    holdout of the latest 20% with n_folds=1), 'kfold' or 'random'.
+    """
+    if products_df is None or interactions_df is None:
+        products_df, interactions_df = generate_sample_data()
+    folds = make_splits(interactions_df, split, n_folds)
+
+    results = []
+    for fold, (train_df, test_df) in enumerate(folds):
+        print(f"🔄 Fold {fold + 1}/{len(folds)}: {len(train_df):,} train / {len(test_df):,} test interactions")
+        for name, variant in variants.items():
+            result = run_variant(products_df, train_df, test_df, variant, k)
+            result.update({'variant': name, 'fold': fold,
+                           'train_interactions': len(train_df), 'test_interactions': len(test_df)})
+            print(f"📊 {name:<22} P@{k} {result['avg_precision']:.3f}  NDCG {result['avg_ndcg']:.3f}  "
+                  f"cov {result['coverage']:.2f}  build {result['build_seconds']:.2f}s  "
+                  f"p95 {result['latency']['p95_ms']:.1f}ms  peak {result['build_peak_mb']:.1f}MB")
+            results.append(result)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'split': split,
+        'n_folds': len(folds),
+        'k': k,
+        'products': len(products_df),
+        'interactions': len(interactions_df),
+        'variants': variants,
+        'folds': results,
+        'summary': summarize(results, variants),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report saved to {output}")
+    return report
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,39 @@
+# benchmark_topk.py
+import time
+import numpy as np
+from topk import top_k_indices
+
+def full_sort_top_k(scores, k, exclude):
+    """The old way: mask a copy, then argsort the whole catalogue"""
+    scores = scores.copy()
+    scores[exclude] = 0
+    return np.argsort(scores)[::-1][:k]
+
+def best_of(function, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def run_benchmark(sizes=(10_000, 100_000, 1_000_000), k=10, n_excluded=50, seed=42):
+    rng = np.random.default_rng(seed)
+    results = []
+    for n_items in sizes:
+        scores = rng.random(n_items)
+        exclude = rng.choice(n_items, n_excluded, replace=False)
+
+        sorted_seconds, expected = best_of(lambda: full_sort_top_k(scores, k, exclude))
+        partition_seconds, found = best_of(lambda: top_k_indices(scores, k, exclude=exclude))
+
+        assert np.array_equal(found, expected)
+        print(f"📊 {n_items:>9,} items: argsort {sorted_seconds * 1000:8.2f}ms, "
+              f"argpartition {partition_seconds * 1000:7.2f}ms "
+              f"({sorted_seconds / partition_seconds:.1f}x, results identical)")
+        results.append({'items': n_items, 'argsort_seconds': sorted_seconds,
+                        'argpartition_seconds': partition_seconds})
+    return results
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,124 @@
+# clearance_index.py
+import heapq
+import threading
+from bisect import insort
+import numpy as np
+import pandas as pd
+from interaction_log import InteractionLog
+
+def sell_through_deficit(stock, days_to_expiry, sell_through_rate):
+    """Share of the stock not expected to sell before expiry at the current rate"""
+    stock = np.asarray(stock, dtype=np.float64)
+    expected_sales = np.asarray(sell_through_rate, dtype=np.float64) * (np.asarray(days_to_expiry) + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deficit = 1.0 - expected_sales / stock
+    return np.clip(np.nan_to_num(deficit, nan=0.0), 0.0, 1.0)
+
+def clearance_priority(urgency_score, stock, value, days_to_expiry, sell_through_rate):
+    """urgency x stock x unit value x sell-through deficit, for arrays or scalars"""
+    return (np.asarray(urgency_score, dtype=np.float64) * np.asarray(stock, dtype=np.float64)
+            * np.asarray(value, dtype=np.float64)
+            * sell_through_deficit(stock, days_to_expiry, sell_through_rate))
+
+def sell_through_rates_from_interactions(interactions_df):
+    """Units bought per day for each product over the span of the interaction log"""
+    if isinstance(interactions_df, InteractionLog):
+        # The compact log keeps event counts, not quantities
+        return interactions_df.daily_rates('bought')
+    if interactions_df.empty:
+        return {}
+    bought = interactions_df[interactions_df['actionType'] == 'bought']
+    if bought.empty:
+        return {}
+
+    units = bought['quantity'].fillna(1) if 'quantity' in bought.columns else pd.Series(1, index=bought.index)
+    timestamps = pd.to_datetime(interactions_df['timestamp'])
+    span_days = max((timestamps.max() - timestamps.min()).days, 1)
+    return (units.groupby(bought['productId']).sum() / span_days).to_dict()
+
+class ClearancePriorityIndex:
+    """Products in stock ranked by clearance priority, bucketed by category and expiry day
+
+    Each (category, days_to_expiry) bucket is a list kept sorted by
+    priority, so the best products at any urgency threshold are found by
+    lazily merging the heads of the buckets at or under that threshold:
+    O(b + k log b) for k results over b buckets, independent of the
+    catalogue size. Updates re-file one product in O(bucket size).
+    """
+
+    def __init__(self):
+        self.buckets = {}   # category -> {days_to_expiry: [(-priority, productId)]}
+        self.entries = {}   # productId -> (category, days_to_expiry, key)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_products(cls, products_df, sell_through_rates=None):
+        """Build the index from a products DataFrame in one sorted pass"""
+        index = cls()
+        in_stock = products_df[(products_df['stock'] > 0) & (products_df['days_to_expiry'] >= 0)]
+        if in_stock.empty:
+            return index
+
+        rates = in_stock['productId'].map(sell_through_rates or {}).fillna(0).values
+        value = in_stock['discounted_price'] if 'discounted_price' in in_stock.columns else in_stock['price']
+        priority = clearance_priority(in_stock['urgency_score'].values, in_stock['stock'].values,
+                                      value.values, in_stock['days_to_expiry'].values, rates)
+
+        ranked = pd.DataFrame({
+            'productId': in_stock['productId'].values,
+            'category': in_stock['category'].values,
+            'days': in_stock['days_to_expiry'].astype(int).values,
+            'key': -priority
+        }).sort_values(['category', 'days', 'key'], kind='stable')
+
+        for (category, days), group in ranked.groupby(['category', 'days'], sort=False):
+            keys = list(zip(group['key'].tolist(), group['productId'].tolist()))
+            index.buckets.setdefault(category, {})[days] = keys
+            for key in keys:
+                index.entries[key[1]] = (category, days, key)
+        return index
+
+    def update(self, product_id, category, days_to_expiry, priority):
+        """Insert or re-file one product"""
+        with self._lock:
+            self.remove(product_id)
+            key = (-float(priority), product_id)
+            insort(self.buckets.setdefault(category, {}).setdefault(int(days_to_expiry), []), key)
+            self.entries[product_id] = (category, int(days_to_expiry), key)
+
+    def remove(self, product_id):
+        with self._lock:
+            entry = self.entries.pop(product_id, None)
+            if entry is None:
+                return
+            category, days, key = entry
+            bucket = self.buckets[category][days]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[category][days]
+
+    def top_k(self, urgency_threshold, k, categories=None, exclude=()):
+        """Up to k (productId, priority) pairs expiring within `urgency_threshold` days"""
+        with self._lock:
+            heads = []
+            for category in (self.buckets if categories is None else categories):
+                days_buckets = self.buckets.get(category, {})
+                for days in range(0, int(urgency_threshold) + 1):
+                    bucket = days_buckets.get(days)
+                    if bucket:
+                        heads.append((bucket[0], 0, bucket))
+            heapq.heapify(heads)
+
+            results = []
+            while heads and len(results) < k:
+                key, position, bucket = heads[0]
+                if position + 1 < len(bucket):
+                    heapq.heapreplace(heads, (bucket[position + 1], position + 1, bucket))
+                else:
+                    heapq.heappop(heads)
+                if key[1] not in exclude:
+                    results.append((key[1], -key[0]))
+            return results
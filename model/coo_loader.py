@@ -0,0 +1,144 @@
+# coo_loader.py
+import os
+import sys
+import time
+import numpy as np
+import pymongo
+from bson import decode_all
+from dotenv import load_dotenv
+from id_dictionary import IdDictionary
+from interaction_log import InteractionLog, encode_events
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+INTERACTION_PROJECTION = {'_id': 0, 'userId': 1, 'productId': 1, 'actionType': 1, 'timestamp': 1, 'count': 1}
+COO_DTYPES = (np.int32, np.int32, np.int8, np.int32, np.int32)
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB; None where it cannot be measured"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        # Windows: peak working set
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+    return None
+
+def format_mb(mb, digits=1):
+    return 'n/a' if mb is None else f"{mb:.{digits}f} MB"
+
+class GrowableCOO:
+    """Preallocated column buffers that double when full
+
+    Holds the InteractionLog columns (user code, product code, action,
+    epoch seconds, count), i.e. the COO triplets of the interaction matrix
+    plus what is needed to weight them. Appending a batch copies it into
+    the free tail, so the total cost stays linear in the number of rows.
+    """
+
+    def __init__(self, capacity=1 << 20, dtypes=COO_DTYPES):
+        self.buffers = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.buffers[0])
+
+    def append(self, columns):
+        n = len(columns[0])
+        if self.size + n > self.capacity:
+            new_capacity = max(self.capacity * 2, self.size + n)
+            for i, buffer in enumerate(self.buffers):
+                grown = np.empty(new_capacity, dtype=buffer.dtype)
+                grown[:self.size] = buffer[:self.size]
+                self.buffers[i] = grown
+        for buffer, column in zip(self.buffers, columns):
+            buffer[self.size:self.size + n] = column
+        self.size += n
+
+    def columns(self):
+        """Views of the filled part of every buffer"""
+        return [buffer[:self.size] for buffer in self.buffers]
+
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+def raw_batches(collection, query=None, projection=INTERACTION_PROJECTION, batch_size=50_000):
+    """Lists of decoded documents, one server batch at a time
+
+    Uses find_raw_batches, so the driver hands over each batch as one BSON
+    buffer and only that batch is ever decoded into dicts. Collections
+    without raw batch support (test doubles) fall back to a plain cursor.
+    """
+    if hasattr(collection, 'find_raw_batches'):
+        for batch in collection.find_raw_batches(query or {}, projection, batch_size=batch_size):
+            yield decode_all(batch)
+        return
+    batch = []
+    for document in collection.find(query or {}, projection):
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def stream_interactions(collection, query=None, users=None, products=None,
+                        batch_size=50_000, initial_capacity=1 << 20):
+    """Load interactions into an InteractionLog without materializing the collection
+
+    Each raw batch is encoded to compact columns and copied into growable
+    COO buffers, so peak memory is the buffers plus one batch. Returns
+    (log, stats) where stats has rows, batches, seconds, rows_per_second,
+    buffer_mb and peak_rss_mb.
+    """
+    started = time.perf_counter()
+    users = users if users is not None else IdDictionary()
+    products = products if products is not None else IdDictionary()
+    buffers = GrowableCOO(initial_capacity)
+
+    batches = 0
+    for batch in raw_batches(collection, query, batch_size=batch_size):
+        batches += 1
+        buffers.append(encode_events(
+            [document.get('userId') for document in batch],
+            [document.get('productId') for document in batch],
+            [document.get('actionType') for document in batch],
+            [document.get('timestamp') for document in batch],
+            [document.get('count') for document in batch],
+            users, products
+        ))
+
+    # Trim to size so the spare capacity is released
+    log = InteractionLog(*[column.copy() for column in buffers.columns()], users, products)
+    seconds = time.perf_counter() - started
+    stats = {
+        'rows': len(log),
+        'batches': batches,
+        'seconds': seconds,
+        'rows_per_second': len(log) / seconds if seconds > 0 else 0.0,
+        'buffer_mb': buffers.nbytes() / (1024 * 1024),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    return log, stats
+
+if __name__ == '__main__':
+    load_dotenv()
+    client = pymongo.MongoClient(os.getenv("MONGODB_URI"))
+    db = client['walmart_clearance']
+    log, stats = stream_interactions(db['interactions'])
+    print(f"✅ Loaded {stats['rows']:,} interactions in {stats['batches']} batches, {stats['seconds']:.2f}s")
+    print(f"📊 {stats['rows_per_second']:,.0f} rows/s, buffers {stats['buffer_mb']:.1f} MB, "
+          f"peak RSS {format_mb(stats['peak_rss_mb'])}")
@@ -5,11 +5,13 @@ from datetime import datetime, timedelta
 import numpy as np
 from collections import Counter
 from dotenv import load_dotenv
+from snapshot_cache import load_collection
 
 
 # Load environment variables
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
 
 class WalmartClearanceDashboard:
     def __init__(self, mongo_uri="mongodb://localhost:27017/"):
@@ -35,16 +37,16 @@ class WalmartClearanceDashboard:
                 print("❌ No database connection")
                 return pd.DataFrame()
             
-            # Fetch all products
-            products = list(self.products_collection.find({}))
+            # Fetch all products, or only the changes since the local snapshot
+            if SNAPSHOT_DIR:
+                products_df = load_collection(SNAPSHOT_DIR, self.products_collection, 'products')
+            else:
+                products_df = pd.DataFrame(list(self.products_collection.find({})))
             
-            if not products:
+            if products_df.empty:
                 print("⚠️ No products found in database")
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            products_df = pd.DataFrame(products)
-            
             # Clean and process data
             if 'expiryDate' in products_df.columns:
                 products_df['expiryDate'] = pd.to_datetime(products_df['expiryDate'])
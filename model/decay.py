@@ -0,0 +1,91 @@
+# decay.py
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+
+# Largest growth factor exp(rate * (t - reference)) a stored weight may carry
+# before the frame is rebased; e^30 keeps float64 far from overflow
+MAX_EXPONENT = 30.0
+
+class DecayedInteractionMatrix:
+    """User x product weights that decay exponentially with the age of each event
+
+    An event of weight w at time t is worth w * 2^(-(now - t) / half_life).
+    Rather than touching every entry as time passes, weights are stored in
+    the frame of a reference time: an event is stored as
+    w * exp(rate * (t - reference)), and the whole matrix is scaled by
+    exp(-rate * (now - reference)) when it is read. Adding events is then
+    O(new events) and old entries never change. Once the reference lags
+    `now` by `rescale_after` half-lives (or a new event would push the
+    growth factor past e^30), the frame is rebased in one O(nnz) pass and
+    entries whose decayed weight fell below `min_weight` are pruned.
+    Timestamps are epoch seconds, as in InteractionLog.
+    """
+
+    def __init__(self, half_life_days=30.0, min_weight=1e-3, rescale_after=1.0):
+        self.half_life_days = half_life_days
+        self.rate = np.log(2) / (half_life_days * 86400)
+        self.min_weight = min_weight
+        self.rescale_after = rescale_after
+        self.reference_time = None
+        self.latest_time = None
+        self.stored = csr_matrix((0, 0))
+        self._pending = []
+        self.rescales = 0
+        self.pruned = 0
+
+    def add(self, user_codes, product_codes, weights, timestamps):
+        """Add a batch of events; O(batch), the existing entries are not touched"""
+        if not len(timestamps):
+            return
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if self.reference_time is None:
+            self.reference_time = int(timestamps.min())
+            self.latest_time = self.reference_time
+        self.latest_time = max(self.latest_time, int(timestamps.max()))
+        if self.rate * (self.latest_time - self.reference_time) > MAX_EXPONENT:
+            self.rescale(self.latest_time)
+
+        growth = np.exp(self.rate * (timestamps - self.reference_time))
+        self._pending.append((np.asarray(user_codes), np.asarray(product_codes),
+                              np.asarray(weights, dtype=np.float64) * growth))
+
+    def _coalesce(self, shape=None):
+        """Fold the pending events into the stored matrix, summing repeats of a pair"""
+        shape = shape or self.stored.shape
+        if not self._pending and shape == self.stored.shape:
+            return
+        stored = self.stored.tocoo()
+        rows = [stored.row] + [batch[0] for batch in self._pending]
+        cols = [stored.col] + [batch[1] for batch in self._pending]
+        data = [stored.data] + [batch[2] for batch in self._pending]
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        if len(rows):
+            shape = (max(shape[0], int(rows.max()) + 1), max(shape[1], int(cols.max()) + 1))
+        self.stored = coo_matrix((np.concatenate(data), (rows, cols)), shape=shape).tocsr()
+        self.stored.sum_duplicates()
+        self._pending = []
+
+    def rescale(self, reference_time):
+        """Rebase the stored weights on a new reference time and prune negligible entries"""
+        self._coalesce()
+        if self.reference_time is not None:
+            self.stored.data *= np.exp(-self.rate * (reference_time - self.reference_time))
+        self.reference_time = reference_time
+        negligible = np.abs(self.stored.data) < self.min_weight
+        self.pruned += int(negligible.sum())
+        self.stored.data[negligible] = 0
+        self.stored.eliminate_zeros()
+        self.rescales += 1
+
+    def to_csr(self, shape=None, now=None):
+        """Decayed weights as of `now` (default: the latest event), at least `shape` big"""
+        now = self.latest_time if now is None else now
+        self._coalesce(shape)
+        if self.reference_time is None:
+            return self.stored.copy()
+        if now - self.reference_time > self.rescale_after * self.half_life_days * 86400:
+            self.rescale(now)
+        return self.stored * np.exp(-self.rate * (now - self.reference_time))
+
+    def nnz(self):
+        return self.stored.nnz + sum(len(batch[2]) for batch in self._pending)
@@ -0,0 +1,135 @@
+# derived_fields.py
+import os
+import threading
+from datetime import datetime, timedelta
+import pymongo
+from dotenv import load_dotenv
+from pricing import DISCOUNT_TIERS, TIER_DISCOUNTS, URGENCY_HORIZON_DAYS
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+def tier_ranges(now):
+    """Yield (expiryDate filter, discount) for every discount tier at `now`
+
+    days_to_expiry is floor((expiryDate - now) / 1 day), so a tier covering
+    lo < days <= hi holds the products expiring in [now + lo + 1, now + hi + 1).
+    """
+    lower = None
+    for max_days, discount in DISCOUNT_TIERS:
+        upper = now + timedelta(days=max_days + 1)
+        date_range = {'$lt': upper}
+        if lower is not None:
+            date_range['$gte'] = lower
+        yield date_range, discount
+        lower = upper
+    yield {'$gte': lower}, TIER_DISCOUNTS[-1]
+
+def refresh_derived_fields(products_collection, now=None):
+    """Recompute stored days_to_expiry, urgency_score, discount and discounted_price
+
+    Runs one server-side update_many per discount tier and only touches
+    products whose stored values no longer match `now`, so running it
+    repeatedly within the same day bucket writes nothing.
+    """
+    now = now or datetime.now()
+    days_expr = {'$floor': {'$divide': [{'$subtract': ['$expiryDate', now]}, MS_PER_DAY]}}
+
+    summary = {'matched': 0, 'modified': 0, 'tiers': []}
+    for date_range, discount in tier_ranges(now):
+        result = products_collection.update_many(
+            {
+                'expiryDate': date_range,
+                '$or': [
+                    {'discount': {'$ne': discount}},
+                    {'$expr': {'$ne': ['$days_to_expiry', days_expr]}}
+                ]
+            },
+            [
+                {'$set': {'days_to_expiry': days_expr}},
+                {'$set': {
+                    'urgency_score': {'$max': [0, {'$divide': [
+                        {'$subtract': [URGENCY_HORIZON_DAYS, '$days_to_expiry']},
+                        URGENCY_HORIZON_DAYS
+                    ]}]},
+                    'discount': discount,
+                    'discounted_price': {'$multiply': ['$price', 1 - discount]},
+                    'derived_at': now
+                }}
+            ]
+        )
+        summary['matched'] += result.matched_count
+        summary['modified'] += result.modified_count
+        summary['tiers'].append({'discount': discount, 'modified': result.modified_count})
+
+    summary['refreshed_at'] = now
+    return summary
+
+class DerivedFieldRefresher:
+    """Background thread that keeps stored derived product fields current
+
+    Products change day bucket at the time of day they expire, so the job
+    runs every `interval` rather than once at midnight; each run only
+    writes the products whose bucket moved since the previous one. Reads
+    may trust the stored values while `is_fresh()` holds.
+    """
+
+    def __init__(self, products_collection, interval=timedelta(hours=1)):
+        self.products_collection = products_collection
+        self.interval = interval
+        self.last_run = None
+        self.last_summary = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def run_once(self, now=None):
+        with self._lock:
+            summary = refresh_derived_fields(self.products_collection, now)
+            self.last_run = summary['refreshed_at']
+            self.last_summary = summary
+            self.last_error = None
+            return summary
+
+    def is_fresh(self, now=None):
+        """True if stored fields are at most one interval behind"""
+        now = now or datetime.now()
+        return self.last_run is not None and now - self.last_run <= self.interval
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                summary = self.run_once()
+                print(f"🔄 Refreshed derived fields on {summary['modified']} products")
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Derived field refresh failed: {e}")
+            self._stopped.wait(self.interval.total_seconds())
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='derived-field-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self):
+        return {
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'fresh': self.is_fresh(),
+            'interval_seconds': self.interval.total_seconds(),
+            'last_modified': self.last_summary['modified'] if self.last_summary else None,
+            'last_error': self.last_error,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
+
+if __name__ == '__main__':
+    load_dotenv()
+    client = pymongo.MongoClient(os.getenv("MONGODB_URI"))
+    summary = refresh_derived_fields(client['walmart_clearance']['products'])
+    print(f"✅ Refreshed {summary['modified']} of {summary['matched']} stale products")
+    for tier in summary['tiers']:
+        print(f"   discount {tier['discount']:.0%}: {tier['modified']} updated")
@@ -0,0 +1,194 @@
+# evaluation.py
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from id_dictionary import IdDictionary
+
+# Test interactions that count as a user wanting the product
+RELEVANT_ACTIONS = ['added', 'bought']
+
+# What the shards work on (e.g. the trained system); forked workers inherit it
+# instead of unpickling a copy per shard
+_worker_context = None
+
+def _run_shard(task):
+    function, shard = task
+    return function(_worker_context, shard)
+
+def map_shards(function, context, shards, n_workers=None):
+    """[function(context, shard) for shard in shards], in a pool of forked processes
+
+    `function` must be a module-level function. Runs in-process with one
+    worker, a single shard or where fork is unavailable.
+    """
+    global _worker_context
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(shards) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [function(context, shard) for shard in shards]
+
+    _worker_context = context
+    try:
+        with ProcessPoolExecutor(min(n_workers, len(shards)), mp_context=multiprocessing.get_context('fork')) as pool:
+            return list(pool.map(_run_shard, [(function, shard) for shard in shards]))
+    finally:
+        _worker_context = None
+
+def _recommend_shard(system, shard):
+    user_ids, k = shard
+    return system.recommend_batch(user_ids, top_k=k)
+
+def ranking_metrics(recommended, relevant, popularity=None):
+    """Per-user metrics of ranked recommendations against a sparse relevance matrix
+
+    `recommended` is an (n_users, k) array of item codes, best first and
+    padded with -1; `relevant` an (n_users, n_items) CSR matrix of the
+    items each user went on to want; `popularity` the share of training
+    interactions of every item. Returns arrays of precision, recall, f1,
+    ndcg, average_precision and novelty (1 - popularity, averaged over
+    the recommended items), one value per user.
+    """
+    n_users, k = recommended.shape
+    filled = recommended >= 0
+    rows = np.broadcast_to(np.arange(n_users)[:, None], recommended.shape)
+    hits = np.zeros(recommended.shape, dtype=bool)
+    if filled.any():
+        hits[filled] = np.asarray(relevant[rows[filled], recommended[filled]]).ravel() > 0
+
+    n_recommended = filled.sum(axis=1)
+    n_relevant = np.diff(relevant.indptr)
+    n_hits = hits.sum(axis=1)
+    precision = np.divide(n_hits, n_recommended, out=np.zeros(n_users), where=n_recommended > 0)
+    recall = np.divide(n_hits, n_relevant, out=np.zeros(n_users), where=n_relevant > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(n_users), where=precision + recall > 0)
+
+    # Hits discounted by rank, against the best possible ranking of min(relevant, k) hits
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    ideal_hits = np.minimum(n_relevant, k)
+    ideal = np.append(0.0, np.cumsum(discounts))[ideal_hits]
+    ndcg = np.divide(hits @ discounts, ideal, out=np.zeros(n_users), where=ideal > 0)
+    precision_at_rank = np.cumsum(hits, axis=1) / np.arange(1, k + 1)
+    average_precision = np.divide((precision_at_rank * hits).sum(axis=1), ideal_hits,
+                                  out=np.zeros(n_users), where=ideal_hits > 0)
+
+    if popularity is None:
+        novelty = np.zeros(n_users)
+    else:
+        unpopularity = np.where(filled, 1 - popularity[np.where(filled, recommended, 0)], 0)
+        novelty = np.divide(unpopularity.sum(axis=1), n_recommended, out=np.zeros(n_users), where=n_recommended > 0)
+
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'ndcg': ndcg,
+            'average_precision': average_precision, 'novelty': novelty}
+
+def recommend_population(system, user_ids, k=5, n_workers=None, shard_size=1000):
+    """system.recommend_batch for every user, sharded over a process pool
+
+    Workers are forked so they share the trained system copy-on-write;
+    where fork is unavailable (or with one worker) shards run in-process.
+    """
+    shards = [(user_ids[start:start + shard_size], k) for start in range(0, len(user_ids), shard_size)]
+    return [recs for shard_recs in map_shards(_recommend_shard, system, shards, n_workers) for recs in shard_recs]
+
+def temporal_split(interactions_df, test_ratio=0.2):
+    """Train on the earliest interactions and test on the latest test_ratio of them"""
+    order = np.argsort(interactions_df['timestamp'].values, kind='stable')
+    cut = int(len(order) * (1 - test_ratio))
+    return interactions_df.iloc[np.sort(order[:cut])], interactions_df.iloc[np.sort(order[cut:])]
+
+def temporal_folds(interactions_df, n_folds=3):
+    """Rolling-origin folds: the timeline is cut into n_folds + 1 blocks of equal size
+    and fold i trains on every block before block i + 1, which it is tested on"""
+    order = np.argsort(interactions_df['timestamp'].values, kind='stable')
+    bounds = np.linspace(0, len(order), n_folds + 2).astype(int)
+    return [(interactions_df.iloc[np.sort(order[:bounds[i]])],
+             interactions_df.iloc[np.sort(order[bounds[i]:bounds[i + 1]])]) for i in range(1, n_folds + 1)]
+
+def kfold_splits(interactions_df, n_folds=5, seed=42):
+    """Random k-fold: every interaction is tested exactly once"""
+    fold_of = np.random.default_rng(seed).permutation(len(interactions_df)) % n_folds
+    return [(interactions_df.iloc[fold_of != i], interactions_df.iloc[fold_of == i]) for i in range(n_folds)]
+
+def make_splits(interactions_df, method='temporal', n_folds=1, test_ratio=0.2, seed=42):
+    """(train, test) pairs for 'temporal' (rolling origin when n_folds > 1), 'kfold' or 'random'"""
+    if method == 'temporal':
+        return [temporal_split(interactions_df, test_ratio)] if n_folds == 1 else temporal_folds(interactions_df, n_folds)
+    if method == 'kfold':
+        return kfold_splits(interactions_df, n_folds, seed)
+    if method == 'random':
+        test_df = interactions_df.sample(frac=test_ratio, random_state=seed)
+        return [(interactions_df.drop(test_df.index), test_df)]
+    raise ValueError(f"Unknown split method: {method}")
+
+def relevant_test_users(train_df, test_df):
+    """Relevant test interactions of users known at training time, and those users in order"""
+    test_df = test_df[test_df['actionType'].isin(RELEVANT_ACTIONS) & test_df['userId'].isin(train_df['userId'])]
+    return test_df, list(pd.unique(test_df['userId']))
+
+def encode_items(recommended_ids, user_ids, train_df, test_df, catalogue_ids):
+    """One item code space for the catalogue, the ground truth and everything recommended
+
+    Catalogue products keep codes 0..len(catalogue_ids) - 1. Returns the
+    codes of recommended_ids, the (users x items) relevance matrix of
+    test_df and the share of training interactions of every item.
+    """
+    items = IdDictionary(catalogue_ids)
+    user_rows = pd.Index(user_ids).get_indexer(test_df['userId'])
+    known = user_rows >= 0
+    relevant_codes = items.add_many(test_df['productId'].values[known])
+    recommended_codes = items.add_many(recommended_ids)
+    train_codes = items.add_many(train_df['productId'].values)
+
+    relevant = csr_matrix((np.ones(len(relevant_codes)), (user_rows[known], relevant_codes)),
+                          shape=(len(user_ids), len(items)))
+    relevant.data[:] = 1  # Repeated purchases of one product count once
+    popularity = np.bincount(train_codes, minlength=len(items)) / max(len(train_codes), 1)
+    return recommended_codes, relevant, popularity
+
+def score_recommendations(recommendations, user_ids, train_df, test_df, catalogue_ids, k=5):
+    """Average metrics of per-user recommendation lists (aligned with user_ids) against test_df
+
+    Coverage is the share of the catalogue recommended to anybody.
+    """
+    if len(user_ids) == 0:
+        return {'avg_precision': 0, 'avg_recall': 0, 'avg_f1': 0, 'avg_ndcg': 0, 'avg_map': 0,
+                'avg_novelty': 0, 'coverage': 0, 'num_users_evaluated': 0}
+
+    lengths = np.array([min(len(recs), k) for recs in recommendations], dtype=np.int64)
+    recommended_codes, relevant, popularity = encode_items(
+        [item for recs in recommendations for item in recs[:k]], user_ids, train_df, test_df, catalogue_ids)
+    recommended = np.full((len(user_ids), k), -1, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    recommended[np.repeat(np.arange(len(user_ids)), lengths), np.arange(lengths.sum()) - offsets] = recommended_codes
+    return summarize_metrics(recommended, relevant, popularity, len(catalogue_ids))
+
+def summarize_metrics(recommended, relevant, popularity, catalogue_size):
+    """Population averages of ranking_metrics plus catalogue coverage
+
+    Item codes below catalogue_size are catalogue products; coverage is the
+    share of them recommended to anybody.
+    """
+    metrics = ranking_metrics(recommended, relevant, popularity)
+    covered = np.unique(recommended[recommended >= 0])
+    return {
+        'avg_precision': float(metrics['precision'].mean()),
+        'avg_recall': float(metrics['recall'].mean()),
+        'avg_f1': float(metrics['f1'].mean()),
+        'avg_ndcg': float(metrics['ndcg'].mean()),
+        'avg_map': float(metrics['average_precision'].mean()),
+        'avg_novelty': float(metrics['novelty'].mean()),
+        'coverage': len(covered[covered < catalogue_size]) / catalogue_size if catalogue_size else 0,
+        'num_users_evaluated': len(recommended)
+    }
+
+def evaluate_population(system, train_df, test_df, k=5, n_workers=None, shard_size=1000):
+    """Score every training user that has relevant test interactions; returns averages and coverage"""
+    started = time.perf_counter()
+    test_df, user_ids = relevant_test_users(train_df, test_df)
+    recommendations = recommend_population(system, user_ids, k, n_workers, shard_size) if user_ids else []
+    results = score_recommendations(recommendations, user_ids, train_df, test_df,
+                                    system.product_store.column('productId'), k)
+    results['seconds'] = time.perf_counter() - started
+    return results
@@ -0,0 +1,188 @@
+# expiry_index.py
+import threading
+from datetime import datetime, date, timedelta
+from pricing import URGENCY_HORIZON_DAYS, calculate_discount
+
+EPOCH = date(1970, 1, 1)
+
+def day_number(value):
+    """Calendar day index of a date/datetime (days since 1970-01-01)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+class RolloverChanges:
+    """Products affected by advancing the index to a new day"""
+
+    def __init__(self, today, retiered, rescored, expired):
+        self.today = today
+        self.retiered = retiered    # {productId: (old discount, new discount)}
+        self.rescored = rescored    # {productId: new days_to_expiry} inside the urgency horizon
+        self.expired = expired      # productIds that expired during the advance
+
+    def __len__(self):
+        return len(self.rescored)
+
+class ExpiryIndex:
+    """Timing wheel of products bucketed by expiry day
+
+    The wheel holds one slot per day for the next `horizon` days; products
+    expiring later wait in an overflow map keyed by day and cascade into
+    the wheel as it turns. Advancing a day only touches the slot falling
+    off the front, the overflow bucket entering at the back and the
+    products inside the urgency horizon, never the whole catalogue.
+    days_to_expiry is counted in calendar days from the current day.
+    """
+
+    def __init__(self, today=None, horizon=URGENCY_HORIZON_DAYS + 2):
+        self.horizon = horizon
+        self.current = day_number(today or datetime.now())
+        self.slots = [set() for _ in range(horizon)]
+        self.overflow = {}
+        self.expired = set()
+        self.bucket_of = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.bucket_of)
+
+    def __contains__(self, product_id):
+        return product_id in self.bucket_of
+
+    def _place(self, product_id, bucket):
+        if bucket < self.current:
+            self.expired.add(product_id)
+        elif bucket < self.current + self.horizon:
+            self.slots[bucket % self.horizon].add(product_id)
+        else:
+            self.overflow.setdefault(bucket, set()).add(product_id)
+
+    def _unplace(self, product_id, bucket):
+        if bucket < self.current:
+            self.expired.discard(product_id)
+        elif bucket < self.current + self.horizon:
+            self.slots[bucket % self.horizon].discard(product_id)
+        else:
+            members = self.overflow.get(bucket)
+            if members is not None:
+                members.discard(product_id)
+                if not members:
+                    del self.overflow[bucket]
+
+    def add(self, product_id, expiry_date):
+        """Insert or move a product; O(1)"""
+        with self._lock:
+            self.remove(product_id)
+            bucket = day_number(expiry_date)
+            self.bucket_of[product_id] = bucket
+            self._place(product_id, bucket)
+
+    def remove(self, product_id):
+        with self._lock:
+            bucket = self.bucket_of.pop(product_id, None)
+            if bucket is not None:
+                self._unplace(product_id, bucket)
+
+    def days_to_expiry(self, product_id):
+        bucket = self.bucket_of.get(product_id)
+        return None if bucket is None else bucket - self.current
+
+    def _bucket_members(self, bucket):
+        if bucket < self.current + self.horizon:
+            return self.slots[bucket % self.horizon]
+        return self.overflow.get(bucket, ())
+
+    def expiring_within(self, days, include_expired=False):
+        """Product ids with 0 <= days_to_expiry <= days, as a scan over day buckets"""
+        with self._lock:
+            result = list(self.expired) if include_expired else []
+            for bucket in range(self.current, self.current + days + 1):
+                result.extend(self._bucket_members(bucket))
+            return result
+
+    def advance(self, today=None):
+        """Turn the wheel to `today` and report the products whose pricing changed"""
+        with self._lock:
+            target = day_number(today or datetime.now())
+            if target <= self.current:
+                return RolloverChanges(self.current, {}, {}, [])
+
+            start = self.current
+            steps = target - start
+            # Everything whose urgency or tier can move sits within this window
+            window = [(bucket, list(self._bucket_members(bucket)))
+                      for bucket in range(start, start + URGENCY_HORIZON_DAYS + steps + 1)]
+
+            expired = []
+            for _ in range(steps):
+                leaving = self.slots[self.current % self.horizon]
+                expired.extend(leaving)
+                self.expired.update(leaving)
+                leaving.clear()
+
+                self.current += 1
+                entering = self.current + self.horizon - 1
+                members = self.overflow.pop(entering, None)
+                if members:
+                    self.slots[entering % self.horizon].update(members)
+
+            retiered = {}
+            rescored = {}
+            for bucket, members in window:
+                old_days = bucket - start
+                new_days = bucket - self.current
+                old_discount = calculate_discount(old_days)
+                new_discount = calculate_discount(new_days)
+                for product_id in members:
+                    if new_days <= URGENCY_HORIZON_DAYS:
+                        rescored[product_id] = new_days
+                    if old_discount != new_discount:
+                        retiered[product_id] = (old_discount, new_discount)
+
+            return RolloverChanges(self.current, retiered, rescored, expired)
+
+class ExpiryRollover:
+    """Background thread that advances an ExpiryIndex at each local midnight"""
+
+    def __init__(self, index, on_rollover):
+        self.index = index
+        self.on_rollover = on_rollover
+        self.last_rollover = None
+        self.last_error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _seconds_until_midnight(self):
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return max((midnight - now).total_seconds(), 1)
+
+    def run_once(self, now=None):
+        now = now or datetime.now()
+        changes = self.index.advance(now)
+        if len(changes):
+            self.on_rollover(changes, now)
+        self.last_rollover = now
+        return changes
+
+    def _run(self):
+        while not self._stopped.wait(self._seconds_until_midnight()):
+            try:
+                changes = self.run_once()
+                print(f"🗓️ Expiry rollover: {len(changes.retiered)} products re-tiered, "
+                      f"{len(changes.rescored)} rescored")
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Expiry rollover failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='expiry-rollover', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
@@ -1,8 +1,18 @@
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 from dotenv import load_dotenv
+from id_dictionary import IdDictionary
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
+# User and product indices are kept across rebuilds and restarts
+ID_DICTIONARY_DIR = os.getenv("ID_DICTIONARY_DIR", "id_dictionaries")
+os.makedirs(ID_DICTIONARY_DIR, exist_ok=True)
+user_dictionary = IdDictionary.load(os.path.join(ID_DICTIONARY_DIR, 'users.json'))
+product_dictionary = IdDictionary.load(os.path.join(ID_DICTIONARY_DIR, 'products.json'))
+
+def save_id_dictionaries():
+    user_dictionary.save(os.path.join(ID_DICTIONARY_DIR, 'users.json'))
+    product_dictionary.save(os.path.join(ID_DICTIONARY_DIR, 'products.json'))
 # Initialize the system
 mongo_handler = MongoDBHandler()
 
@@ -17,7 +27,11 @@ if products_df.empty or interactions_df.empty:
     mongo_handler.save_interactions(interactions_df)
 
 # Initialize recommendation system
-rec_system = HybridRecommendationSystem(products_df, interactions_df)
+rec_system = HybridRecommendationSystem(products_df, interactions_df,
+                                        user_dictionary=user_dictionary, product_dictionary=product_dictionary)
+save_id_dictionaries()
+# Interactions recorded since the model last took new events in
+pending_interactions = []
 
 @app.route('/api/recommendations/<user_id>')
 def get_recommendations(user_id):
@@ -26,8 +40,11 @@ def get_recommendations(user_id):
         top_k = request.args.get('top_k', 10, type=int)
         rec_type = request.args.get('type', 'hybrid')
         
+        stage_report = None
         if rec_type == 'hybrid':
             recs_df = rec_system.recommend_hybrid(user_id, top_k=top_k)
+        elif rec_type == 'two_stage':
+            recs_df, stage_report = rec_system.recommend_two_stage(user_id, top_k=top_k, return_report=True)
         elif rec_type == 'clearance':
             urgency_threshold = request.args.get('urgency_threshold', 7, type=int)
             recs_df = rec_system.recommend_clearance_priority(
@@ -62,13 +79,16 @@ def get_recommendations(user_id):
         # Cache recommendations
         mongo_handler.cache_recommendations(user_id, recommendations, rec_type)
         
-        return jsonify({
+        response = {
             'user_id': user_id,
             'type': rec_type,
             'recommendations': recommendations,
             'count': len(recommendations),
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if stage_report:
+            response['stages'] = stage_report
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -102,7 +122,7 @@ def add_interaction():
         mongo_handler.add_interaction(user_id, product_id, action_type)
         
         # Update in-memory data
-        global interactions_df, rec_system
+        global interactions_df
         new_interaction = pd.DataFrame([{
             'userId': user_id,
             'productId': product_id,
@@ -110,10 +130,14 @@ def add_interaction():
             'timestamp': datetime.now()
         }])
         interactions_df = pd.concat([interactions_df, new_interaction], ignore_index=True)
+        pending_interactions.append(new_interaction)
         
-        # Reinitialize recommendation system periodically (every 10 interactions)
-        if len(interactions_df) % 10 == 0:
-            rec_system = HybridRecommendationSystem(products_df, interactions_df)
+        # Fold new interactions into the model periodically (every 10 interactions); only
+        # the new events are weighted, the decayed history is rescaled lazily
+        if len(pending_interactions) >= 10:
+            rec_system.add_interactions(pd.concat(pending_interactions, ignore_index=True))
+            pending_interactions.clear()
+            save_id_dictionaries()
         
         return jsonify({
             'status': 'success',
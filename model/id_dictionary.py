@@ -0,0 +1,78 @@
+# id_dictionary.py
+import json
+import os
+import threading
+import numpy as np
+
+class IdDictionary:
+    """Append-only two-way map between external ids and dense int codes
+
+    A new id gets the next free code and keeps it for as long as the
+    dictionary lives, so models rebuilt on a longer history keep the same
+    rows and columns and nothing already encoded has to be re-encoded.
+    Both directions are O(1): a dict from id to code and a list from code
+    to id. `save`/`load` keep the mapping across restarts.
+    """
+
+    def __init__(self, ids=()):
+        self.codes = {}
+        self.ids = []
+        self._ids_array = None
+        self._lock = threading.Lock()
+        self.add_many(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, external_id):
+        return external_id in self.codes
+
+    def add(self, external_id):
+        """Code of an id, assigning the next one if it is new"""
+        code = self.codes.get(external_id)
+        if code is None:
+            with self._lock:
+                code = self.codes.setdefault(external_id, len(self.ids))
+                if code == len(self.ids):
+                    self.ids.append(external_id)
+                    self._ids_array = None
+        return code
+
+    def add_many(self, external_ids):
+        return np.array([self.add(external_id) for external_id in external_ids], dtype=np.int32)
+
+    def code(self, external_id, default=None):
+        return self.codes.get(external_id, default)
+
+    def codes_for(self, external_ids, default=-1):
+        """Codes of the given ids without adding any; `default` for unknown ids"""
+        return np.array([self.codes.get(external_id, default) for external_id in external_ids], dtype=np.int32)
+
+    def id(self, code):
+        return self.ids[code]
+
+    def ids_array(self):
+        """Ids as an array indexed by code, for decoding many codes at once"""
+        if self._ids_array is None or len(self._ids_array) != len(self.ids):
+            # Integer ids stay an integer array; anything else becomes objects
+            ids = np.array(self.ids)
+            self._ids_array = ids if ids.dtype.kind in 'iu' else np.array(self.ids, dtype=object)
+        return self._ids_array
+
+    def ids_for(self, codes):
+        return self.ids_array()[np.asarray(codes, dtype=np.intp)]
+
+    def save(self, path):
+        """Write the ids in code order, atomically"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.ids, f, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Dictionary saved at `path`, or an empty one if there is none yet"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
@@ -5,6 +5,7 @@ import random
 import os
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
+from pricing import calculate_discount, urgency_score_for_days
 
 
 # Load environment variables
@@ -60,6 +61,8 @@ def init_database():
         products_collection = db['products']
         interactions_collection = db['interactions']
         users_collection = db['users']
+        markdown_proposals_collection = db['markdown_proposals']
+        sell_through_collection = db['sell_through']
         
         print("🗄️ Setting up database collections...")
         
@@ -75,15 +78,27 @@ def init_database():
             products_collection.create_index([('productId', 1)], unique=True)
             products_collection.create_index([('category', 1)])
             products_collection.create_index([('days_to_expiry', 1)])
+            products_collection.create_index([('expiryDate', 1)])
             products_collection.create_index([('urgency_score', -1)])
             products_collection.create_index([('status', 1)])
             
             interactions_collection.create_index([('userId', 1)])
             interactions_collection.create_index([('productId', 1)])
             interactions_collection.create_index([('timestamp', -1)])
+            # Supports coalescing repeated events inside a time window
+            interactions_collection.create_index([
+                ('userId', 1), ('productId', 1), ('actionType', 1), ('timestamp', -1)
+            ])
+            # Spooled events merged into a coalesced interaction, for idempotent replays
+            interactions_collection.create_index([('event_ids', 1)], sparse=True)
             
             users_collection.create_index([('email', 1)], unique=True)
             
+            markdown_proposals_collection.create_index([('run_id', 1), ('expected_revenue', -1)])
+            markdown_proposals_collection.create_index([('created_at', -1)])
+            
+            sell_through_collection.create_index([('scope', 1), ('key', 1)])
+            
             print("✅ Database indexes created successfully!")
         except Exception as e:
             print(f"⚠️ Index creation warning (may already exist): {e}")
@@ -121,18 +136,8 @@ def init_database():
             price = round(random.uniform(5, 100), 2)
             
             # Calculate discount based on expiry
-            if days_to_expiry <= 3:
-                discount = 0.4
-            elif days_to_expiry <= 7:
-                discount = 0.3
-            elif days_to_expiry <= 14:
-                discount = 0.2
-            elif days_to_expiry <= 30:
-                discount = 0.1
-            else:
-                discount = 0
-            
-            urgency_score = max(0, (30 - days_to_expiry) / 30)
+            discount = calculate_discount(days_to_expiry)
+            urgency_score = urgency_score_for_days(days_to_expiry)
             
             product = {
                 'productId': f'PROD_{i+1:04d}',
@@ -186,6 +191,7 @@ def init_database():
                 'actionType': random.choices(actions, weights=action_weights)[0],
                 'timestamp': datetime.utcnow() - timedelta(days=random.randint(0, 30)),
                 'session_id': f'session_{random.randint(1000, 9999)}',
+                'updated_at': datetime.now(),
                 'metadata': {
                     'source': 'web_app',
                     'device': random.choice(['desktop', 'mobile', 'tablet'])
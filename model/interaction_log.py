@@ -0,0 +1,151 @@
+# interaction_log.py
+from itertools import islice
+import numpy as np
+import pandas as pd
+from id_dictionary import IdDictionary
+
+# Every actionType the API accepts; new actions go at the end so stored codes keep their meaning
+ACTION_TYPES = ['viewed', 'added', 'skipped', 'bought', 'favorited', 'shared']
+ACTION_CODES = {action: code for code, action in enumerate(ACTION_TYPES)}
+# Matrix weight of each action, indexed by action code
+ACTION_WEIGHTS = np.array([1, 2, -0.5, 3, 2.5, 1.5], dtype=np.float32)
+assert len(ACTION_WEIGHTS) == len(ACTION_TYPES), "Every action type needs a weight"
+
+def epoch_seconds(timestamps):
+    """int32 seconds since 1970 (UTC for aware values; fits until 2038) and a mask of parsed values
+
+    Accepts datetimes, datetime64 and ISO 8601 strings, mixed freely.
+    """
+    timestamps = pd.to_datetime(pd.Series(timestamps), format='ISO8601')
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+    parsed = timestamps.notna().values
+    seconds = timestamps.values.astype('datetime64[s]').astype(np.int64)
+    return np.where(parsed, seconds, 0).astype(np.int32), parsed
+
+def encode_ids(values, dictionary):
+    """int32 codes of a batch of ids, adding new ones to `dictionary`; -1 for missing ids"""
+    local_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    # The trailing -1 is picked by factorize's -1 for missing values
+    global_codes = np.append(dictionary.add_many(uniques), np.int32(-1))
+    return global_codes[local_codes]
+
+def encode_events(user_ids, product_ids, action_types, timestamps, counts, users, products):
+    """Compact columns for one batch of raw events, dropping events that cannot be encoded
+
+    Returns (user_codes, product_codes, action_codes, timestamps, counts);
+    `counts` may be None or contain None for plain events.
+    """
+    action_codes = pd.Series(action_types, dtype=object).map(ACTION_CODES).fillna(-1).values.astype(np.int8)
+    if counts is None:
+        counts = np.ones(len(action_codes), dtype=np.int32)
+    else:
+        counts = pd.Series(counts, dtype=object).fillna(1).values.astype(np.int32)
+    seconds, parsed = epoch_seconds(timestamps)
+    user_ids = np.asarray(user_ids, dtype=object)
+    product_ids = np.asarray(product_ids, dtype=object)
+    # Drop bad events before encoding so their ids never enter the (persisted) dictionaries
+    valid = pd.notna(user_ids) & pd.notna(product_ids) & (action_codes >= 0) & parsed
+    return (encode_ids(user_ids[valid], users), encode_ids(product_ids[valid], products),
+            action_codes[valid], seconds[valid], counts[valid])
+
+class InteractionLog:
+    """Interaction history as parallel compact arrays
+
+    One event costs 17 bytes: int32 user and product codes, an int8 action
+    code, int32 epoch seconds and an int32 count (coalesced events stand
+    for several raw ones). 50M events take about 850 MB, where a DataFrame
+    of Python strings and Timestamps takes over 7 GB. Codes come from the
+    append-only `users` and `products` IdDictionaries, which can be passed
+    in so a rebuilt log keeps the codes of an earlier one. Events with an
+    unknown action type, a missing id or no timestamp are dropped.
+    """
+
+    def __init__(self, user_codes, product_codes, action_codes, timestamps, counts, users, products):
+        self.user_codes = user_codes
+        self.product_codes = product_codes
+        self.action_codes = action_codes
+        self.timestamps = timestamps
+        self.counts = counts
+        self.users = users
+        self.products = products
+
+    def __len__(self):
+        return len(self.action_codes)
+
+    @property
+    def user_ids(self):
+        """User ids indexed by code"""
+        return self.users.ids_array()
+
+    @property
+    def product_ids(self):
+        """Product ids indexed by code"""
+        return self.products.ids_array()
+
+    @classmethod
+    def from_frame(cls, interactions_df, users=None, products=None):
+        return cls.from_chunks([interactions_df], users, products)
+
+    @classmethod
+    def from_documents(cls, documents, chunk_size=100_000, users=None, products=None):
+        """Build from an iterable of interaction dicts (e.g. a MongoDB cursor), chunk_size at a time"""
+        documents = iter(documents)
+        chunks = iter(lambda: list(islice(documents, chunk_size)), [])
+        return cls.from_chunks((pd.DataFrame(chunk) for chunk in chunks), users, products)
+
+    @classmethod
+    def from_chunks(cls, frames, users=None, products=None):
+        """Encode DataFrame chunks one at a time so only one chunk is ever held as objects"""
+        users = users if users is not None else IdDictionary()
+        products = products if products is not None else IdDictionary()
+        parts = []
+        for frame in frames:
+            if frame.empty:
+                continue
+            parts.append(encode_events(frame['userId'].values, frame['productId'].values,
+                                       frame['actionType'].values, frame['timestamp'].values,
+                                       frame['count'].values if 'count' in frame.columns else None,
+                                       users, products))
+
+        if parts:
+            columns = [np.concatenate(column) for column in zip(*parts)]
+        else:
+            columns = [np.empty(0, dtype=dtype) for dtype in (np.int32, np.int32, np.int8, np.int32, np.int32)]
+        return cls(*columns, users, products)
+
+    def weights(self, action_weights=ACTION_WEIGHTS):
+        """Matrix weight of every event: action weight x count"""
+        return action_weights[self.action_codes] * self.counts
+
+    def action_mask(self, actions):
+        return np.isin(self.action_codes, [ACTION_CODES[action] for action in actions])
+
+    def select(self, events):
+        """A log of a subset of events (mask or positions) sharing the id arrays"""
+        return InteractionLog(self.user_codes[events], self.product_codes[events], self.action_codes[events],
+                              self.timestamps[events], self.counts[events], self.users, self.products)
+
+    def daily_rates(self, action='bought'):
+        """Events of one action per day for each product over the span of the log"""
+        if not len(self):
+            return {}
+        mask = self.action_codes == ACTION_CODES[action]
+        totals = np.bincount(self.product_codes[mask], weights=self.counts[mask], minlength=len(self.products))
+        span_days = max(int(self.timestamps.max() - self.timestamps.min()) // 86400, 1)
+        sold = np.flatnonzero(totals)
+        return dict(zip(self.product_ids[sold].tolist(), (totals[sold] / span_days).tolist()))
+
+    def memory_bytes(self):
+        return sum(array.nbytes for array in (self.user_codes, self.product_codes, self.action_codes,
+                                              self.timestamps, self.counts))
+
+    def to_frame(self):
+        """Decode back to the userId/productId/actionType/timestamp/count DataFrame"""
+        return pd.DataFrame({
+            'userId': self.user_ids[self.user_codes],
+            'productId': self.product_ids[self.product_codes],
+            'actionType': pd.Categorical.from_codes(self.action_codes, ACTION_TYPES),
+            'timestamp': self.timestamps.astype('datetime64[s]'),
+            'count': self.counts
+        })
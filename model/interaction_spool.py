@@ -0,0 +1,216 @@
+# interaction_spool.py
+import os
+import threading
+from bson import json_util
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+OFFSET_SUFFIX = '.offset'
+
+class InteractionSpool:
+    """Append-only on-disk log of interactions drained to MongoDB in the background
+
+    Requests append a JSON line to the active segment and return right away;
+    a drainer thread seals the active segment, replays sealed segments to
+    `sink` in batches and deletes each segment once it is fully written.
+    Progress inside a segment is checkpointed in a small .offset file, so a
+    restart resumes where the last successful batch ended. Delivery is
+    at-least-once: give documents an `_id` before appending so replays of
+    plain inserts are idempotent.
+
+    A spool directory must only be used by one process at a time.
+    """
+
+    def __init__(self, directory, sink, segment_max_bytes=4 * 1024 * 1024,
+                 batch_size=500, flush_interval=1.0, max_backoff=60.0, fsync=False):
+        self.directory = directory
+        self.sink = sink
+        self.segment_max_bytes = segment_max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.appended = 0
+        self.drained = 0
+        self.failures = 0
+        self.last_error = None
+        self._pending_appends = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        existing = self._segment_numbers()
+        self._active_number = (existing[-1] + 1) if existing else 0
+        self._active = None
+        self._active_bytes = 0
+
+    # Segment bookkeeping
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'{SEGMENT_PREFIX}{number:012d}{SEGMENT_SUFFIX}')
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _open_active(self):
+        self._active = open(self._segment_path(self._active_number), 'ab')
+        self._active_bytes = self._active.tell()
+
+    def _seal_active(self):
+        """Close the active segment so the drainer can pick it up (caller holds _lock)"""
+        if self._active is None:
+            return
+        self._active.close()
+        self._active = None
+        self._active_number += 1
+        self._active_bytes = 0
+
+    # Producer side
+    def append(self, doc):
+        """Durably queue one document; returns once it is in the segment file"""
+        line = (json_util.dumps(doc) + '\n').encode('utf-8')
+
+        with self._lock:
+            if self._active is None:
+                self._open_active()
+            self._active.write(line)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+
+            self._active_bytes += len(line)
+            self.appended += 1
+            self._pending_appends += 1
+
+            if self._active_bytes >= self.segment_max_bytes:
+                self._seal_active()
+
+            if self._pending_appends >= self.batch_size:
+                self._wakeup.set()
+
+    def append_many(self, docs):
+        for doc in docs:
+            self.append(doc)
+
+    # Drainer side
+    def _read_offset(self, number):
+        try:
+            with open(self._segment_path(number) + OFFSET_SUFFIX) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_offset(self, number, offset):
+        path = self._segment_path(number) + OFFSET_SUFFIX
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+        os.replace(tmp_path, path)
+
+    def _remove_segment(self, number):
+        for path in (self._segment_path(number), self._segment_path(number) + OFFSET_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _drain_segment(self, number):
+        offset = self._read_offset(number)
+        batch = []
+        batch_end = offset
+
+        with open(self._segment_path(number), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                batch_end += len(line)
+                try:
+                    batch.append(json_util.loads(line.decode('utf-8')))
+                except ValueError:
+                    # A torn final line left behind by a crash
+                    print(f"⚠️ Skipping corrupt spool record in segment {number}")
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    self.sink(batch)
+                    self.drained += len(batch)
+                    self._write_offset(number, batch_end)
+                    batch = []
+
+        if batch:
+            self.sink(batch)
+            self.drained += len(batch)
+
+        self._remove_segment(number)
+
+    def drain_once(self):
+        """Replay everything spooled so far; raises if the sink fails"""
+        with self._drain_lock:
+            with self._lock:
+                self._seal_active()
+                self._pending_appends = 0
+                sealed = [n for n in self._segment_numbers() if n < self._active_number]
+
+            for number in sealed:
+                self._drain_segment(number)
+
+    def _run(self):
+        backoff = self.flush_interval
+        while not self._stopped.is_set():
+            self._wakeup.wait(backoff)
+            self._wakeup.clear()
+            try:
+                self.drain_once()
+                backoff = self.flush_interval
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(max(backoff, self.flush_interval) * 2, self.max_backoff)
+                print(f"❌ Interaction spool drain failed, retrying in {backoff:.0f}s: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='interaction-spool', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, drain=True):
+        """Stop the drainer, optionally making one last attempt to empty the spool"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.max_backoff)
+        if drain:
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"⚠️ Interaction spool left undrained on shutdown: {e}")
+        with self._lock:
+            self._seal_active()
+
+    def stats(self):
+        pending_bytes = 0
+        segments = self._segment_numbers()
+        for number in segments:
+            try:
+                pending_bytes += os.path.getsize(self._segment_path(number)) - self._read_offset(number)
+            except FileNotFoundError:
+                pass
+
+        return {
+            'appended': self.appended,
+            'drained': self.drained,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'pending_segments': len(segments),
+            'pending_bytes': pending_bytes,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
@@ -0,0 +1,201 @@
+# markdown_optimizer.py
+import os
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pymongo
+from bson import ObjectId
+from dotenv import load_dotenv
+from pricing import URGENCY_HORIZON_DAYS, days_to_expiry, discounts
+from sell_through import SellThroughEstimator, time_constant_days
+
+# Candidate discounts evaluated for every SKU
+DISCOUNT_GRID = np.round(np.arange(0.0, 0.75, 0.05), 2)
+# Constant price elasticity of demand: a price cut to (1 - d) multiplies
+# the sell-through rate by (1 - d) ** -elasticity
+DEFAULT_ELASTICITY = 2.0
+# Units/day assumed for products in categories with no sales at all
+DEFAULT_BASE_RATE = 0.1
+# Sales are planned over this many days; stock of products that outlive
+# it is carried over and valued at this fraction of the full price
+PLANNING_HORIZON_DAYS = URGENCY_HORIZON_DAYS
+CARRYOVER_VALUE = 0.9
+
+def demand_lift(discount, elasticity=DEFAULT_ELASTICITY):
+    return (1.0 - np.asarray(discount, dtype=np.float64)) ** -elasticity
+
+def selling_days(days, horizon=PLANNING_HORIZON_DAYS):
+    """Days left to sell within the planning horizon; a product expiring today still has today"""
+    days = np.asarray(days, dtype=np.float64)
+    return np.clip(days + 1, 0.0, horizon)
+
+def carryover_value(days, horizon=PLANNING_HORIZON_DAYS):
+    """Value per unit of full price of stock left at the end of the horizon"""
+    return np.where(np.asarray(days) + 1 > horizon, CARRYOVER_VALUE, 0.0)
+
+def expected_revenue(prices, stock, days, base_rate, discount, elasticity=DEFAULT_ELASTICITY):
+    """Expected revenue and units sold within the planning horizon at a given discount per SKU"""
+    rate = np.asarray(base_rate, dtype=np.float64) * demand_lift(discount, elasticity)
+    units = np.minimum(np.asarray(stock, dtype=np.float64), rate * selling_days(days))
+    return np.asarray(prices, dtype=np.float64) * (1.0 - np.asarray(discount)) * units, units
+
+def estimate_base_rates(categories, units_sold, window_days, prior_days=7.0, current_discount=0.0,
+                        elasticity=DEFAULT_ELASTICITY):
+    """Undiscounted units/day per product, shrunk towards its category rate
+
+    Observed sales happened at `current_discount`, so they are first
+    divided by its demand lift. A product with little history borrows
+    `prior_days` worth of its category's average rate, so new or slow
+    products get a sensible estimate instead of zero.
+    """
+    units_sold = np.asarray(units_sold, dtype=np.float64) / demand_lift(current_discount, elasticity)
+    units_sold = pd.Series(units_sold)
+    categories = pd.Series(np.asarray(categories))
+    category_rate = units_sold.groupby(categories).transform('mean') / window_days
+    category_rate = category_rate.where(category_rate > 0, DEFAULT_BASE_RATE).values
+    return (units_sold.values + prior_days * category_rate) / (window_days + prior_days)
+
+def optimize_markdowns(prices, stock, days, base_rate, elasticity=DEFAULT_ELASTICITY,
+                       grid=DISCOUNT_GRID, max_discount=None, chunk_size=250_000):
+    """Pick the value-maximizing discount from `grid` for every SKU
+
+    Sales are modelled as min(stock, rate * (1 - d) ** -e * days) over the
+    days left before expiry or the end of the planning horizon. Stock that
+    expires unsold is worth nothing, stock that outlives the horizon keeps
+    CARRYOVER_VALUE of its price, so short-dated overstock gets the
+    smallest discount that clears it while long-dated stock is left alone.
+    The SKU x discount matrix is evaluated in chunks to bound memory.
+    Returns a dict of arrays: discount, expected_units, expected_revenue.
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    if max_discount is not None:
+        grid = grid[grid <= max_discount]
+
+    prices = np.asarray(prices, dtype=np.float64)
+    stock = np.asarray(stock, dtype=np.float64)
+    horizon_units = np.asarray(base_rate, dtype=np.float64) * selling_days(days)
+    carryover = prices * carryover_value(days)
+    lift = demand_lift(grid, elasticity)
+    keep = 1.0 - grid
+
+    n = len(prices)
+    best = np.empty(n, dtype=np.intp)
+    best_units = np.empty(n)
+    best_revenue = np.empty(n)
+    for start in range(0, n, chunk_size):
+        rows = slice(start, start + chunk_size)
+        units = np.minimum(stock[rows, None], horizon_units[rows, None] * lift)
+        revenue = prices[rows, None] * keep * units
+        value = revenue + carryover[rows, None] * (stock[rows, None] - units)
+        # argmax returns the first maximum, i.e. the shallowest discount on ties
+        choice = value.argmax(axis=1)
+        picked = np.arange(len(choice))
+        best[rows] = choice
+        best_units[rows] = units[picked, choice]
+        best_revenue[rows] = revenue[picked, choice]
+
+    return {
+        'discount': grid[best],
+        'expected_units': best_units,
+        'expected_revenue': best_revenue
+    }
+
+def load_units_sold(interactions_collection, since):
+    """Units bought per product since `since`, aggregated server-side"""
+    pipeline = [
+        {'$match': {'actionType': 'bought', 'timestamp': {'$gte': since}}},
+        {'$group': {'_id': '$productId', 'units': {'$sum': {'$ifNull': ['$quantity', 1]}}}}
+    ]
+    return {row['_id']: row['units'] for row in interactions_collection.aggregate(pipeline)}
+
+def run_markdown_job(products_collection, interactions_collection, proposals_collection,
+                     now=None, lookback_days=28, elasticity=DEFAULT_ELASTICITY,
+                     max_discount=None, batch_size=10000, sell_through=None):
+    """Optimize discounts for every active product in stock and store the proposals
+
+    Sell-through comes from `sell_through` (a SellThroughEstimator) when
+    given, otherwise from bought interactions in the last `lookback_days`.
+    Only products whose proposed discount differs from their current one
+    are written; proposals are left with status 'proposed' for review and
+    never touch the products collection.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+    run_id = str(ObjectId())
+
+    products = pd.DataFrame(list(products_collection.find(
+        {'status': 'active', 'stock': {'$gt': 0}, 'expiryDate': {'$exists': True}},
+        {'_id': 0, 'productId': 1, 'category': 1, 'price': 1, 'stock': 1, 'expiryDate': 1, 'discount': 1}
+    )))
+    summary = {'run_id': run_id, 'created_at': now, 'products': len(products), 'proposals': 0,
+               'expected_revenue': 0.0, 'current_expected_revenue': 0.0}
+    if products.empty:
+        summary['seconds'] = time.perf_counter() - started
+        return summary
+
+    if sell_through is not None:
+        # A smoothed rate is worth about one time constant of history
+        window_days = time_constant_days(sell_through.half_life_days)
+        rates = sell_through.product_rates(products['productId'].tolist())
+        units_sold = {product_id: rate * window_days for product_id, rate in rates.items()}
+    else:
+        window_days = lookback_days
+        units_sold = load_units_sold(interactions_collection, now - timedelta(days=lookback_days))
+    days = days_to_expiry(products['expiryDate'].values, now)
+    if 'discount' in products.columns:
+        current = products['discount'].fillna(pd.Series(discounts(days))).values.astype(np.float64)
+    else:
+        current = discounts(days)
+    base_rate = estimate_base_rates(
+        products['category'].fillna('unknown').values,
+        products['productId'].map(units_sold).fillna(0).values,
+        window_days,
+        current_discount=current,
+        elasticity=elasticity
+    )
+    prices = products['price'].values.astype(np.float64)
+    stock = products['stock'].values.astype(np.float64)
+
+    result = optimize_markdowns(prices, stock, days, base_rate, elasticity, max_discount=max_discount)
+    current_revenue, _ = expected_revenue(prices, stock, days, base_rate, current, elasticity)
+
+    changed = np.flatnonzero(~np.isclose(result['discount'], current))
+    proposals = [{
+        'run_id': run_id,
+        'productId': products['productId'].iat[i],
+        'category': products['category'].iat[i],
+        'current_discount': float(current[i]),
+        'proposed_discount': float(result['discount'][i]),
+        'proposed_price': round(float(prices[i] * (1 - result['discount'][i])), 2),
+        'days_to_expiry': int(days[i]),
+        'stock': int(stock[i]),
+        'sell_through_rate': float(base_rate[i]),
+        'expected_units': float(result['expected_units'][i]),
+        'expected_revenue': float(result['expected_revenue'][i]),
+        'current_expected_revenue': float(current_revenue[i]),
+        'status': 'proposed',
+        'created_at': now
+    } for i in changed]
+
+    for i in range(0, len(proposals), batch_size):
+        proposals_collection.insert_many(proposals[i:i + batch_size], ordered=False)
+
+    summary.update({
+        'proposals': len(proposals),
+        'expected_revenue': float(result['expected_revenue'].sum()),
+        'current_expected_revenue': float(current_revenue.sum()),
+        'seconds': time.perf_counter() - started
+    })
+    return summary
+
+if __name__ == '__main__':
+    load_dotenv()
+    client = pymongo.MongoClient(os.getenv("MONGODB_URI"))
+    db = client['walmart_clearance']
+    summary = run_markdown_job(db['products'], db['interactions'], db['markdown_proposals'],
+                               sell_through=SellThroughEstimator(db['sell_through']))
+    print(f"✅ Markdown run {summary['run_id']}: {summary['proposals']} proposals "
+          f"for {summary['products']} products in {summary['seconds']:.2f}s")
+    print(f"📊 Expected revenue {summary['expected_revenue']:,.2f} "
+          f"vs {summary['current_expected_revenue']:,.2f} at current discounts")
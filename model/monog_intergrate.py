@@ -1,6 +1,10 @@
 from dotenv import load_dotenv
+from coo_loader import format_mb, stream_interactions
+from snapshot_cache import load_collection
 load_dotenv()
 MONGODB_URI = os.getenv(MONGODB_URI)
+# Read collections from a local snapshot, fetching only the delta, when set
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
 class MongoDBHandler:
     def __init__(self, db_name="walmart_clearance"):
         self.client = pymongo.MongoClient(MONGODB_URI)
@@ -22,8 +26,10 @@ class MongoDBHandler:
     def save_interactions(self, interactions_df):
         """Save interactions to MongoDB"""
         interactions_dict = interactions_df.to_dict('records')
+        now = datetime.now()
         for interaction in interactions_dict:
             interaction['timestamp'] = interaction['timestamp'].isoformat()
+            interaction['updated_at'] = now
         
         self.interactions_collection.delete_many({})
         self.interactions_collection.insert_many(interactions_dict)
@@ -31,6 +37,10 @@ class MongoDBHandler:
     
     def load_products(self):
         """Load products from MongoDB"""
+        if SNAPSHOT_DIR:
+            df = load_collection(SNAPSHOT_DIR, self.products_collection, 'products').drop(columns=['_id'], errors='ignore')
+            return df if not df.empty else pd.DataFrame()
+        
         products = list(self.products_collection.find({}, {'_id': 0}))
         if not products:
             return pd.DataFrame()
@@ -41,6 +51,10 @@ class MongoDBHandler:
     
     def load_interactions(self):
         """Load interactions from MongoDB"""
+        if SNAPSHOT_DIR:
+            df = load_collection(SNAPSHOT_DIR, self.interactions_collection, 'interactions').drop(columns=['_id'], errors='ignore')
+            return df if not df.empty else pd.DataFrame()
+        
         interactions = list(self.interactions_collection.find({}, {'_id': 0}))
         if not interactions:
             return pd.DataFrame()
@@ -49,13 +63,21 @@ class MongoDBHandler:
         df['timestamp'] = pd.to_datetime(df['timestamp'])
         return df
     
+    def load_interaction_log(self, batch_size=50_000):
+        """Stream interactions into a compact InteractionLog, one raw batch at a time"""
+        log, stats = stream_interactions(self.interactions_collection, batch_size=batch_size)
+        print(f"Loaded {stats['rows']} interactions at {stats['rows_per_second']:,.0f} rows/s, "
+              f"peak RSS {format_mb(stats['peak_rss_mb'], 0)}")
+        return log
+    
     def add_interaction(self, user_id, product_id, action_type):
         """Add new interaction"""
         interaction = {
             'userId': user_id,
             'productId': product_id,
             'actionType': action_type,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'updated_at': datetime.now()
         }
         self.interactions_collection.insert_one(interaction)
         return True
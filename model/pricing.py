@@ -0,0 +1,76 @@
+# pricing.py
+from bisect import bisect_left
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Discount tiers: products with days_to_expiry <= limit get the discount
+TIER_LIMITS = [3, 7, 14, 30]
+TIER_DISCOUNTS = [0.4, 0.3, 0.2, 0.1, 0.0]  # last entry applies beyond the last limit
+DISCOUNT_TIERS = list(zip(TIER_LIMITS, TIER_DISCOUNTS))
+URGENCY_HORIZON_DAYS = 30
+
+_TIER_LIMITS = np.array(TIER_LIMITS)
+_TIER_DISCOUNTS = np.array(TIER_DISCOUNTS)
+
+# Vectorized catalogue pricing
+def days_to_expiry(expiry_dates, now=None):
+    """Whole days until expiry, floored like timedelta.days, for an array of dates"""
+    now = np.datetime64(now or datetime.now(), 'ms')
+    expiry = np.asarray(pd.to_datetime(expiry_dates), dtype='datetime64[ms]')
+    delta_ms = (expiry - now).astype(np.int64)
+    return np.floor_divide(delta_ms, 86_400_000)
+
+def urgency_scores(days):
+    days = np.asarray(days, dtype=np.float64)
+    return np.maximum(0.0, (URGENCY_HORIZON_DAYS - days) / URGENCY_HORIZON_DAYS)
+
+def discounts(days):
+    return _TIER_DISCOUNTS[np.searchsorted(_TIER_LIMITS, np.asarray(days), side='left')]
+
+def price_catalog(prices, expiry_dates=None, days=None, now=None):
+    """Compute days_to_expiry, urgency_score, discount and discounted_price for many products
+
+    Pass either `expiry_dates` or precomputed `days`. Returns a dict of arrays.
+    """
+    if days is None:
+        days = days_to_expiry(expiry_dates, now)
+    days = np.asarray(days)
+    discount = discounts(days)
+    return {
+        'days_to_expiry': days,
+        'urgency_score': urgency_scores(days),
+        'discount': discount,
+        'discounted_price': np.asarray(prices, dtype=np.float64) * (1 - discount)
+    }
+
+def apply_pricing(products_df, now=None):
+    """Refresh the derived pricing columns of a products DataFrame in place"""
+    if products_df.empty:
+        return products_df
+
+    if 'expiryDate' in products_df.columns:
+        fields = price_catalog(products_df['price'].values, products_df['expiryDate'].values, now=now)
+    else:
+        fields = price_catalog(products_df['price'].values, days=products_df['days_to_expiry'].values)
+
+    for column, values in fields.items():
+        products_df[column] = values
+    return products_df
+
+# Scalar wrappers for single products
+def calculate_urgency_score(expiry_date, now=None):
+    """Return (urgency_score, days_to_expiry) for one expiry date"""
+    if isinstance(expiry_date, str):
+        expiry_date = datetime.fromisoformat(expiry_date.replace('Z', '+00:00'))
+
+    days = (expiry_date - (now or datetime.now())).days
+    urgency_score = max(0, (URGENCY_HORIZON_DAYS - days) / URGENCY_HORIZON_DAYS)
+    return urgency_score, days
+
+def urgency_score_for_days(days):
+    return max(0, (URGENCY_HORIZON_DAYS - days) / URGENCY_HORIZON_DAYS)
+
+def calculate_discount(days_to_expiry):
+    """Discount for one product, using the same tier table as `discounts`"""
+    return TIER_DISCOUNTS[bisect_left(TIER_LIMITS, days_to_expiry)]
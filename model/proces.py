@@ -6,11 +6,13 @@ import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import OneHotEncoder
 from dotenv import load_dotenv
+from snapshot_cache import load_collection
 
 
 # Load environment variables
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
 # Flask app
 app = Flask(__name__)
 
@@ -20,6 +22,12 @@ client = MongoClient(MONGODB_URI)
 
 # Load MongoDB data
 def load_data():
+    if SNAPSHOT_DIR:
+        # Local snapshot plus whatever changed since the last call
+        snapshot_dir = os.path.join(SNAPSHOT_DIR, 'walmartDB')
+        products = load_collection(snapshot_dir, client['walmartDB'].products, 'products')
+        interactions = load_collection(snapshot_dir, client['walmartDB'].interactions, 'interactions')
+        return products, interactions
     products = pd.DataFrame(list(client['walmartDB'].products.find()))
     interactions = pd.DataFrame(list(client['walmartDB'].interactions.find()))
     return products, interactions
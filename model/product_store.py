@@ -0,0 +1,143 @@
+# product_store.py
+import numpy as np
+import pandas as pd
+from id_dictionary import IdDictionary
+
+def missing_values(n, dtype):
+    """Placeholders for rows that lack a column: NaN (integers become floats), NaT or None"""
+    if dtype.kind in 'iuf':
+        return np.full(n, np.nan, dtype=np.float64 if dtype.kind != 'f' else dtype)
+    if dtype.kind in 'mM':
+        return np.full(n, 'NaT', dtype=dtype)
+    return np.full(n, None, dtype=object)
+
+class ProductStore:
+    """Product catalogue as contiguous column arrays on a dense row index
+
+    Every column is one NumPy array, row i of each describing the same
+    product. productId maps to its row through an append-only IdDictionary
+    (row and code are the same, so ids must be unique) and categories are
+    stored as int32 codes into `category_names`. Results are hydrated by
+    fancy indexing a handful of rows, so serving a request never filters,
+    copies or sorts a catalogue-sized DataFrame. One instance is shared by
+    the filters of a HybridRecommendationSystem.
+    """
+
+    def __init__(self, products_df=None):
+        self.columns = {}
+        self.column_names = []
+        self.ids = IdDictionary()
+        self.categories = IdDictionary()
+        self.category_codes = np.empty(0, dtype=np.int32)
+        # Bumped by every write, so derived views (e.g. a cached frame) know when they are stale
+        self.version = 0
+        if products_df is not None:
+            self.add_products(products_df)
+
+    def __len__(self):
+        return len(self.category_codes)
+
+    @property
+    def category_names(self):
+        """Category names indexed by code"""
+        return self.categories.ids_array()
+
+    def __contains__(self, product_id):
+        return product_id in self.ids
+
+    def add_products(self, products_df):
+        """Add products, updating the rows of ids already in the store; returns their rows
+        
+        A productId repeated within products_df is taken from its last row,
+        as a later dict entry would overwrite an earlier one.
+        """
+        self.version += 1
+        products_df = products_df.drop_duplicates('productId', keep='last')
+        existing = self.rows(products_df['productId'].tolist())
+        known = existing >= 0
+        if known.any():
+            self._update_rows(existing[known], products_df[known])
+        if not known.all():
+            self._append(products_df[~known])
+        return self.rows(products_df['productId'].tolist())
+
+    def _update_rows(self, rows, products_df):
+        """Overwrite the given rows in place with the columns products_df carries"""
+        for name in products_df.columns:
+            if name == 'category':
+                self.category_codes = self.category_codes.copy()
+                self.category_codes[rows] = self.categories.add_many(products_df['category'].fillna('Unknown'))
+                continue
+            values = products_df[name].to_numpy()
+            if name not in self.columns:
+                self.column_names.append(name)
+                self.columns[name] = missing_values(len(self), values.dtype)
+            column = self.columns[name]
+            # Columns may be read-only views of shared memory, so write to a copy
+            if not np.can_cast(values.dtype, column.dtype, casting='same_kind'):
+                column = column.astype(np.result_type(column.dtype, values.dtype))
+            else:
+                column = column.copy()
+            column[rows] = values
+            self.columns[name] = column
+
+    def _append(self, products_df):
+        start, n_new = len(self), len(products_df)
+        for name in products_df.columns:
+            if name not in self.column_names:
+                self.column_names.append(name)
+            if name == 'category':
+                continue
+            values = products_df[name].to_numpy()
+            if name in self.columns:
+                values = np.concatenate([self.columns[name], values])
+            elif start:
+                values = np.concatenate([missing_values(start, values.dtype), values])
+            self.columns[name] = np.ascontiguousarray(values)
+        for name in self.columns.keys() - set(products_df.columns):
+            # Columns the new products do not carry stay missing for their rows
+            self.columns[name] = np.concatenate([self.columns[name], missing_values(n_new, self.columns[name].dtype)])
+
+        categories = products_df['category'].fillna('Unknown') if 'category' in products_df.columns else ['Unknown'] * n_new
+        codes = self.categories.add_many(categories)
+        self.category_codes = np.concatenate([self.category_codes, codes])
+
+        self.ids.add_many(self.columns['productId'][start:].tolist())
+
+    def column(self, name):
+        if name == 'category':
+            return self.category_names[self.category_codes]
+        return self.columns[name]
+
+    def set_column(self, name, values):
+        values = np.ascontiguousarray(values)
+        if len(values) != len(self):
+            raise ValueError(f"Column '{name}' has {len(values)} values for {len(self)} products")
+        if name not in self.column_names:
+            self.column_names.append(name)
+        self.columns[name] = values
+        self.version += 1
+
+    def row(self, product_id):
+        """Row of one product, or None if it is not in the store"""
+        return self.ids.code(product_id)
+
+    def rows(self, product_ids):
+        """Rows of the given products, -1 where a product is unknown"""
+        return self.ids.codes_for(product_ids).astype(np.intp)
+
+    def codes_for(self, categories):
+        """Category codes of the given names, skipping names never seen"""
+        codes = self.categories.codes_for(categories)
+        return codes[codes >= 0]
+
+    def hydrate(self, rows, **extra_columns):
+        """DataFrame of the given rows, in that order, plus any extra per-row columns"""
+        rows = np.asarray(rows, dtype=np.intp)
+        data = {name: (self.category_names[self.category_codes[rows]] if name == 'category'
+                       else self.columns[name][rows]) for name in self.column_names}
+        data.update(extra_columns)
+        return pd.DataFrame(data, index=rows)
+
+    def to_frame(self):
+        return self.hydrate(np.arange(len(self)))
@@ -3,8 +3,6 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.feature_extraction.text import TfidfVectorizer
 from scipy.sparse import csr_matrix
 from sklearn.metrics import precision_score, recall_score, f1_score
 import pymongo
@@ -12,6 +10,17 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
 import warnings
+from pricing import calculate_discount, days_to_expiry, urgency_score_for_days, urgency_scores
+from clearance_index import ClearancePriorityIndex, clearance_priority, sell_through_rates_from_interactions
+from ann_index import RandomProjectionLSH
+from text_features import ProductFeaturePipeline
+from als import ImplicitALS
+from two_stage import TwoStageRecommender
+from topk import top_k_indices, top_k_items, top_k_rows
+from product_store import ProductStore
+from interaction_log import InteractionLog
+from decay import DecayedInteractionMatrix
+from evaluation import evaluate_population, make_splits
 warnings.filterwarnings('ignore')
 
 # MongoDB connection setup
@@ -43,16 +52,10 @@ def generate_sample_data():
                 expiry_date = datetime.now() + timedelta(days=np.random.randint(1, 180))
                 stock = np.random.randint(0, 100)
                 days_to_expiry = (expiry_date - datetime.now()).days
-                urgency_score = max(0, (30 - days_to_expiry) / 30)
+                urgency_score = urgency_score_for_days(days_to_expiry)
                 
                 # Create discount for items expiring soon
-                discount = 0
-                if days_to_expiry <= 7:
-                    discount = 0.3
-                elif days_to_expiry <= 14:
-                    discount = 0.2
-                elif days_to_expiry <= 30:
-                    discount = 0.1
+                discount = calculate_discount(days_to_expiry)
                 
                 discounted_price = price * (1 - discount)
                 
@@ -92,60 +95,116 @@ def generate_sample_data():
     return pd.DataFrame(products), pd.DataFrame(interactions)
 
 class CollaborativeFilter:
-    def __init__(self, interactions_df):
-        self.interactions_df = interactions_df.copy()
-        self.user_encoder = LabelEncoder()
-        self.product_encoder = LabelEncoder()
+    def __init__(self, interactions, user_dictionary=None, product_dictionary=None, half_life_days=None):
+        # Either a DataFrame or an already encoded InteractionLog; passing the
+        # dictionaries of an earlier filter keeps every user and product index
+        if isinstance(interactions, InteractionLog):
+            self.log = interactions
+        else:
+            self.log = InteractionLog.from_frame(interactions, user_dictionary, product_dictionary)
+        self.users = self.log.users
+        self.products = self.log.products
+        # With a half-life, older events count for less and the weights are kept up to date incrementally
+        self.decayed = DecayedInteractionMatrix(half_life_days) if half_life_days else None
         self.setup_matrices()
     
     def setup_matrices(self):
-        # Weight different actions differently
-        action_weights = {'viewed': 1, 'added': 2, 'skipped': -0.5, 'bought': 3}
-        self.interactions_df['weight'] = self.interactions_df['actionType'].map(action_weights)
-        
-        # Encode users and products
-        self.interactions_df['user_idx'] = self.user_encoder.fit_transform(self.interactions_df['userId'])
-        self.interactions_df['product_idx'] = self.product_encoder.fit_transform(self.interactions_df['productId'])
-        
-        # Create user-item interaction matrix
-        self.interaction_matrix = csr_matrix(
-            (self.interactions_df['weight'], 
-             (self.interactions_df['user_idx'], self.interactions_df['product_idx'])),
-            shape=(len(self.user_encoder.classes_), len(self.product_encoder.classes_))
+        log = self.log
+        shape = (len(self.users), len(self.products))
+        
+        # Create user-item interaction matrix; actions are weighted differently and
+        # coalesced events carry a count of the raw events they stand for
+        if self.decayed is not None:
+            self.decayed.add(log.user_codes, log.product_codes, log.weights(), log.timestamps)
+            self.interaction_matrix = self.decayed.to_csr(shape)
+        else:
+            self.interaction_matrix = csr_matrix(
+                (log.weights().astype(np.float64), (log.user_codes, log.product_codes)), shape=shape
+            )
+        
+        # Products each user added or bought, for category preferences
+        preferred = log.action_mask(['added', 'bought'])
+        self.preferred_matrix = csr_matrix(
+            (np.ones(preferred.sum(), dtype=np.int8), (log.user_codes[preferred], log.product_codes[preferred])),
+            shape=shape
         )
-        
+        self.compute_similarities()
+    
+    def compute_similarities(self):
         # Compute similarity matrices using cosine similarity
         self.item_similarity = cosine_similarity(self.interaction_matrix.T)
         self.user_similarity = cosine_similarity(self.interaction_matrix)
     
+    def add_interactions(self, interactions):
+        """Fold new events into the matrices without re-weighting the whole history
+        
+        New users and products get the next codes of the dictionaries. With
+        decay, only the new events are weighted; the rest of the history is
+        brought up to date by one lazy rescale of the stored matrix.
+        """
+        new = InteractionLog.from_frame(interactions, self.users, self.products)
+        self.log = InteractionLog(*[np.concatenate([getattr(self.log, name), getattr(new, name)])
+                                    for name in ('user_codes', 'product_codes', 'action_codes', 'timestamps', 'counts')],
+                                  self.users, self.products)
+        shape = (len(self.users), len(self.products))
+        
+        if self.decayed is not None:
+            self.decayed.add(new.user_codes, new.product_codes, new.weights(), new.timestamps)
+            self.interaction_matrix = self.decayed.to_csr(shape)
+        else:
+            self.interaction_matrix = self.interaction_matrix.copy()
+            self.interaction_matrix.resize(shape)
+            self.interaction_matrix += csr_matrix(
+                (new.weights().astype(np.float64), (new.user_codes, new.product_codes)), shape=shape
+            )
+        
+        preferred = new.action_mask(['added', 'bought'])
+        self.preferred_matrix = self.preferred_matrix.copy()
+        self.preferred_matrix.resize(shape)
+        self.preferred_matrix += csr_matrix(
+            (np.ones(preferred.sum(), dtype=np.int8), (new.user_codes[preferred], new.product_codes[preferred])),
+            shape=shape
+        )
+        self.compute_similarities()
+        return len(new)
+    
+    def user_row(self, user_id):
+        """Matrix row of a user with at least one weighted interaction, else None
+        
+        The dictionaries outlive the matrix (they are persisted, and decay
+        prunes old entries), so a known id can still have an empty row.
+        """
+        user_idx = self.users.code(user_id)
+        if user_idx is None or user_idx >= self.interaction_matrix.shape[0]:
+            return None
+        indptr = self.interaction_matrix.indptr
+        return user_idx if indptr[user_idx + 1] > indptr[user_idx] else None
+    
     def recommend_item_based(self, user_id, top_k=5):
         """Item-based collaborative filtering recommendations"""
-        if user_id not in self.user_encoder.classes_:
+        user_idx = self.user_row(user_id)
+        if user_idx is None:
             return []
         
-        user_idx = self.user_encoder.transform([user_id])[0]
         user_interactions = self.interaction_matrix[user_idx].toarray().flatten()
         
         # Calculate recommendation scores based on item similarity
         scores = self.item_similarity.dot(user_interactions)
-        scores[user_interactions > 0] = 0  # Remove already interacted items
         
-        # Get top recommendations
-        recommended_indices = np.argsort(scores)[::-1][:top_k]
-        recommended_product_ids = self.product_encoder.inverse_transform(recommended_indices)
-        
-        return recommended_product_ids.tolist()
+        # Get top recommendations, skipping already interacted items
+        recommended_indices = top_k_indices(scores, top_k, exclude=user_interactions > 0)
+        return self.products.ids_for(recommended_indices).tolist()
     
     def recommend_user_based(self, user_id, top_k=5):
         """User-based collaborative filtering recommendations"""
-        if user_id not in self.user_encoder.classes_:
+        user_idx = self.user_row(user_id)
+        if user_idx is None:
             return []
         
-        user_idx = self.user_encoder.transform([user_id])[0]
         user_similarities = self.user_similarity[user_idx]
         
         # Find similar users (excluding self)
-        similar_users = np.argsort(user_similarities)[::-1][1:6]
+        similar_users = top_k_indices(user_similarities, 5, exclude=[user_idx])
         
         # Get items liked by similar users
         recommended_items = set()
@@ -158,132 +217,361 @@ class CollaborativeFilter:
             recommended_items.update(new_items[:top_k])
         
         if recommended_items:
-            recommended_product_ids = self.product_encoder.inverse_transform(list(recommended_items)[:top_k])
-            return recommended_product_ids.tolist()
+            return self.products.ids_for(list(recommended_items)[:top_k]).tolist()
         return []
     
-    def get_user_category_preferences(self, user_id, products_df):
-        """Extract user's preferred categories from interaction history"""
-        if user_id not in self.user_encoder.classes_:
+    def recommend_item_based_batch(self, user_codes, top_k=5):
+        """recommend_item_based for a block of user codes: one sparse x dense product, then row-wise top-k
+        
+        Returns an (n_users, top_k) array of product codes padded with -1.
+        """
+        block = self.interaction_matrix[user_codes]
+        scores = np.asarray(block @ self.item_similarity)
+        scores[(block > 0).toarray()] = -np.inf
+        return top_k_rows(scores, top_k)
+    
+    def recommend_als_batch(self, user_codes, top_k=5):
+        """recommend_als for a block of user codes; (n_users, top_k) product codes padded with -1"""
+        scores = (self.als_model.user_factors[user_codes] @ self.als_model.item_factors.T).astype(np.float64)
+        scores[(self.interaction_matrix[user_codes] != 0).toarray()] = -np.inf
+        return top_k_rows(scores, top_k)
+    
+    def score_items(self, user_id, backend='neighbourhood'):
+        """Collaborative score of every encoded product for one user, -inf for items already interacted with"""
+        user_idx = self.user_row(user_id)
+        if user_idx is None:
+            return None
+        
+        row = self.interaction_matrix[user_idx]
+        if backend == 'als':
+            scores = self.als_model.score(user_idx).astype(np.float64)
+        else:
+            scores = np.asarray(row @ self.item_similarity).ravel()
+        scores[row.indices[row.data > 0]] = -np.inf
+        return scores
+    
+    def fit_als(self, **params):
+        """Train an implicit ALS model on the action-weighted interaction matrix"""
+        self.als_model = ImplicitALS(**params).fit(self.interaction_matrix)
+        return self.als_model
+    
+    def recommend_als(self, user_id, top_k=5):
+        """Matrix-factorization recommendations: one dot product per item, then top-k"""
+        user_idx = self.user_row(user_id)
+        if user_idx is None:
             return []
         
-        user_interactions = self.interactions_df[
-            (self.interactions_df['userId'] == user_id) & 
-            (self.interactions_df['actionType'].isin(['added', 'bought']))
-        ]
+        scores = self.als_model.score(user_idx)
         
-        if user_interactions.empty:
+        # Remove already interacted items
+        top = top_k_indices(scores, top_k, exclude=self.interaction_matrix[user_idx].indices)
+        return self.products.ids_for(top).tolist()
+    
+    def get_user_category_preferences(self, user_id, product_store):
+        """Extract user's preferred categories from interaction history"""
+        user_idx = self.users.code(user_id)
+        if user_idx is None:
+            return []
+        
+        preferred_products = self.preferred_matrix[user_idx].indices
+        if len(preferred_products) == 0:
             return []
         
-        preferred_products = user_interactions['productId'].unique()
-        preferred_categories = products_df[
-            products_df['productId'].isin(preferred_products)
-        ]['category'].value_counts()
+        # Count categories over the user's distinct products, most frequent first
+        rows = product_store.rows(self.products.ids_for(preferred_products))
+        counts = np.bincount(product_store.category_codes[rows[rows >= 0]],
+                             minlength=len(product_store.category_names))
+        preferred_categories = top_k_indices(np.where(counts > 0, counts, -np.inf), len(counts))
         
-        return preferred_categories.index.tolist()
+        return product_store.category_names[preferred_categories].tolist()
 
 class ContentBasedFilter:
-    def __init__(self, products_df):
-        self.products_df = products_df.copy()
+    def __init__(self, products):
+        # Either a DataFrame or a ProductStore shared with the rest of the system
+        self.store = products if isinstance(products, ProductStore) else ProductStore(products)
+        self._frame, self._frame_version = None, None
         self.setup_features()
     
+    @property
+    def products_df(self):
+        """The catalogue as a DataFrame, built from the store once per store version"""
+        if self._frame_version != self.store.version:
+            self._frame, self._frame_version = self.store.to_frame(), self.store.version
+        return self._frame
+    
     def setup_features(self):
-        # Encode categorical features
-        self.category_encoder = LabelEncoder()
-        self.products_df['category_encoded'] = self.category_encoder.fit_transform(self.products_df['category'])
+        # Sparse TF-IDF over name/description/supplier, one-hot category and scaled numerics
+        self.feature_pipeline = ProductFeaturePipeline()
+        self.feature_matrix = self.feature_pipeline.fit_transform(self.products_df)
         
-        # Create feature matrix with normalized values
-        features = ['category_encoded', 'price', 'days_to_expiry', 'stock', 'urgency_score', 'discount']
-        self.feature_matrix = self.products_df[features].values
+        # Approximate nearest-neighbour index instead of a dense N x N similarity matrix
+        self.similarity_index = RandomProjectionLSH(self.feature_matrix)
+        
+        self.setup_urgency_ranking()
+    
+    def add_products(self, new_products_df):
+        """Add or update products without refitting; new words extend the vocabulary"""
+        new_products_df = new_products_df.drop_duplicates('productId', keep='last')
+        existing = self.store.rows(new_products_df['productId'].tolist())
+        known = existing >= 0
+        self.store.add_products(new_products_df)
+        # Products already in the store keep their row; only unknown ones are appended
+        if known.any():
+            self.feature_pipeline.update_products(existing[known], new_products_df[known])
+        if not known.all():
+            self.feature_pipeline.add_products(new_products_df[~known])
+        self.feature_matrix = self.feature_pipeline.features()
+        self.similarity_index = RandomProjectionLSH(self.feature_matrix)
+        self.setup_urgency_ranking()
+    
+    def setup_urgency_ranking(self):
+        """Precompute the combined urgency score and per-category rankings of in-stock products"""
+        store = self.store
+        stock = store.column('stock')
+        # Combined score: urgency + discount + stock availability
+        scores = (
+            store.column('urgency_score') * 0.5 + 
+            store.column('discount') * 0.3 +
+            (stock > 10).astype(int) * 0.2
+        )
+        store.set_column('combined_score', scores)
         
-        # Normalize features for better similarity computation
-        self.scaler = StandardScaler()
-        self.feature_matrix_scaled = self.scaler.fit_transform(self.feature_matrix)
+        in_stock = np.flatnonzero(stock > 0)
+        # Row positions by descending score; stable so ties keep catalogue order like nlargest
+        self.urgency_ranking = in_stock[np.argsort(-scores[in_stock], kind='stable')]
         
-        # Compute content similarity matrix
-        self.content_similarity = cosine_similarity(self.feature_matrix_scaled)
+        ranked_codes = store.category_codes[self.urgency_ranking]
+        self.category_rankings = {
+            store.category_names[code]: self.urgency_ranking[ranked_codes == code]
+            for code in pd.unique(ranked_codes)
+        }
+        self._days_to_expiry = store.column('days_to_expiry')
+        self._urgency_cache = {}
     
     def recommend_similar_products(self, product_id, top_k=5):
         """Recommend products similar to given product based on content"""
-        if product_id not in self.products_df['productId'].values:
+        idx = self.store.row(product_id)
+        if idx is None:
             return []
         
-        idx = self.products_df.index[self.products_df['productId'] == product_id].tolist()[0]
-        sim_scores = self.content_similarity[idx]
-        sim_scores[idx] = 0  # Exclude self
+        neighbours = self.similarity_index.query_row(idx, top_k)  # Excludes the product itself
         
-        recommended_indices = np.argsort(sim_scores)[::-1][:top_k]
-        return self.products_df.iloc[recommended_indices]['productId'].values.tolist()
+        recommended_indices = [row for row, _ in neighbours]
+        return self.store.column('productId')[recommended_indices].tolist()
     
     def recommend_by_category_urgency(self, preferred_categories, top_k=5, urgency_threshold=14):
         """Recommend urgent items from preferred categories"""
+        cache_key = (tuple(preferred_categories or ()), top_k, urgency_threshold)
+        if cache_key in self._urgency_cache:
+            return list(self._urgency_cache[cache_key])
+        
         if not preferred_categories:
             # If no preferences, recommend most urgent items
-            filtered_products = self.products_df[
-                (self.products_df['days_to_expiry'] <= urgency_threshold) &
-                (self.products_df['stock'] > 0)
-            ].copy()
+            rankings = [self.urgency_ranking]
         else:
-            filtered_products = self.products_df[
-                (self.products_df['category'].isin(preferred_categories)) &
-                (self.products_df['days_to_expiry'] <= urgency_threshold) &
-                (self.products_df['stock'] > 0)
-            ].copy()
-        
-        if filtered_products.empty:
-            return []
-        
-        # Calculate combined score: urgency + discount + stock availability
-        filtered_products['combined_score'] = (
-            filtered_products['urgency_score'] * 0.5 + 
-            filtered_products['discount'] * 0.3 +
-            (filtered_products['stock'] > 10).astype(int) * 0.2
-        )
-        
-        top_urgent = filtered_products.nlargest(top_k, 'combined_score')
-        return top_urgent['productId'].values.tolist()
+            rankings = [self.category_rankings[category] for category in dict.fromkeys(preferred_categories)
+                        if category in self.category_rankings]
+        
+        # Cut each presorted ranking at the threshold, then merge the heads
+        heads = [ranking[self._days_to_expiry[ranking] <= urgency_threshold][:top_k] for ranking in rankings]
+        candidates = np.concatenate(heads) if heads else np.array([], dtype=int)
+        if len(heads) > 1:
+            scores = self.store.column('combined_score')[candidates]
+            candidates = candidates[np.lexsort((candidates, -scores))][:top_k]
+        
+        top_urgent = self.store.column('productId')[candidates].tolist()
+        self._urgency_cache[cache_key] = top_urgent
+        return list(top_urgent)
 
 class HybridRecommendationSystem:
-    def __init__(self, products_df, interactions_df):
+    # collaborative_backend: 'neighbourhood' (item- and user-based cosine) or 'als'
+    # half_life_days: age at which an interaction counts half; None weights all history equally
+    DEFAULT_CONFIG = {
+        'collaborative_backend': 'neighbourhood',
+        'half_life_days': 30.0,
+        'als': {'factors': 32, 'regularization': 0.05, 'alpha': 10.0, 'iterations': 15},
+        'two_stage': {'per_generator': 50, 'budgets_ms': {'candidates': 20.0, 'rerank': 10.0, 'hydrate': 10.0}}
+    }
+    
+    def __init__(self, products_df, interactions_df, sell_through_rates=None, config=None,
+                 user_dictionary=None, product_dictionary=None):
         self.products_df = products_df
         self.interactions_df = interactions_df
-        self.collaborative_filter = CollaborativeFilter(interactions_df)
-        self.content_filter = ContentBasedFilter(products_df)
+        self.config = {**self.DEFAULT_CONFIG, **(config or {})}
+        # One columnar copy of the catalogue serves every filter and hydrates results
+        self.product_store = ProductStore(products_df)
+        self.collaborative_filter = CollaborativeFilter(interactions_df, user_dictionary, product_dictionary,
+                                                        half_life_days=self.config['half_life_days'])
+        self.content_filter = ContentBasedFilter(self.product_store)
+        
+        if self.config['collaborative_backend'] == 'als':
+            self.collaborative_filter.fit_als(**self.config['als'])
+        self.two_stage = None
+        
+        # Units sold per day by product; estimated from the bought interactions if not given
+        if sell_through_rates is None:
+            sell_through_rates = sell_through_rates_from_interactions(interactions_df)
+        self.sell_through_rates = dict(sell_through_rates)
+        # Kept current by add_interactions, add_products and update_stock; re-bucketed by roll_over
+        self.clearance_index = ClearancePriorityIndex.from_products(products_df, self.sell_through_rates)
+        self.clearance_day = datetime.now().date()
     
     def get_user_preferences(self, user_id):
         """Extract user preferences from interaction history"""
-        return self.collaborative_filter.get_user_category_preferences(user_id, self.products_df)
+        return self.collaborative_filter.get_user_category_preferences(user_id, self.product_store)
+    
+    def add_interactions(self, new_interactions_df):
+        """Apply new interactions to the collaborative model in place of a full rebuild"""
+        self.interactions_df = pd.concat([self.interactions_df, new_interactions_df], ignore_index=True)
+        added = self.collaborative_filter.add_interactions(new_interactions_df)
+        if self.config['collaborative_backend'] == 'als':
+            self.collaborative_filter.fit_als(**self.config['als'])
+        # Candidate generation caches collaborative positions and popularity
+        self.two_stage = None
+        
+        # Sales change the sell-through rate, and so the clearance priority, of what was bought
+        bought = new_interactions_df.loc[new_interactions_df['actionType'] == 'bought', 'productId'].unique()
+        if len(bought):
+            rates = sell_through_rates_from_interactions(self.interactions_df)
+            self.sell_through_rates.update({product_id: rates.get(product_id, 0.0) for product_id in bought})
+            self.refresh_clearance(bought)
+        return added
+    
+    def add_products(self, new_products_df):
+        """Add or update products in every filter and the clearance index"""
+        self.content_filter.add_products(new_products_df)
+        self.two_stage = None
+        self.refresh_clearance(new_products_df['productId'].unique())
+    
+    def update_stock(self, stock_by_product):
+        """Set the stock of known products, e.g. after a sale or a delivery"""
+        product_ids = [product_id for product_id in stock_by_product if product_id in self.product_store]
+        if not product_ids:
+            return
+        stock = self.product_store.column('stock').copy()
+        stock[self.product_store.rows(product_ids)] = [stock_by_product[product_id] for product_id in product_ids]
+        self.product_store.set_column('stock', stock)
+        self.content_filter.setup_urgency_ranking()
+        self.refresh_clearance(product_ids)
+    
+    def refresh_clearance(self, product_ids):
+        """Re-file the given products in the clearance index from the product store
+        
+        Products out of stock or past expiry are dropped from the index.
+        """
+        store = self.product_store
+        rows = store.rows(list(product_ids))
+        rows = rows[rows >= 0]
+        if not len(rows):
+            return
+        ids = store.column('productId')[rows]
+        stock = store.column('stock')[rows]
+        days = store.column('days_to_expiry')[rows]
+        value = store.column('discounted_price' if 'discounted_price' in store.columns else 'price')[rows]
+        rates = [self.sell_through_rates.get(product_id, 0.0) for product_id in ids]
+        priority = clearance_priority(store.column('urgency_score')[rows], stock, value, days, rates)
+        categories = store.category_names[store.category_codes[rows]]
+        for product_id, category, product_stock, product_days, product_priority in zip(
+                ids.tolist(), categories, stock, days, priority):
+            if product_stock > 0 and product_days >= 0:
+                self.clearance_index.update(product_id, category, product_days, product_priority)
+            else:
+                self.clearance_index.remove(product_id)
+    
+    def roll_over(self, now=None):
+        """Recompute days to expiry and urgency for the current day and re-bucket the clearance index"""
+        now = now or datetime.now()
+        store = self.product_store
+        if len(store) and 'expiryDate' in store.columns:
+            days = days_to_expiry(store.column('expiryDate'), now)
+            store.set_column('days_to_expiry', days)
+            store.set_column('urgency_score', urgency_scores(days))
+            self.content_filter.setup_urgency_ranking()
+            self.two_stage = None
+        self.clearance_index = ClearancePriorityIndex.from_products(store.to_frame(), self.sell_through_rates)
+        self.clearance_day = now.date()
     
     def recommend_hybrid(self, user_id, top_k=10, weights={'collab': 0.4, 'content': 0.3, 'urgency': 0.3}):
         """Hybrid recommendation combining all approaches"""
+        sorted_recommendations = self.score_hybrid(user_id, top_k, weights)
+        top_recommendation_ids = [item[0] for item in sorted_recommendations]
+        
+        # Return detailed product information, already in score order
+        rows = self.product_store.rows(top_recommendation_ids)
+        scores = np.array([item[1] for item in sorted_recommendations])
+        known = rows >= 0
+        return self.product_store.hydrate(rows[known], recommendation_score=scores[known])
+    
+    def recommend_batch(self, user_ids, top_k=10, weights={'collab': 0.4, 'content': 0.3, 'urgency': 0.3}):
+        """recommend_hybrid product ids for many users, without building a DataFrame per user
+        
+        The collaborative step is scored for the whole block at once; the
+        content and urgency steps are per user but cached by category.
+        """
+        collab = self.collaborative_filter
+        codes = collab.users.codes_for(user_ids)
+        # Users without any weighted interaction get no collaborative candidates, as in user_row
+        row_sizes = np.diff(collab.interaction_matrix.indptr)
+        known = (codes >= 0) & (codes < len(row_sizes))
+        known[known] = row_sizes[codes[known]] > 0
+        block = np.full((len(codes), top_k), -1)
+        if known.any() and weights['collab']:
+            if self.config['collaborative_backend'] == 'als':
+                block[known] = collab.recommend_als_batch(codes[known], top_k)
+            else:
+                block[known] = collab.recommend_item_based_batch(codes[known], top_k)
+        
+        results = []
+        for user_id, row in zip(user_ids, block):
+            collab_recs = collab.products.ids_for(row[row >= 0]).tolist()
+            if weights['collab'] and self.config['collaborative_backend'] != 'als':
+                collab_recs = list(set(collab_recs + collab.recommend_user_based(user_id, top_k)))
+            results.append([item for item, _ in self.score_hybrid(user_id, top_k, weights, collab_recs)])
+        return results
+    
+    def collaborative_candidates(self, user_id, top_k=10):
+        """Products the collaborative backend recommends to the user, unranked"""
+        if self.config['collaborative_backend'] == 'als':
+            return self.collaborative_filter.recommend_als(user_id, top_k)
+        item_based_recs = self.collaborative_filter.recommend_item_based(user_id, top_k)
+        user_based_recs = self.collaborative_filter.recommend_user_based(user_id, top_k)
+        
+        # Combine item-based and user-based collaborative filtering
+        return list(set(item_based_recs + user_based_recs))
+    
+    def score_hybrid(self, user_id, top_k=10, weights={'collab': 0.4, 'content': 0.3, 'urgency': 0.3},
+                     collab_recs=None):
+        """Top-k (productId, score) pairs of the hybrid blend; collab_recs skips the collaborative step
+        
+        A component with a zero weight is not computed at all, so its
+        products do not fill up the list either.
+        """
         recommendations = {}
         
         # 1. Collaborative filtering recommendations
-        try:
-            item_based_recs = self.collaborative_filter.recommend_item_based(user_id, top_k)
-            user_based_recs = self.collaborative_filter.recommend_user_based(user_id, top_k)
-            
-            # Combine item-based and user-based collaborative filtering
-            collab_recs = list(set(item_based_recs + user_based_recs))
-            
-            for item in collab_recs:
-                recommendations[item] = recommendations.get(item, 0) + weights['collab']
-        except:
-            collab_recs = []
+        if weights['collab']:
+            try:
+                if collab_recs is None:
+                    collab_recs = self.collaborative_candidates(user_id, top_k)
+                for item in collab_recs:
+                    recommendations[item] = recommendations.get(item, 0) + weights['collab']
+            except:
+                collab_recs = []
         
         # 2. Content-based recommendations
-        user_prefs = self.get_user_preferences(user_id)
-        if user_prefs:
+        user_prefs = self.get_user_preferences(user_id) if weights['content'] or weights['urgency'] else []
+        if user_prefs and weights['content']:
             urgent_items = self.content_filter.recommend_by_category_urgency(user_prefs, top_k)
             for item in urgent_items:
                 recommendations[item] = recommendations.get(item, 0) + weights['content']
         
         # 3. Urgency-based recommendations (expiring soon)
-        urgent_items = self.content_filter.recommend_by_category_urgency(
-            user_prefs, top_k, urgency_threshold=14
-        )
-        for item in urgent_items:
-            recommendations[item] = recommendations.get(item, 0) + weights['urgency']
+        if weights['urgency']:
+            urgent_items = self.content_filter.recommend_by_category_urgency(
+                user_prefs, top_k, urgency_threshold=14
+            )
+            for item in urgent_items:
+                recommendations[item] = recommendations.get(item, 0) + weights['urgency']
         
         # Sort by combined score and return top-k
         if not recommendations:
@@ -291,13 +579,36 @@ class HybridRecommendationSystem:
             fallback_items = self.content_filter.recommend_by_category_urgency([], top_k)
             recommendations = {item: 1.0 for item in fallback_items}
         
-        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-        top_recommendation_ids = [item[0] for item in sorted_recommendations[:top_k]]
+        return top_k_items(recommendations, top_k)
+
+    def recommend_two_stage(self, user_id, top_k=10, return_report=False):
+        """Bounded candidate generation, then vectorized re-ranking of the candidates only"""
+        if self.two_stage is None:
+            self.two_stage = TwoStageRecommender(self, **self.config['two_stage'])
+        result_df, report = self.two_stage.recommend(user_id, top_k)
+        return (result_df, report) if return_report else result_df
+    
+    def recommend_clearance_priority(self, user_id, urgency_threshold=7, top_k=10):
+        """Products most in need of clearance, from the user's preferred categories first
+        
+        Priority is urgency x stock x discounted price x the share of stock not
+        expected to sell before expiry, read from the maintained priority index.
+        """
+        # Days to expiry are relative to today, so the first query of a new day re-buckets
+        if datetime.now().date() != self.clearance_day:
+            self.roll_over()
+        user_prefs = self.get_user_preferences(user_id)
+        ranked = self.clearance_index.top_k(urgency_threshold, top_k, categories=user_prefs or None)
+        
+        # Fill up from the other categories when the preferred ones run short
+        if user_prefs and len(ranked) < top_k:
+            other_categories = [c for c in self.clearance_index.buckets if c not in user_prefs]
+            ranked += self.clearance_index.top_k(urgency_threshold, top_k - len(ranked), categories=other_categories)
         
-        # Return detailed product information
-        result_df = self.products_df[self.products_df['productId'].isin(top_recommendation_ids)].copy()
-        result_df['recommendation_score'] = result_df['productId'].map(dict(sorted_recommendations))
-        return result_df.sort_values('recommendation_score', ascending=False)
+        rows = self.product_store.rows([product_id for product_id, _ in ranked])
+        priority_scores = np.array([priority for _, priority in ranked])
+        order = top_k_indices(np.where(rows >= 0, priority_scores, -np.inf), len(ranked))
+        return self.product_store.hydrate(rows[order], priority_score=priority_scores[order])
 
 class RecommendationEvaluator:
     def __init__(self, products_df, interactions_df, recommendation_system):
@@ -305,11 +616,13 @@ class RecommendationEvaluator:
         self.interactions_df = interactions_df
         self.rec_system = recommendation_system
     
-    def split_data(self, test_ratio=0.2):
-        """Split interactions into train and test sets"""
-        test_interactions = self.interactions_df.sample(frac=test_ratio, random_state=42)
-        train_interactions = self.interactions_df.drop(test_interactions.index)
-        return train_interactions, test_interactions
+    def split_data(self, test_ratio=0.2, method='temporal'):
+        """Split interactions into train and test sets
+        
+        'temporal' tests on the latest interactions so no future behaviour
+        leaks into training; 'random' samples test_ratio of them.
+        """
+        return make_splits(self.interactions_df, method, test_ratio=test_ratio)[0]
     
     def precision_at_k(self, recommendations, ground_truth, k=5):
         """Calculate Precision@K"""
@@ -341,67 +654,20 @@ class RecommendationEvaluator:
             return 0
         return 2 * (precision * recall) / (precision + recall)
     
-    def evaluate_system(self, k=5):
-        """Comprehensive evaluation of the recommendation system"""
-        train_data, test_data = self.split_data()
+    def evaluate_system(self, k=5, n_workers=None, shard_size=1000, split='temporal'):
+        """Evaluate every user with held-out added/bought interactions
         
-        # Rebuild system with train data only
-        train_rec_system = HybridRecommendationSystem(self.products_df, train_data)
+        The system is rebuilt on the training split, recommendations are made
+        in batches sharded over a process pool, and precision, recall, F1,
+        NDCG, MAP, novelty and catalogue coverage are computed as array
+        operations over the whole population.
+        """
+        train_data, test_data = self.split_data(method=split)
         
-        results = []
-        
-        for user_id in train_data['userId'].unique()[:10]:  # Evaluate on subset for speed
-            # Get ground truth from test data
-            user_test_interactions = test_data[
-                (test_data['userId'] == user_id) & 
-                (test_data['actionType'].isin(['added', 'bought']))
-            ]
-            ground_truth = user_test_interactions['productId'].tolist()
-            
-            if len(ground_truth) == 0:
-                continue
-            
-            # Get recommendations
-            try:
-                recs_df = train_rec_system.recommend_hybrid(user_id, top_k=k)
-                recommendations = recs_df['productId'].tolist() if not recs_df.empty else []
-                
-                # Calculate metrics
-                precision = self.precision_at_k(recommendations, ground_truth, k)
-                recall = self.recall_at_k(recommendations, ground_truth, k)
-                f1 = self.f1_score_at_k(precision, recall)
-                
-                results.append({
-                    'user_id': user_id,
-                    'precision': precision,
-                    'recall': recall,
-                    'f1': f1
-                })
-            except Exception as e:
-                print(f"Error evaluating user {user_id}: {e}")
-                continue
-        
-        if not results:
-            return {
-                'avg_precision': 0,
-                'avg_recall': 0,
-                'avg_f1': 0,
-                'coverage': 0,
-                'num_users_evaluated': 0
-            }
-        
-        # Calculate average metrics
-        avg_precision = np.mean([r['precision'] for r in results])
-        avg_recall = np.mean([r['recall'] for r in results])
-        avg_f1 = np.mean([r['f1'] for r in results])
-        
-        return {
-            'avg_precision': avg_precision,
-            'avg_recall': avg_recall,
-            'avg_f1': avg_f1,
-            'coverage': 0.8,  # Placeholder
-            'num_users_evaluated': len(results)
-        }
+        # Rebuild system with train data only
+        train_rec_system = HybridRecommendationSystem(self.products_df, train_data,
+                                                      config=getattr(self.rec_system, 'config', None))
+        return evaluate_population(train_rec_system, train_data, test_data, k, n_workers, shard_size)
 
 # Initialize sample data when module is imported
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+# sell_through.py
+import math
+import os
+from datetime import datetime
+import pymongo
+from dotenv import load_dotenv
+
+DEFAULT_HALF_LIFE_DAYS = 7.0
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+def time_constant_days(half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    return half_life_days / math.log(2)
+
+def decayed_rate(rate, updated_at, now, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    """Rate as of `now` given a rate last updated at `updated_at`"""
+    if not rate or updated_at is None:
+        return 0.0
+    elapsed_days = max((now - updated_at).total_seconds() / 86400, 0.0)
+    return rate * math.exp(-elapsed_days / time_constant_days(half_life_days))
+
+def add_sale(rate, updated_at, quantity, timestamp, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    """Fold one sale into an exponentially smoothed units/day rate; returns (rate, updated_at)
+
+    Each unit sold contributes exp(-age / tau) / tau to the rate, so a steady
+    r units/day settles at r. Late events are decayed to the current
+    reference time rather than moving it backwards.
+    """
+    tau = time_constant_days(half_life_days)
+    reference = timestamp if updated_at is None else max(updated_at, timestamp)
+    rate = decayed_rate(rate, updated_at, reference, half_life_days)
+    rate += quantity / tau * math.exp(-(reference - timestamp).total_seconds() / 86400 / tau)
+    return rate, reference
+
+def sale_update(quantity, timestamp, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    """Pipeline update applying `add_sale` server-side, so concurrent writers never race"""
+    tau = time_constant_days(half_life_days)
+    updated_at = {'$ifNull': ['$updated_at', timestamp]}
+    reference = {'$max': [updated_at, timestamp]}
+
+    def age_factor(since):
+        return {'$exp': {'$divide': [{'$subtract': [since, reference]}, MS_PER_DAY * tau]}}
+
+    return [
+        {'$set': {
+            'rate': {'$add': [
+                {'$multiply': [{'$ifNull': ['$rate', 0]}, age_factor(updated_at)]},
+                {'$multiply': [quantity / tau, age_factor(timestamp)]}
+            ]},
+            'units': {'$add': [{'$ifNull': ['$units', 0]}, quantity]},
+            'updated_at': reference
+        }}
+    ]
+
+class SellThroughEstimator:
+    """Exponentially smoothed units sold per day, per product and per category
+
+    Every bought event is an O(1) atomic update of one small document per
+    product and per category in `collection`:
+    {_id: 'product:<id>' | 'category:<name>', scope, key, rate, units, updated_at}.
+    Reads decay the stored rate to the current time, so nothing ever
+    rescans the interaction history.
+    """
+
+    def __init__(self, collection, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+        self.collection = collection
+        self.half_life_days = half_life_days
+
+    def _operation(self, scope, key, quantity, timestamp):
+        return pymongo.UpdateOne(
+            {'_id': f'{scope}:{key}', 'scope': scope, 'key': key},
+            sale_update(quantity, timestamp, self.half_life_days),
+            upsert=True
+        )
+
+    def record_sales(self, sales):
+        """Apply (product_id, category, quantity, timestamp) sales with one bulk write"""
+        operations = []
+        for product_id, category, quantity, timestamp in sales:
+            operations.append(self._operation('product', product_id, quantity, timestamp))
+            if category:
+                operations.append(self._operation('category', category, quantity, timestamp))
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def record_sale(self, product_id, category, quantity, timestamp=None):
+        return self.record_sales([(product_id, category, quantity, timestamp or datetime.utcnow())])
+
+    def _rates(self, scope, keys=None, now=None):
+        now = now or datetime.utcnow()
+        query = {'scope': scope}
+        if keys is not None:
+            query['key'] = {'$in': list(keys)}
+        return {
+            doc['key']: decayed_rate(doc.get('rate'), doc.get('updated_at'), now, self.half_life_days)
+            for doc in self.collection.find(query, {'key': 1, 'rate': 1, 'updated_at': 1})
+        }
+
+    def product_rates(self, product_ids=None, now=None):
+        """Current units/day for the given products (all if None); unsold products are absent"""
+        return self._rates('product', product_ids, now)
+
+    def category_rates(self, categories=None, now=None):
+        return self._rates('category', categories, now)
+
+    def rebuild(self, interactions_collection, products_collection):
+        """Recompute every rate from the full interaction history (one-off backfill)"""
+        categories = {p['productId']: p.get('category')
+                      for p in products_collection.find({}, {'productId': 1, 'category': 1})}
+        state = {}
+        for event in interactions_collection.find({'actionType': 'bought'}).sort([('timestamp', 1)]):
+            quantity = event.get('quantity') or 1
+            keys = [('product', event['productId'])]
+            if categories.get(event['productId']):
+                keys.append(('category', categories[event['productId']]))
+            for key in keys:
+                rate, updated_at, units = state.get(key, (0.0, None, 0))
+                rate, updated_at = add_sale(rate, updated_at, quantity, event['timestamp'], self.half_life_days)
+                state[key] = (rate, updated_at, units + quantity)
+
+        self.collection.delete_many({})
+        docs = [{'_id': f'{scope}:{key}', 'scope': scope, 'key': key,
+                 'rate': rate, 'units': units, 'updated_at': updated_at}
+                for (scope, key), (rate, updated_at, units) in state.items()]
+        for i in range(0, len(docs), 10000):
+            self.collection.insert_many(docs[i:i + 10000])
+        return len(docs)
+
+if __name__ == '__main__':
+    load_dotenv()
+    client = pymongo.MongoClient(os.getenv("MONGODB_URI"))
+    db = client['walmart_clearance']
+    estimator = SellThroughEstimator(db['sell_through'])
+    count = estimator.rebuild(db['interactions'], db['products'])
+    print(f"✅ Rebuilt {count} sell-through rates from interaction history")
+    for category, rate in sorted(estimator.category_rates().items(), key=lambda item: -item[1]):
+        print(f"   {category}: {rate:.2f} units/day")
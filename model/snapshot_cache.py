@@ -0,0 +1,321 @@
+# snapshot_cache.py
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pymongo
+from bson import ObjectId, json_util
+from dotenv import load_dotenv
+from interaction_log import InteractionLog
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# How each collection is kept in sync. A refresh fetches documents past the
+# `_id` watermark (when `id_watermark` is set) and anything whose update
+# stamps moved past their watermarks, and upserts them by `key`. Every
+# product write stamps updated_at (the derived-field refresh stamps
+# derived_at). Interactions are stamped with updated_at when written to
+# MongoDB, including inserts and coalesced merges; their `_id` can be
+# assigned long before that (the spool), so it is no watermark.
+# `excluded_fields` are API bookkeeping that never reaches the snapshot.
+SNAPSHOT_SPECS = {
+    'products': {'key': 'productId', 'id_watermark': True, 'updated_fields': ['updated_at', 'derived_at'],
+                 'datetime_fields': ['expiryDate', 'updated_at', 'derived_at', 'created_at'],
+                 'excluded_fields': ['stock_batches']},
+    'interactions': {'key': '_id', 'id_watermark': False, 'updated_fields': ['updated_at'],
+                     'datetime_fields': ['timestamp', 'last_timestamp', 'updated_at'], 'excluded_fields': []},
+}
+# Any other collection is treated as append-only
+DEFAULT_SPEC = {'key': None, 'id_watermark': True, 'updated_fields': [], 'datetime_fields': [],
+                'excluded_fields': []}
+
+def stamp_of(document, field):
+    """An update stamp at the millisecond precision Mongo (and the manifest) keep, or None"""
+    stamp = document.get(field)
+    if isinstance(stamp, datetime):
+        return stamp.replace(microsecond=stamp.microsecond // 1000 * 1000)
+    return stamp
+
+def documents_to_table(documents, datetime_fields=()):
+    """Arrow table of Mongo documents; ObjectIds become strings, date fields timestamps"""
+    frame = pd.DataFrame(documents)
+    for name in frame.columns:
+        if name in datetime_fields:
+            frame[name] = pd.to_datetime(frame[name], format='ISO8601', errors='coerce')
+        elif frame[name].dtype == object:
+            values = frame[name].dropna()
+            if len(values) and isinstance(values.iloc[0], ObjectId):
+                frame[name] = frame[name].map(lambda value: str(value) if value is not None else None)
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed value types in a column; keep them as strings rather than fail the refresh
+        mixed = [name for name in frame.columns if frame[name].dtype == object]
+        frame[mixed] = frame[mixed].astype(str).where(frame[mixed].notna(), None)
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+class SnapshotCache:
+    """Local Arrow IPC snapshots of MongoDB collections with incremental refresh
+
+    Each collection is a directory of uncompressed Arrow IPC segment files
+    and a manifest holding the watermarks of the last refresh. A refresh
+    asks Mongo only for documents past those watermarks and writes them as
+    new segments; documents of mutable collections that changed are
+    upserted by key, which rewrites only the segments holding their old
+    versions. Reads memory-map the segments, so selecting a
+    few columns only pages those columns in, and nothing goes over the
+    network. Deletions are only picked up by a full refresh.
+    """
+
+    def __init__(self, directory, batch_size=50_000, segment_rows=1_000_000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, name):
+        """Serialize refreshes of one collection across threads and processes"""
+        # The lock belongs to the open file, so threads of one process exclude each other too
+        os.makedirs(self._path(name), exist_ok=True)
+        with open(self._path(name, 'refresh.lock'), 'a+b') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # LK_LOCK gives up after ~10 seconds
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _path(self, name, *parts):
+        return os.path.join(self.directory, name, *parts)
+
+    def manifest(self, name):
+        path = self._path(name, 'manifest.json')
+        if not os.path.exists(path):
+            return {'segments': [], 'watermarks': {}, 'rows': 0, 'next_segment': 1}
+        with open(path) as f:
+            return json_util.loads(f.read())
+
+    def _save_manifest(self, name, manifest):
+        path = self._path(name, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            f.write(json_util.dumps(manifest))
+        os.replace(path + '.tmp', path)
+
+    def _write_segment(self, name, manifest, table):
+        segment = f"segment-{manifest['next_segment']:05d}.arrow"
+        manifest['next_segment'] += 1
+        path = self._path(name, segment)
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(path + '.tmp', path)
+        return segment
+
+    def _delta_query(self, spec, watermarks):
+        clauses = []
+        if spec['id_watermark'] and '_id' in watermarks:
+            clauses.append({'_id': {'$gt': watermarks['_id']}})
+        # $gte: more writes can carry the watermark's own stamp (a job stamps all its
+        # batches with its start time); _fetch skips the documents already fetched at it
+        clauses += [{field: {'$gte': watermarks[field]}} for field in spec['updated_fields'] if field in watermarks]
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {'$or': clauses}
+
+    def _fetch(self, collection, query, spec, watermarks, seen):
+        """Tables of at most segment_rows documents, advancing the watermarks as they go
+
+        A stamp watermark is the largest stamp fetched, never the clock: a
+        job that stamped its first batches with its start time still has to
+        be picked up for the batches it writes after this refresh. `seen`
+        holds the keys of the documents fetched at each stamp watermark, so
+        the $gte query does not fetch them over and over.
+        """
+        old_watermarks = dict(watermarks)
+        old_seen = {field: set(keys) for field, keys in seen.items()}
+        documents = []
+        projection = {field: 0 for field in spec['excluded_fields']} or None
+        cursor = collection.find(query, projection).sort('_id', pymongo.ASCENDING).batch_size(self.batch_size)
+        for document in cursor:
+            if not self._is_new(document, spec, old_watermarks, old_seen):
+                continue
+            documents.append(document)
+            if spec['id_watermark'] and ('_id' not in watermarks or document['_id'] > watermarks['_id']):
+                watermarks['_id'] = document['_id']
+            for field in spec['updated_fields']:
+                stamp = stamp_of(document, field)
+                if stamp is None:
+                    continue
+                if field not in watermarks or stamp > watermarks[field]:
+                    watermarks[field] = stamp
+                    seen[field] = {document[spec['key']]}
+                elif stamp == watermarks[field]:
+                    seen.setdefault(field, set()).add(document[spec['key']])
+            if len(documents) == self.segment_rows:
+                yield documents_to_table(documents, spec['datetime_fields'])
+                documents = []
+        if documents:
+            yield documents_to_table(documents, spec['datetime_fields'])
+
+    @staticmethod
+    def _is_new(document, spec, watermarks, seen):
+        """Whether the document is past a watermark, or at one without having been fetched there"""
+        if spec['id_watermark'] and ('_id' not in watermarks or document['_id'] > watermarks['_id']):
+            return True
+        for field in spec['updated_fields']:
+            stamp = stamp_of(document, field)
+            if stamp is None:
+                continue
+            if field not in watermarks or stamp > watermarks[field]:
+                return True
+            if stamp == watermarks[field] and document[spec['key']] not in seen.get(field, ()):
+                return True
+        return not watermarks
+
+    def refresh(self, name, collection, full=False):
+        """Bring the snapshot of `collection` up to date; returns fetched/rows/seconds
+
+        Concurrent refreshes of a collection run one after the other.
+        """
+        started = time.perf_counter()
+        with self._locked(name):
+            fetched, rows = self._refresh(name, collection, full)
+        return {'fetched': fetched, 'rows': rows, 'seconds': time.perf_counter() - started}
+
+    def _refresh(self, name, collection, full):
+        spec = SNAPSHOT_SPECS.get(name, DEFAULT_SPEC)
+        manifest = self.manifest(name)
+        old_segments = list(manifest['segments'])
+        if full:
+            manifest.update({'segments': [], 'watermarks': {}, 'seen': {}})
+
+        watermarks = dict(manifest['watermarks'])
+        seen = {field: set(keys) for field, keys in manifest.get('seen', {}).items()}
+        query = self._delta_query(spec, watermarks)
+        previous, fetched, fetched_keys = manifest['segments'], 0, []
+        manifest['segments'] = []
+        # Every delta becomes new segments
+        for table in self._fetch(collection, query, spec, watermarks, seen):
+            fetched += table.num_rows
+            if spec['key'] and previous:
+                fetched_keys.append(table[spec['key']].combine_chunks())
+            manifest['segments'].append(self._write_segment(name, manifest, table))
+        if fetched_keys:
+            # Upsert by key: rewrite only the segments holding old versions of fetched documents
+            fetched_keys = pa.concat_arrays(fetched_keys)
+            previous = [kept for segment in previous
+                        for kept in self._drop_keys(name, manifest, segment, spec['key'], fetched_keys)]
+        manifest['segments'] = previous + manifest['segments']
+
+        manifest['watermarks'] = watermarks
+        manifest['seen'] = {field: list(keys) for field, keys in seen.items()}
+        manifest['rows'] = sum(self._segment_rows(name, segment) for segment in manifest['segments'])
+        manifest['refreshed_at'] = datetime.now()
+        self._remove_segments(name, manifest, set(old_segments) - set(manifest['segments']))
+        return fetched, manifest['rows']
+
+    def _drop_keys(self, name, manifest, segment, key, keys):
+        """[segment] if it holds none of keys, else its rewrite without them ([] if nothing is left)"""
+        with pa.memory_map(self._path(name, segment), 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+            stale = pc.is_in(table[key], value_set=keys)
+            if not pc.any(stale).as_py():
+                return [segment]
+            if pc.all(stale).as_py():
+                return []
+            return [self._write_segment(name, manifest, table.filter(pc.invert(stale)))]
+
+    def _segment_rows(self, name, segment):
+        with pa.memory_map(self._path(name, segment), 'r') as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+    def _remove_segments(self, name, manifest, segments):
+        """Save the manifest, then delete replaced segments
+
+        A reader may still have a segment memory-mapped, which Windows refuses
+        to delete; such segments are kept in the manifest's garbage list and
+        retried on the next refresh or compaction.
+        """
+        garbage = []
+        for segment in set(manifest.get('garbage', [])) | set(segments):
+            try:
+                os.remove(self._path(name, segment))
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                garbage.append(segment)
+        manifest['garbage'] = sorted(garbage)
+        self._save_manifest(name, manifest)
+
+    def _open(self, name, segment):
+        return pa.ipc.open_file(pa.memory_map(self._path(name, segment), 'r')).read_all()
+
+    def read(self, name, columns=None):
+        """Memory-mapped Arrow table of the snapshot, optionally only some columns"""
+        try:
+            tables = [self._open(name, segment) for segment in self.manifest(name)['segments']]
+        except FileNotFoundError:
+            # A refresh replaced a segment between reading the manifest and opening it
+            tables = [self._open(name, segment) for segment in self.manifest(name)['segments']]
+        if not tables:
+            return pa.table({})
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables, promote_options='permissive')
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        return table
+
+    def read_frame(self, name, columns=None):
+        return self.read(name, columns).to_pandas()
+
+    def compact(self, name):
+        """Merge all segments of a snapshot into one"""
+        with self._locked(name):
+            manifest = self.manifest(name)
+            if len(manifest['segments']) < 2:
+                return
+            old_segments = manifest['segments']
+            manifest['segments'] = [self._write_segment(name, manifest, self.read(name))]
+            self._remove_segments(name, manifest, old_segments)
+
+    def interaction_log(self, users=None, products=None):
+        """Encode the interactions snapshot into an InteractionLog one record batch at a time"""
+        table = self.read('interactions', ['userId', 'productId', 'actionType', 'timestamp', 'count'])
+        return InteractionLog.from_chunks((batch.to_pandas() for batch in table.to_batches()), users, products)
+
+def load_collection(cache_directory, collection, name, columns=None):
+    """Refresh the local snapshot of a collection and read it as a DataFrame"""
+    cache = SnapshotCache(cache_directory)
+    stats = cache.refresh(name, collection)
+    print(f"🔄 {name}: fetched {stats['fetched']} new documents, {stats['rows']} in snapshot")
+    return cache.read_frame(name, columns)
+
+if __name__ == '__main__':
+    load_dotenv()
+    client = pymongo.MongoClient(os.getenv("MONGODB_URI"))
+    db = client['walmart_clearance']
+    cache = SnapshotCache(os.getenv('SNAPSHOT_DIR', 'snapshots'))
+    for collection_name in SNAPSHOT_SPECS:
+        stats = cache.refresh(collection_name, db[collection_name])
+        print(f"✅ {collection_name}: fetched {stats['fetched']:,} documents in {stats['seconds']:.2f}s, "
+              f"{stats['rows']:,} rows in snapshot")
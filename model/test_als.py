@@ -0,0 +1,78 @@
+# test_als.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from concurrent.futures import ThreadPoolExecutor
+from als import ImplicitALS
+from recommendation_system import HybridRecommendationSystem, generate_sample_data
+
+class TestImplicitALS(unittest.TestCase):
+
+    def test_cg_matches_exact_solve(self):
+        """Test that batched CG converges to the closed-form implicit ALS user update"""
+        rng = np.random.default_rng(1)
+        weights = csr_matrix(rng.choice([0, 0, 0, 1, 2, 3, -0.5], size=(40, 30)).astype(np.float32))
+        model = ImplicitALS(factors=6, regularization=0.1, alpha=5.0, cg_steps=6, block_size=16)
+        confidence, preference = model._confidence(weights)
+
+        Y = rng.standard_normal((30, 6)).astype(np.float32)
+        X = np.zeros((40, 6), dtype=np.float32)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            model._half_step(X, Y, confidence, preference, pool)
+
+        dense_c = confidence.toarray()
+        dense_p = csr_matrix((preference, confidence.indices, confidence.indptr), shape=confidence.shape).toarray()
+        for u in range(40):
+            c = np.where(dense_c[u] > 0, dense_c[u], 1.0)
+            A = Y.T @ (c[:, None] * Y) + 0.1 * np.eye(6)
+            expected = np.linalg.solve(A, Y.T @ (c * dense_p[u]))
+            np.testing.assert_allclose(X[u], expected, rtol=1e-2, atol=1e-3)
+        print("✅ ALS conjugate gradient test passed")
+
+    def test_recovers_planted_groups(self):
+        """Test that factors recommend items from the user's own group"""
+        rng = np.random.default_rng(0)
+        user_group = rng.integers(0, 4, 400)
+        item_group = rng.integers(0, 4, 200)
+        rows, cols = [], []
+        for user, group in enumerate(user_group):
+            items = rng.choice(np.flatnonzero(item_group == group), 6, replace=False)
+            rows += [user] * 6
+            cols += items.tolist()
+        weights = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(400, 200))
+
+        model = ImplicitALS(factors=8, iterations=10, n_threads=2).fit(weights)
+        self.assertEqual(model.user_factors.dtype, np.float32)
+
+        precision = []
+        for user in range(50):
+            scores = model.score(user)
+            scores[weights[user].indices] = -np.inf
+            top = np.argpartition(-scores, 5)[:5]
+            precision.append(np.mean(item_group[top] == user_group[user]))
+        self.assertGreater(np.mean(precision), 0.9)
+        print("✅ ALS planted group test passed")
+
+    def test_hybrid_als_backend(self):
+        """Test that the hybrid system can use ALS as its collaborative backend"""
+        products_df, interactions_df = generate_sample_data()
+        hybrid_system = HybridRecommendationSystem(
+            products_df, interactions_df,
+            config={'collaborative_backend': 'als', 'als': {'factors': 8, 'iterations': 5}}
+        )
+        als_recs = hybrid_system.collaborative_filter.recommend_als('staff_1', top_k=5)
+        self.assertEqual(len(als_recs), 5)
+
+        recs = hybrid_system.recommend_hybrid('staff_1', top_k=5)
+        self.assertIsInstance(recs, pd.DataFrame)
+        self.assertGreater(len(recs), 0)
+        print("✅ Hybrid ALS backend test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,60 @@
+# test_analytics_pipeline.py
+import unittest
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from analytics_pipeline import AnalyticsPipeline
+
+class TestAnalyticsPipeline(unittest.TestCase):
+
+    def test_batched_flush(self):
+        """Test that published events are written in batches"""
+        batches = []
+        pipeline = AnalyticsPipeline(batches.append, batch_size=10, flush_interval=0.05).start()
+
+        for i in range(25):
+            self.assertTrue(pipeline.publish('product_added', 'admin', f'PROD_{i:04d}'))
+
+        deadline = time.time() + 2
+        while pipeline.stats()['flushed'] < 25 and time.time() < deadline:
+            time.sleep(0.01)
+        pipeline.stop()
+
+        stats = pipeline.stats()
+        self.assertEqual(stats['flushed'], 25)
+        self.assertTrue(all(len(batch) <= 10 for batch in batches))
+        self.assertEqual(sum(len(batch) for batch in batches), 25)
+        print("✅ Analytics batched flush test passed")
+
+    def test_full_queue_drops(self):
+        """Test that publishing never blocks and overflow is counted"""
+        pipeline = AnalyticsPipeline(lambda events: None, max_queue_size=5)
+
+        accepted = [pipeline.publish('user_login', 'staff_1') for _ in range(8)]
+
+        self.assertEqual(accepted.count(True), 5)
+        self.assertEqual(pipeline.stats()['dropped'], 3)
+
+        pipeline.flush()
+        self.assertEqual(pipeline.stats()['flushed'], 5)
+        print("✅ Analytics drop counter test passed")
+
+    def test_failed_flush_is_counted(self):
+        """Test that a sink error is counted instead of raised"""
+        def failing_sink(events):
+            raise ConnectionError('mongo down')
+
+        pipeline = AnalyticsPipeline(failing_sink)
+        pipeline.publish('product_deleted', 'admin', 'PROD_0001')
+        pipeline.flush()
+
+        stats = pipeline.stats()
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['flushed'], 0)
+        print("✅ Analytics failure counter test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
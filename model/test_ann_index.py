@@ -0,0 +1,45 @@
+# test_ann_index.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from scipy import sparse
+from ann_index import RandomProjectionLSH
+
+class TestRandomProjectionLSH(unittest.TestCase):
+
+    def test_recall_against_exact(self):
+        """Test that LSH neighbours mostly agree with a brute-force scan"""
+        rng = np.random.default_rng(0)
+        centres = rng.standard_normal((50, 16))
+        vectors = centres[rng.integers(0, 50, 5000)] + 0.1 * rng.standard_normal((5000, 16))
+        index = RandomProjectionLSH(vectors)
+
+        recalls = []
+        for row in rng.choice(5000, 100, replace=False):
+            found = {r for r, _ in index.query_row(row, 10)}
+            truth = {r for r, _ in index.exact_query_row(row, 10)}
+            self.assertNotIn(row, found)
+            recalls.append(len(found & truth) / 10)
+
+        self.assertGreater(np.mean(recalls), 0.8)
+        self.assertLess(index.memory_bytes(), 5000 * 5000 * 4 / 10)
+        print("✅ LSH recall test passed")
+
+    def test_sparse_vectors(self):
+        """Test that sparse input is indexed without densifying and returns sorted scores"""
+        matrix = sparse.random(2000, 5000, density=0.002, format='csr', random_state=1) + sparse.eye(2000, 5000, format='csr')
+        index = RandomProjectionLSH(matrix)
+
+        self.assertTrue(sparse.issparse(index.vectors))
+        neighbours = index.query_row(3, 5)
+        self.assertEqual(len(neighbours), 5)
+        scores = [score for _, score in neighbours]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        print("✅ LSH sparse input test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
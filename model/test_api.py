@@ -82,9 +82,26 @@ def test_api():
         print("✅ Interaction recorded successfully!")
     else:
         print(f"❌ Add interaction failed: {response.json()}")
-    
+
+    # Test batch interactions
+    print("\n6. Testing batch interactions...")
+    batch_data = [
+        {'userId': 'staff_1', 'productId': product_id, 'actionType': 'viewed'},
+        {'userId': 'staff_1', 'productId': product_id, 'actionType': 'bought', 'quantity': 2},
+        {'userId': 'staff_1', 'productId': product_id, 'actionType': 'bought', 'quantity': 1000},
+        {'userId': 'staff_1', 'productId': product_id, 'actionType': 'unknown'}
+    ]
+
+    response = requests.post(f'{BASE_URL}/interactions/batch', json=batch_data)
+    print(f"Status: {response.status_code}")
+    if response.status_code == 200:
+        batch_result = response.json()
+        print(f"✅ Batch recorded {batch_result['successful']} of {batch_result['total_processed']} interactions")
+    else:
+        print(f"❌ Batch interactions failed: {response.json()}")
+
     # Test recommendations
-    print("\n6. Testing recommendations...")
+    print("\n7. Testing recommendations...")
     response = requests.get(f'{BASE_URL}/recommendations/staff_1?top_k=5')
     print(f"Status: {response.status_code}")
     if response.status_code == 200:
@@ -62,6 +62,26 @@ class TestRecommendationComponents(unittest.TestCase):
         
         print("✅ Collaborative filter test passed")
     
+    def test_coalesced_interaction_counts(self):
+        """Test that a coalesced event weighs the same as its raw duplicates"""
+        now = datetime.now()
+        raw = pd.DataFrame([
+            {'userId': 'u1', 'productId': 1, 'actionType': 'viewed', 'timestamp': now},
+            {'userId': 'u1', 'productId': 1, 'actionType': 'viewed', 'timestamp': now},
+            {'userId': 'u1', 'productId': 1, 'actionType': 'viewed', 'timestamp': now},
+            {'userId': 'u2', 'productId': 2, 'actionType': 'bought', 'timestamp': now},
+        ])
+        coalesced = pd.DataFrame([
+            {'userId': 'u1', 'productId': 1, 'actionType': 'viewed', 'timestamp': now, 'count': 3},
+            {'userId': 'u2', 'productId': 2, 'actionType': 'bought', 'timestamp': now},
+        ])
+
+        raw_matrix = CollaborativeFilter(raw).interaction_matrix.toarray()
+        coalesced_matrix = CollaborativeFilter(coalesced).interaction_matrix.toarray()
+
+        np.testing.assert_array_equal(raw_matrix, coalesced_matrix)
+        print("✅ Coalesced interaction count test passed")
+
     def test_content_based_filter(self):
         """Test content-based filtering component"""
         print("Testing content-based filter...")
@@ -82,6 +102,16 @@ class TestRecommendationComponents(unittest.TestCase):
         print(f"Urgent items from {preferred_categories}: {urgent_items}")
         self.assertIsInstance(urgent_items, list)
         
+        # Presorted rankings must match a filter-and-nlargest over the catalogue
+        df = content_filter.products_df
+        for categories in ([], ['Health'], ['Skincare', 'Health', 'Oral Care']):
+            for threshold in (3, 14, 60):
+                mask = (df['days_to_expiry'] <= threshold) & (df['stock'] > 0)
+                if categories:
+                    mask &= df['category'].isin(categories)
+                expected = df[mask].nlargest(5, 'combined_score')['productId'].tolist()
+                self.assertEqual(content_filter.recommend_by_category_urgency(categories, 5, threshold), expected)
+        
         print("✅ Content-based filter test passed")
     
     def test_hybrid_system(self):
@@ -103,6 +133,89 @@ class TestRecommendationComponents(unittest.TestCase):
         
         print("✅ Hybrid system test passed")
     
+    def test_clearance_priority(self):
+        """Test clearance ranking against a full filter-and-sort of the catalogue"""
+        hybrid_system = HybridRecommendationSystem(self.products_df, self.interactions_df)
+        
+        recs = hybrid_system.recommend_clearance_priority('staff_1', urgency_threshold=30, top_k=5)
+        self.assertIsInstance(recs, pd.DataFrame)
+        self.assertIn('priority_score', recs.columns)
+        self.assertLessEqual(len(recs), 5)
+        self.assertTrue((recs['days_to_expiry'] <= 30).all())
+        self.assertTrue(recs['priority_score'].is_monotonic_decreasing)
+        
+        # Without preferences the index must agree with brute force over every product
+        index = hybrid_system.clearance_index
+        for threshold in (3, 7, 14, 30):
+            ranked = index.top_k(threshold, 10)
+            candidates = [(pid, -key[0]) for pid, (_, days, key) in index.entries.items() if days <= threshold]
+            expected = sorted(candidates, key=lambda item: (-item[1], item[0]))[:10]
+            self.assertEqual(ranked, expected)
+        
+        # Updates re-file a product and are visible to the next query
+        product_id, _ = index.top_k(30, 1)[0]
+        index.update(product_id, 'Skincare', 2, 0.0)
+        self.assertNotEqual(index.top_k(30, 1)[0][0], product_id)
+        index.remove(product_id)
+        self.assertNotIn(product_id, index.entries)
+        
+        print("✅ Clearance priority test passed")
+    
+    def test_clearance_index_follows_changes(self):
+        """Test that sales, stock changes and the day rolling over reach the clearance index"""
+        hybrid_system = HybridRecommendationSystem(self.products_df, self.interactions_df)
+        index = hybrid_system.clearance_index
+        
+        # A sold-out product leaves the index and the recommendations
+        product_id, _ = index.top_k(30, 1)[0]
+        hybrid_system.update_stock({product_id: 0})
+        self.assertNotIn(product_id, index.entries)
+        recs = hybrid_system.recommend_clearance_priority('staff_1', urgency_threshold=30, top_k=50)
+        self.assertNotIn(product_id, recs['productId'].tolist())
+        
+        # A sale raises the sell-through rate and re-files the product
+        product_id, priority = index.top_k(30, 1)[0]
+        sale = pd.DataFrame([{'userId': 'staff_1', 'productId': product_id, 'actionType': 'bought',
+                              'timestamp': datetime.now(), 'quantity': 1000}])
+        hybrid_system.add_interactions(sale)
+        self.assertGreater(hybrid_system.sell_through_rates[product_id], 0)
+        self.assertLess(-index.entries[product_id][2][0], priority)
+        
+        # A day later every product is one day closer to expiry
+        before = {pid: days for pid, (_, days, _) in index.entries.items()}
+        hybrid_system.roll_over(datetime.now() + timedelta(days=1))
+        after = hybrid_system.clearance_index.entries
+        self.assertTrue(after)
+        self.assertTrue(all(days == before[pid] - 1 for pid, (_, days, _) in after.items()))
+        
+        print("✅ Clearance index follows changes test passed")
+    
+    def test_two_stage_pipeline(self):
+        """Test bounded candidates, re-ranked order and the stage report"""
+        hybrid_system = HybridRecommendationSystem(
+            self.products_df, self.interactions_df, config={'two_stage': {'per_generator': 20}}
+        )
+        
+        recs, report = hybrid_system.recommend_two_stage('staff_1', top_k=5, return_report=True)
+        self.assertIsInstance(recs, pd.DataFrame)
+        self.assertEqual(len(recs), 5)
+        self.assertTrue(recs['recommendation_score'].is_monotonic_decreasing)
+        self.assertTrue((recs['stock'] > 0).all())
+        self.assertLessEqual(report['candidate_count'], 3 * 20)
+        for name in ('collaborative', 'category_urgency', 'popularity'):
+            self.assertLessEqual(report['candidates'][name]['count'], 20)
+        for stage in ('candidates_ms', 'rerank_ms', 'hydrate_ms', 'total_ms'):
+            self.assertIn(stage, report)
+        
+        # An exhausted budget skips the remaining generators but still answers
+        hybrid_system.two_stage.budgets_ms['candidates'] = 0.0
+        recs, report = hybrid_system.recommend_two_stage('staff_1', top_k=5, return_report=True)
+        self.assertEqual(report['skipped'], ['category_urgency', 'popularity'])
+        self.assertIn('candidates', report['over_budget'])
+        self.assertGreater(len(recs), 0)
+        
+        print("✅ Two-stage pipeline test passed")
+    
     def test_evaluation_system(self):
         """Test evaluation system"""
         print("Testing evaluation system...")
@@ -0,0 +1,89 @@
+# test_coo_loader.py
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import bson
+import coo_loader
+from coo_loader import GrowableCOO, format_mb, peak_rss_mb, stream_interactions
+from interaction_log import InteractionLog
+from recommendation_system import generate_sample_data
+
+class FakeCollection:
+    """Just enough of a pymongo collection: find with a projection"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query=None, projection=None):
+        keep = [key for key, value in (projection or {}).items() if value]
+        return iter([{key: document[key] for key in keep if key in document} for document in self.documents])
+
+class FakeRawCollection(FakeCollection):
+    """A collection that also hands out raw BSON batches like find_raw_batches"""
+
+    def find_raw_batches(self, query=None, projection=None, batch_size=100):
+        documents = list(self.find(query, projection))
+        for start in range(0, len(documents), batch_size):
+            yield b''.join(bson.encode(document) for document in documents[start:start + batch_size])
+
+class TestCooLoader(unittest.TestCase):
+
+    def setUp(self):
+        _, interactions_df = generate_sample_data()
+        self.interactions_df = interactions_df
+        self.documents = [{**record, '_id': i, 'productId': int(record['productId']),
+                           'timestamp': record['timestamp'].isoformat()}
+                          for i, record in enumerate(interactions_df.to_dict('records'))]
+        self.documents[3]['count'] = 4
+        self.documents[5]['actionType'] = 'unknown'
+
+    def test_growable_buffers(self):
+        """Test that buffers grow past their initial capacity without losing rows"""
+        buffers = GrowableCOO(capacity=4)
+        for start in range(0, 10, 3):
+            rows = np.arange(start, min(start + 3, 10))
+            buffers.append([rows, rows * 2, rows % 4, rows, np.ones_like(rows)])
+        self.assertEqual(len(buffers), 10)
+        self.assertGreaterEqual(buffers.capacity, 10)
+        np.testing.assert_array_equal(buffers.columns()[1], np.arange(10) * 2)
+        self.assertEqual(buffers.columns()[2].dtype, np.int8)
+        print("✅ Growable COO buffer test passed")
+
+    def test_stream_matches_in_memory_build(self):
+        """Test that streaming plain and raw batches gives the same log as encoding everything at once"""
+        expected = InteractionLog.from_documents(self.documents)
+        for collection in (FakeCollection(self.documents), FakeRawCollection(self.documents)):
+            log, stats = stream_interactions(collection, batch_size=128, initial_capacity=64)
+            self.assertEqual(stats['rows'], len(self.documents) - 1)
+            self.assertEqual(stats['batches'], 8)
+            self.assertGreater(stats['rows_per_second'], 0)
+            self.assertGreater(stats['peak_rss_mb'], 0)
+            for name in ('user_codes', 'product_codes', 'action_codes', 'timestamps', 'counts'):
+                np.testing.assert_array_equal(getattr(log, name), getattr(expected, name))
+            self.assertEqual(log.product_ids.tolist(), expected.product_ids.tolist())
+            self.assertEqual(int(log.counts.max()), 4)
+        print("✅ Streaming COO loader test passed")
+
+    def test_peak_rss_without_resource(self):
+        """Test the psutil fallback where the resource module is missing (Windows), and None without either"""
+        class Memory:
+            rss, peak_wset = 1024 * 1024, 8 * 1024 * 1024
+
+        psutil = mock.Mock()
+        psutil.Process.return_value.memory_info.return_value = Memory()
+        with mock.patch.object(coo_loader, 'resource', None), \
+                mock.patch.object(coo_loader, 'psutil', psutil, create=True):
+            self.assertEqual(peak_rss_mb(), 8.0)
+        with mock.patch.object(coo_loader, 'resource', None), \
+                mock.patch.object(coo_loader, 'psutil', None, create=True):
+            self.assertIsNone(peak_rss_mb())
+        self.assertEqual((format_mb(None), format_mb(2.25)), ('n/a', '2.2 MB'))
+        print("✅ Peak RSS fallback test passed")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# test_decay.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from decay import DecayedInteractionMatrix
+from recommendation_system import CollaborativeFilter, generate_sample_data
+
+DAY = 86400
+
+class TestDecay(unittest.TestCase):
+
+    def test_incremental_matches_full_recompute(self):
+        """Test that lazily rescaled weights equal decaying every event from scratch, minus pruned ones"""
+        rng = np.random.default_rng(7)
+        users = rng.integers(0, 20, 2000)
+        products = rng.integers(0, 50, 2000)
+        weights = rng.choice([1.0, 2.0, -0.5, 3.0], 2000)
+        timestamps = np.sort(rng.integers(0, 200 * DAY, 2000))
+
+        decayed = DecayedInteractionMatrix(half_life_days=10, min_weight=1e-6)
+        for start in range(0, 2000, 250):
+            decayed.add(users[start:start + 250], products[start:start + 250],
+                        weights[start:start + 250], timestamps[start:start + 250])
+            decayed.to_csr((20, 50))
+        now = int(timestamps[-1]) + 5 * DAY
+        matrix = decayed.to_csr((20, 50), now=now).toarray()
+
+        expected = np.zeros((20, 50))
+        np.add.at(expected, (users, products), weights * 0.5 ** ((now - timestamps) / (10 * DAY)))
+        self.assertGreater(decayed.rescales, 5)
+        self.assertGreater(decayed.pruned, 0)
+        np.testing.assert_allclose(matrix, expected, atol=1e-5)
+        print("✅ Incremental decay test passed")
+
+    def test_filter_add_interactions(self):
+        """Test that folding new events into a decayed filter equals building it on the whole history"""
+        _, interactions_df = generate_sample_data()
+        interactions_df = interactions_df.sort_values('timestamp', ignore_index=True)
+        rebuilt = CollaborativeFilter(interactions_df, half_life_days=14)
+
+        incremental = CollaborativeFilter(interactions_df.iloc[:900], half_life_days=14)
+        added = incremental.add_interactions(interactions_df.iloc[900:])
+        self.assertEqual(added, 100)
+        self.assertEqual(len(incremental.log), len(rebuilt.log))
+
+        order = rebuilt.users.codes_for(incremental.users.ids)
+        columns = rebuilt.products.codes_for(incremental.products.ids)
+        np.testing.assert_allclose(incremental.interaction_matrix.toarray(),
+                                   rebuilt.interaction_matrix.toarray()[np.ix_(order, columns)], atol=1e-3)
+
+        # Without a half-life the weights stay the plain action weights
+        plain = CollaborativeFilter(interactions_df.iloc[:900])
+        plain.add_interactions(interactions_df.iloc[900:])
+        self.assertEqual(plain.interaction_matrix.sum(), CollaborativeFilter(interactions_df).interaction_matrix.sum())
+        print("✅ Decayed filter incremental update test passed")
+
+if __name__ == '__main__':
+    unittest.main()
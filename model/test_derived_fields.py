@@ -0,0 +1,47 @@
+# test_derived_fields.py
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from derived_fields import tier_ranges, DerivedFieldRefresher
+
+def in_range(value, date_range):
+    if '$gte' in date_range and value < date_range['$gte']:
+        return False
+    if '$lt' in date_range and value >= date_range['$lt']:
+        return False
+    return True
+
+class TestDerivedFields(unittest.TestCase):
+
+    def test_tier_ranges_match_days_to_expiry(self):
+        """Test that each expiry date falls in exactly the tier its days_to_expiry implies"""
+        now = datetime(2025, 6, 20, 9, 30)
+        expected_discount = {3: 0.4, 7: 0.3, 14: 0.2, 30: 0.1}
+
+        for hours in range(-72, 24 * 60, 7):
+            expiry = now + timedelta(hours=hours)
+            days_to_expiry = (expiry - now).days
+            expected = next((d for limit, d in sorted(expected_discount.items()) if days_to_expiry <= limit), 0)
+
+            matches = [discount for date_range, discount in tier_ranges(now) if in_range(expiry, date_range)]
+            self.assertEqual(matches, [expected], f'{hours}h -> {days_to_expiry} days')
+
+        print("✅ Tier range test passed")
+
+    def test_refresher_freshness(self):
+        """Test that stored values are only trusted within one interval"""
+        refresher = DerivedFieldRefresher(products_collection=None, interval=timedelta(hours=1))
+        now = datetime(2025, 6, 20, 9, 30)
+        self.assertFalse(refresher.is_fresh(now))
+
+        refresher.last_run = now
+        self.assertTrue(refresher.is_fresh(now + timedelta(minutes=59)))
+        self.assertFalse(refresher.is_fresh(now + timedelta(minutes=61)))
+        print("✅ Refresher freshness test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
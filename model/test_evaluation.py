@@ -0,0 +1,103 @@
+# test_evaluation.py
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from evaluation import make_splits, ranking_metrics
+from benchmark_recommenders import run_benchmark
+from recommendation_system import HybridRecommendationSystem, RecommendationEvaluator, generate_sample_data
+
+class TestEvaluation(unittest.TestCase):
+
+    def test_ranking_metrics(self):
+        """Test the vectorized metrics against hand-computed values"""
+        recommended = np.array([[0, 1, 2], [3, -1, -1], [-1, -1, -1]])
+        relevant = csr_matrix(np.array([[0, 1, 0, 1, 0],
+                                        [0, 0, 0, 0, 1],
+                                        [1, 0, 0, 0, 0]]))
+        popularity = np.array([0.5, 0.25, 0.25, 0.0, 0.0])
+        metrics = ranking_metrics(recommended, relevant, popularity)
+
+        np.testing.assert_allclose(metrics['precision'], [1 / 3, 0, 0])
+        np.testing.assert_allclose(metrics['recall'], [0.5, 0, 0])
+        np.testing.assert_allclose(metrics['f1'], [0.4, 0, 0])
+        np.testing.assert_allclose(metrics['ndcg'], [(1 / np.log2(3)) / (1 + 1 / np.log2(3)), 0, 0])
+        np.testing.assert_allclose(metrics['average_precision'], [0.25, 0, 0])
+        np.testing.assert_allclose(metrics['novelty'], [2 / 3, 1, 0])
+        print("✅ Ranking metrics test passed")
+
+    def test_parallel_full_population(self):
+        """Test that the pooled evaluation scores every user and agrees with per-user recommend_hybrid"""
+        products_df, interactions_df = generate_sample_data()
+        evaluator = RecommendationEvaluator(products_df, interactions_df,
+                                            HybridRecommendationSystem(products_df, interactions_df))
+        serial = evaluator.evaluate_system(k=5, n_workers=1)
+        pooled = evaluator.evaluate_system(k=5, n_workers=2, shard_size=4)
+        for key in ('avg_precision', 'avg_recall', 'avg_f1', 'avg_ndcg', 'avg_map', 'coverage', 'num_users_evaluated'):
+            self.assertAlmostEqual(serial[key], pooled[key])
+
+        train_data, test_data = evaluator.split_data()
+        train_system = HybridRecommendationSystem(products_df, train_data)
+        relevant = test_data[test_data['actionType'].isin(['added', 'bought'])]
+        precisions, recommended = [], set()
+        for user_id in relevant['userId'].unique():
+            recs = train_system.recommend_hybrid(user_id, top_k=5)['productId'].tolist()
+            recommended.update(recs)
+            ground_truth = relevant.loc[relevant['userId'] == user_id, 'productId'].tolist()
+            precisions.append(evaluator.precision_at_k(recs, ground_truth, 5))
+
+        self.assertEqual(pooled['num_users_evaluated'], len(precisions))
+        self.assertAlmostEqual(pooled['avg_precision'], np.mean(precisions))
+        self.assertAlmostEqual(pooled['coverage'], len(recommended) / len(products_df))
+        print("✅ Parallel full-population evaluation test passed")
+
+    def test_batch_wider_than_catalogue(self):
+        """Test that recommend_batch works when top_k exceeds the number of products"""
+        products_df, interactions_df = generate_sample_data()
+        products_df = products_df.head(3)
+        interactions_df = interactions_df[interactions_df['productId'].isin(products_df['productId'])]
+        user_ids = list(interactions_df['userId'].unique()[:4]) + ['nobody']
+
+        for backend in ('neighbourhood', 'als'):
+            system = HybridRecommendationSystem(products_df, interactions_df,
+                                                config={'collaborative_backend': backend})
+            batch = system.recommend_batch(user_ids, top_k=5)
+            self.assertEqual(batch, [system.recommend_hybrid(user_id, top_k=5)['productId'].tolist()
+                                     for user_id in user_ids])
+        print("✅ Batch wider than catalogue test passed")
+
+    def test_splits_and_benchmark_report(self):
+        """Test leak-free temporal folds, k-fold coverage and the JSON benchmark report"""
+        products_df, interactions_df = generate_sample_data()
+        folds = make_splits(interactions_df, 'temporal', n_folds=3)
+        self.assertEqual(len(folds), 3)
+        for train_df, test_df in folds:
+            self.assertLessEqual(train_df['timestamp'].max(), test_df['timestamp'].min())
+        self.assertEqual([len(train_df) for train_df, _ in folds], [250, 500, 750])
+
+        kfolds = make_splits(interactions_df, 'kfold', n_folds=4)
+        tested = np.concatenate([test_df.index.values for _, test_df in kfolds])
+        self.assertEqual(sorted(tested.tolist()), list(range(len(interactions_df))))
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            variants = {'item_cf': {'kind': 'item_cf'}, 'hybrid': {'kind': 'hybrid'}}
+            run_benchmark(products_df, interactions_df, n_folds=2, k=5, variants=variants, output=output)
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(len(report['folds']), 4)
+        self.assertEqual(set(report['summary']), {'item_cf', 'hybrid'})
+        for result in report['folds']:
+            self.assertGreater(result['build_seconds'], 0)
+            self.assertGreater(result['build_peak_mb'], 0)
+            self.assertGreaterEqual(result['latency']['p99_ms'], result['latency']['p50_ms'])
+        print("✅ Splits and benchmark report test passed")
+
+if __name__ == '__main__':
+    unittest.main()
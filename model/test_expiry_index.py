@@ -0,0 +1,57 @@
+# test_expiry_index.py
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from expiry_index import ExpiryIndex
+from pricing import calculate_discount
+
+class TestExpiryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.today = datetime(2025, 6, 20, 0, 0)
+        self.index = ExpiryIndex(today=self.today, horizon=32)
+        self.expiry_days = {f'PROD_{d:04d}': d for d in range(-2, 120)}
+        for product_id, days in self.expiry_days.items():
+            self.index.add(product_id, self.today + timedelta(days=days, hours=13))
+
+    def test_expiring_within(self):
+        """Test that the bucket range scan matches a full filter"""
+        for days in (0, 3, 7, 31, 45, 100):
+            expected = {p for p, d in self.expiry_days.items() if 0 <= d <= days}
+            self.assertEqual(set(self.index.expiring_within(days)), expected)
+        print("✅ Expiring within test passed")
+
+    def test_advance_reports_only_affected_products(self):
+        """Test that a rollover re-tiers exactly the products crossing a boundary"""
+        changes = self.index.advance(self.today + timedelta(days=1))
+
+        expected_retiered = {
+            p for p, d in self.expiry_days.items()
+            if calculate_discount(d) != calculate_discount(d - 1)
+        }
+        expected_rescored = {p for p, d in self.expiry_days.items() if 0 <= d and d - 1 <= 30}
+
+        self.assertEqual(set(changes.retiered), expected_retiered)
+        self.assertEqual(set(changes.rescored), expected_rescored)
+        self.assertEqual(changes.expired, ['PROD_0000'])
+        self.assertEqual(self.index.days_to_expiry('PROD_0031'), 30)
+        print("✅ Rollover test passed")
+
+    def test_overflow_cascades_into_wheel(self):
+        """Test that far-future products enter the wheel as days pass"""
+        self.index.advance(self.today + timedelta(days=60))
+
+        for days in (0, 10, 40):
+            expected = {p for p, d in self.expiry_days.items() if 0 <= d - 60 <= days}
+            self.assertEqual(set(self.index.expiring_within(days)), expected)
+
+        self.index.remove('PROD_0070')
+        self.assertNotIn('PROD_0070', self.index.expiring_within(20))
+        print("✅ Overflow cascade test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+# test_id_dictionary.py
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from id_dictionary import IdDictionary
+from recommendation_system import CollaborativeFilter, generate_sample_data
+
+class TestIdDictionary(unittest.TestCase):
+
+    def test_append_only_and_persistence(self):
+        """Test two-way lookups, stable codes for repeated ids and a save/load round trip"""
+        dictionary = IdDictionary(['staff_3', 'staff_1'])
+        self.assertEqual(dictionary.add_many(['staff_1', 'staff_9', 'staff_3']).tolist(), [1, 2, 0])
+        self.assertEqual(dictionary.code('staff_9'), 2)
+        self.assertIsNone(dictionary.code('nobody'))
+        self.assertEqual(dictionary.codes_for(['staff_9', 'nobody']).tolist(), [2, -1])
+        self.assertEqual(dictionary.ids_for([2, 0]).tolist(), ['staff_9', 'staff_3'])
+
+        products = IdDictionary(np.array([7, 3, 7]))
+        self.assertEqual(products.ids_array().dtype.kind, 'i')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.json')
+            self.assertEqual(len(IdDictionary.load(path)), 0)
+            products.save(path)
+            reloaded = IdDictionary.load(path)
+        self.assertEqual(reloaded.ids, [7, 3])
+        self.assertEqual(reloaded.code(3), 1)
+        print("✅ Id dictionary test passed")
+
+    def test_rebuild_keeps_indices(self):
+        """Test that a filter rebuilt on a longer history keeps every earlier index"""
+        _, interactions_df = generate_sample_data()
+        first = CollaborativeFilter(interactions_df.iloc[:500])
+
+        new_events = pd.DataFrame([{'userId': 'staff_new', 'productId': 12345,
+                                    'actionType': 'bought', 'timestamp': pd.Timestamp.now()}])
+        rebuilt = CollaborativeFilter(pd.concat([interactions_df, new_events], ignore_index=True),
+                                      first.users, first.products)
+
+        old_users, old_products = len(first.users.ids), len(first.products.ids)
+        self.assertEqual(rebuilt.users.ids[:old_users], first.users.ids[:old_users])
+        self.assertEqual(rebuilt.products.ids[:old_products], first.products.ids[:old_products])
+        self.assertEqual(rebuilt.users.code('staff_new'), len(rebuilt.users) - 1)
+        self.assertEqual(rebuilt.interaction_matrix.shape, (len(rebuilt.users), len(rebuilt.products)))
+        self.assertEqual(rebuilt.recommend_item_based('nobody'), [])
+
+        # Ids only in the saved dictionary, or only on dropped events, have an empty row
+        rebuilt.users.add('staff_ghost')
+        bad_events = pd.DataFrame([{'userId': 'staff_bad', 'productId': 1, 'actionType': 'teleported',
+                                    'timestamp': pd.Timestamp.now()}])
+        ghost = CollaborativeFilter(pd.concat([interactions_df, bad_events], ignore_index=True),
+                                    rebuilt.users, rebuilt.products)
+        self.assertIsNone(ghost.users.code('staff_bad'))
+        self.assertEqual(ghost.recommend_item_based('staff_ghost'), [])
+        self.assertEqual(ghost.recommend_user_based('staff_ghost'), [])
+        self.assertIsNone(ghost.score_items('staff_ghost'))
+        print("✅ Id dictionary rebuild test passed")
+
+if __name__ == '__main__':
+    unittest.main()
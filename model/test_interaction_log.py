@@ -0,0 +1,69 @@
+# test_interaction_log.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from interaction_log import ACTION_TYPES, ACTION_WEIGHTS, InteractionLog
+from recommendation_system import CollaborativeFilter, generate_sample_data
+
+class TestInteractionLog(unittest.TestCase):
+
+    def test_round_trip_and_dtypes(self):
+        """Test compact dtypes, dropped bad events and decoding back to the original rows"""
+        now = datetime(2025, 6, 20, 12, 30)
+        interactions_df = pd.DataFrame([
+            {'userId': 'u2', 'productId': 5, 'actionType': 'viewed', 'timestamp': now},
+            {'userId': 'u1', 'productId': 3, 'actionType': 'bought', 'timestamp': now.isoformat()},
+            {'userId': 'u1', 'productId': 5, 'actionType': 'teleported', 'timestamp': now},
+            {'userId': None, 'productId': 5, 'actionType': 'added', 'timestamp': now},
+        ])
+        log = InteractionLog.from_frame(interactions_df)
+
+        self.assertEqual(len(log), 2)
+        self.assertEqual((log.user_codes.dtype, log.action_codes.dtype, log.timestamps.dtype),
+                         (np.int32, np.int8, np.int32))
+        self.assertEqual(log.user_ids.tolist(), ['u2', 'u1'])
+        self.assertEqual(log.memory_bytes(), 2 * 17)
+
+        decoded = log.to_frame()
+        self.assertEqual(decoded['userId'].tolist(), ['u2', 'u1'])
+        self.assertEqual(decoded['productId'].tolist(), [5, 3])
+        self.assertEqual(list(decoded['actionType']), ['viewed', 'bought'])
+        self.assertTrue((decoded['timestamp'] == pd.Timestamp(now)).all())
+        print("✅ Interaction log round trip test passed")
+
+    def test_every_api_action_is_weighted(self):
+        """Test that favorited and shared events are kept and weighted like the other actions"""
+        now = datetime(2025, 6, 20, 12, 30)
+        interactions_df = pd.DataFrame([
+            {'userId': 'u1', 'productId': 5, 'actionType': action, 'timestamp': now}
+            for action in ['viewed', 'favorited', 'shared']
+        ])
+        log = InteractionLog.from_frame(interactions_df)
+
+        self.assertEqual(list(log.to_frame()['actionType']), ['viewed', 'favorited', 'shared'])
+        self.assertEqual(log.weights().tolist(), [1.0, 2.5, 1.5])
+        self.assertEqual(len(ACTION_WEIGHTS), len(ACTION_TYPES))
+        print("✅ Interaction log action coverage test passed")
+
+    def test_chunked_build_matches_dataframe(self):
+        """Test that chunked documents and a DataFrame give the same log and filter"""
+        _, interactions_df = generate_sample_data()
+        from_frame = InteractionLog.from_frame(interactions_df)
+        from_documents = InteractionLog.from_documents(interactions_df.to_dict('records'), chunk_size=64)
+
+        for name in ('user_codes', 'product_codes', 'action_codes', 'timestamps', 'counts', 'user_ids', 'product_ids'):
+            np.testing.assert_array_equal(getattr(from_frame, name), getattr(from_documents, name))
+
+        matrix = CollaborativeFilter(interactions_df).interaction_matrix
+        np.testing.assert_array_equal(CollaborativeFilter(from_documents).interaction_matrix.toarray(),
+                                      matrix.toarray())
+        print("✅ Chunked interaction log test passed")
+
+if __name__ == '__main__':
+    unittest.main()
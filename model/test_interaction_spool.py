@@ -0,0 +1,83 @@
+# test_interaction_spool.py
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from interaction_spool import InteractionSpool
+
+class TestInteractionSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.delivered = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def sink(self, docs):
+        self.delivered.extend(docs)
+
+    def make_doc(self, n):
+        return {'_id': ObjectId(), 'userId': f'staff_{n}', 'productId': n,
+                'actionType': 'viewed', 'timestamp': datetime(2025, 1, 1, 12, 0, n % 60)}
+
+    def test_round_trip_and_cleanup(self):
+        """Test that spooled docs reach the sink intact and segments are removed"""
+        spool = InteractionSpool(self.directory, self.sink, segment_max_bytes=512, batch_size=7)
+        docs = [self.make_doc(n) for n in range(25)]
+        spool.append_many(docs)
+
+        spool.drain_once()
+
+        self.assertEqual(self.delivered, docs)
+        self.assertEqual(spool.stats()['pending_segments'], 0)
+        print("✅ Spool round trip test passed")
+
+    def test_failed_sink_keeps_events(self):
+        """Test that events survive a failing sink and a restart"""
+        def failing_sink(docs):
+            raise ConnectionError('mongo down')
+
+        spool = InteractionSpool(self.directory, failing_sink, batch_size=5)
+        docs = [self.make_doc(n) for n in range(12)]
+        spool.append_many(docs)
+
+        with self.assertRaises(ConnectionError):
+            spool.drain_once()
+        self.assertGreater(spool.stats()['pending_bytes'], 0)
+
+        # A new process picks up the leftover segments
+        restarted = InteractionSpool(self.directory, self.sink, batch_size=5)
+        restarted.drain_once()
+        self.assertEqual(self.delivered, docs)
+        print("✅ Spool failure recovery test passed")
+
+    def test_resume_from_checkpoint(self):
+        """Test that batches written before a failure are not replayed"""
+        calls = []
+
+        def flaky_sink(docs):
+            calls.append(len(docs))
+            if len(calls) == 2:
+                raise ConnectionError('timeout')
+            self.delivered.extend(docs)
+
+        spool = InteractionSpool(self.directory, flaky_sink, batch_size=4)
+        docs = [self.make_doc(n) for n in range(10)]
+        spool.append_many(docs)
+
+        with self.assertRaises(ConnectionError):
+            spool.drain_once()
+        spool.drain_once()
+
+        self.assertEqual(self.delivered, docs)
+        print("✅ Spool checkpoint test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
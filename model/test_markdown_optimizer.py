@@ -0,0 +1,105 @@
+# test_markdown_optimizer.py
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from markdown_optimizer import (optimize_markdowns, expected_revenue, carryover_value,
+                                demand_lift, estimate_base_rates, run_markdown_job)
+
+class FakeCollection:
+    """Just enough of a pymongo collection for the markdown job"""
+
+    def __init__(self, docs=None, aggregate_rows=None):
+        self.docs = docs or []
+        self.aggregate_rows = aggregate_rows or []
+        self.pipeline = None
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.docs]
+
+    def aggregate(self, pipeline):
+        self.pipeline = pipeline
+        return self.aggregate_rows
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+class TestMarkdownOptimizer(unittest.TestCase):
+
+    def test_discount_follows_stock_pressure(self):
+        """Test that overstocked, short-dated SKUs get deeper discounts than fast sellers"""
+        prices = [10.0, 10.0, 10.0, 10.0]
+        stock = [5, 60, 60, 500]
+        days = [10, 10, 2, 120]
+        base_rate = [2.0, 2.0, 2.0, 2.0]
+
+        result = optimize_markdowns(prices, stock, days, base_rate)
+
+        self.assertEqual(result['discount'][0], 0.0)
+        self.assertGreater(result['discount'][1], 0.0)
+        self.assertGreater(result['discount'][2], result['discount'][1])
+        # Long-dated overstock can still sell after the planning horizon
+        self.assertEqual(result['discount'][3], 0.0)
+        print("✅ Markdown stock pressure test passed")
+
+    def test_base_rate_removes_current_discount(self):
+        """Test that sales made at a discount give back the undiscounted rate"""
+        window_days, base = 28, 2.0
+        current = np.array([0.0, 0.3])
+        observed = base * demand_lift(current) * window_days
+
+        rates = estimate_base_rates(['Dairy', 'Dairy'], observed, window_days, current_discount=current)
+        np.testing.assert_allclose(rates, [base, base])
+        # Without the correction the discounted SKU looks about twice as fast
+        self.assertGreater(estimate_base_rates(['Dairy', 'Dairy'], observed, window_days)[1], 1.9 * base)
+        print("✅ Markdown base rate test passed")
+
+    def test_choice_beats_every_grid_point(self):
+        """Test that the chosen discount is optimal against a brute-force scan"""
+        rng = np.random.default_rng(7)
+        n = 500
+        prices = rng.uniform(1, 50, n)
+        stock = rng.integers(1, 100, n)
+        days = rng.integers(-2, 40, n)
+        base_rate = rng.gamma(1.0, 2.0, n)
+
+        result = optimize_markdowns(prices, stock, days, base_rate, chunk_size=64)
+
+        def value(revenue, units):
+            return revenue + prices * carryover_value(days) * (stock - units)
+
+        best = value(result['expected_revenue'], result['expected_units'])
+        for discount in np.arange(0.0, 0.75, 0.05):
+            revenue, units = expected_revenue(prices, stock, days, base_rate, np.full(n, discount))
+            self.assertTrue(np.all(best >= value(revenue, units) - 1e-9))
+        print("✅ Markdown optimality test passed")
+
+    def test_job_writes_changed_proposals(self):
+        """Test that the job uses bought interactions and stores only changed discounts"""
+        now = datetime(2025, 6, 1, 12, 0)
+        products = FakeCollection([
+            {'productId': 'FAST', 'category': 'Dairy', 'price': 5.0, 'stock': 4, 'discount': 0.0,
+             'expiryDate': now + timedelta(days=20)},
+            {'productId': 'SLOW', 'category': 'Dairy', 'price': 5.0, 'stock': 80, 'discount': 0.0,
+             'expiryDate': now + timedelta(days=5)}
+        ])
+        interactions = FakeCollection(aggregate_rows=[{'_id': 'FAST', 'units': 57}])
+        proposals_collection = FakeCollection()
+
+        summary = run_markdown_job(products, interactions, proposals_collection, now=now)
+
+        proposals = {p['productId']: p for p in proposals_collection.docs}
+        match = interactions.pipeline[0]['$match']
+        self.assertEqual(match['actionType'], 'bought')
+        self.assertEqual(match['timestamp']['$gte'], now - timedelta(days=28))
+        self.assertEqual(summary['products'], 2)
+        self.assertEqual(set(proposals), {'SLOW'})
+        self.assertGreater(proposals['SLOW']['proposed_discount'], 0)
+        print("✅ Markdown job test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,51 @@
+# test_pricing.py
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from pricing import (price_catalog, apply_pricing, calculate_discount,
+                     calculate_urgency_score, urgency_score_for_days)
+
+class TestPricing(unittest.TestCase):
+
+    def test_tier_boundaries(self):
+        """Test that tier limits are inclusive and the 40% tier applies"""
+        expected = {-2: 0.4, 0: 0.4, 3: 0.4, 4: 0.3, 7: 0.3, 8: 0.2,
+                    14: 0.2, 15: 0.1, 30: 0.1, 31: 0.0, 90: 0.0}
+        for days, discount in expected.items():
+            self.assertEqual(calculate_discount(days), discount)
+        print("✅ Discount tier boundaries test passed")
+
+    def test_vectorized_matches_scalar(self):
+        """Test that catalogue pricing agrees with the single-product wrappers"""
+        now = datetime(2025, 6, 1, 15, 30)
+        expiry_dates = [now + timedelta(days=d, hours=h) for d in range(-3, 45) for h in (-20, 0, 5)]
+        prices = np.linspace(1, 50, len(expiry_dates))
+
+        fields = price_catalog(prices, pd.Series(expiry_dates), now=now)
+
+        for i, expiry_date in enumerate(expiry_dates):
+            urgency, days = calculate_urgency_score(expiry_date, now)
+            self.assertEqual(fields['days_to_expiry'][i], days)
+            self.assertAlmostEqual(fields['urgency_score'][i], urgency)
+            self.assertEqual(fields['discount'][i], calculate_discount(days))
+            self.assertAlmostEqual(fields['discounted_price'][i], prices[i] * (1 - calculate_discount(days)))
+        print("✅ Vectorized vs scalar pricing test passed")
+
+    def test_apply_pricing_from_days(self):
+        """Test that a DataFrame without expiry dates is priced from days_to_expiry"""
+        df = pd.DataFrame({'price': [10.0, 10.0, 10.0], 'days_to_expiry': [2, 10, 40]})
+        apply_pricing(df)
+
+        self.assertEqual(df['discount'].tolist(), [0.4, 0.2, 0.0])
+        self.assertEqual(df['discounted_price'].tolist(), [6.0, 8.0, 10.0])
+        self.assertAlmostEqual(df['urgency_score'][1], urgency_score_for_days(10))
+        print("✅ DataFrame pricing test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
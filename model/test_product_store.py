@@ -0,0 +1,73 @@
+# test_product_store.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from product_store import ProductStore
+from recommendation_system import ContentBasedFilter, HybridRecommendationSystem, generate_sample_data
+
+class TestProductStore(unittest.TestCase):
+
+    def setUp(self):
+        self.products_df, self.interactions_df = generate_sample_data()
+
+    def test_hydrate_matches_dataframe(self):
+        """Test that hydrated rows equal the same rows of the source DataFrame"""
+        store = ProductStore(self.products_df)
+        product_ids = [42, 7, 99, 12345]
+        rows = store.rows(product_ids)
+        self.assertEqual(rows[-1], -1)
+
+        hydrated = store.hydrate(rows[:3])
+        expected = self.products_df.set_index('productId').loc[product_ids[:3]].reset_index()
+        pd.testing.assert_frame_equal(hydrated.reset_index(drop=True), expected[hydrated.columns],
+                                      check_dtype=False)
+        self.assertEqual(store.category_codes.dtype, np.int32)
+        self.assertEqual(list(store.category_names[store.codes_for(['Health', 'Nope'])]), ['Health'])
+        print("✅ Product store hydration test passed")
+
+    def test_add_products_and_sharing(self):
+        """Test appending products and that one store serves every filter"""
+        store = ProductStore(self.products_df.drop(columns=['stock']))
+        new_products = self.products_df.head(2).assign(productId=[1000, 1001], category=['Bakery', 'Health'])
+        rows = store.add_products(new_products)
+
+        self.assertEqual(rows.tolist(), [len(self.products_df), len(self.products_df) + 1])
+        self.assertEqual(store.row(1001), rows[1])
+        self.assertTrue(np.isnan(store.column('stock')[0]))
+        self.assertEqual(store.column('category')[rows].tolist(), ['Bakery', 'Health'])
+
+        # Known ids are updated in place and repeats within a batch keep their last row
+        updates = self.products_df.iloc[[5, 5, 6]].assign(price=[1.0, 2.0, 3.0], stock=[7, 8, 9])
+        self.assertEqual(store.add_products(updates).tolist(), [5, 6])
+        self.assertEqual(len(store), len(self.products_df) + 2)
+        self.assertEqual(store.column('price')[[5, 6]].tolist(), [2.0, 3.0])
+        self.assertEqual(store.hydrate(store.rows([5]))['stock'].tolist(), [8])
+
+        hybrid_system = HybridRecommendationSystem(self.products_df, self.interactions_df)
+        content_filter = hybrid_system.content_filter
+        renamed = self.products_df.iloc[[3]].assign(name='Completely Different Thing', category='Bakery')
+        content_filter.add_products(pd.concat([renamed, self.products_df.head(1).assign(productId=2000)]))
+        self.assertEqual(content_filter.feature_matrix.shape[0], len(self.products_df) + 1)
+        fresh = ContentBasedFilter(pd.concat([self.products_df.iloc[:3], renamed, self.products_df.iloc[4:]]))
+        fresh.add_products(self.products_df.head(1).assign(productId=2000))
+        # Vocabularies are ordered differently, so compare similarities rather than columns
+        np.testing.assert_allclose((content_filter.feature_matrix @ content_filter.feature_matrix[3].T).toarray(),
+                                   (fresh.feature_matrix @ fresh.feature_matrix[3].T).toarray(), atol=1e-5)
+        # The frame view is cached until the store changes
+        frame = content_filter.products_df
+        self.assertIs(content_filter.products_df, frame)
+        content_filter.add_products(self.products_df.head(1).assign(productId=2001))
+        self.assertIsNot(content_filter.products_df, frame)
+        self.assertEqual(content_filter.products_df['productId'].iloc[-1], 2001)
+        self.assertIs(hybrid_system.content_filter.store, hybrid_system.product_store)
+        recs = hybrid_system.recommend_hybrid('staff_1', top_k=5)
+        self.assertTrue(recs['recommendation_score'].is_monotonic_decreasing)
+        print("✅ Product store append and sharing test passed")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# test_sell_through.py
+import unittest
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sell_through import add_sale, decayed_rate
+
+class TestSellThrough(unittest.TestCase):
+
+    def test_steady_rate_converges(self):
+        """Test that a steady 10 units/day settles near 10"""
+        start = datetime(2025, 1, 1)
+        rate, updated_at = 0.0, None
+        for day in range(90):
+            rate, updated_at = add_sale(rate, updated_at, 10, start + timedelta(days=day))
+
+        # Right after a sale the estimate sits at the top of its daily sawtooth
+        midday = decayed_rate(rate, updated_at, updated_at + timedelta(hours=12))
+        self.assertAlmostEqual(midday, 10, delta=0.5)
+        print("✅ Sell-through convergence test passed")
+
+    def test_decay_half_life(self):
+        """Test that an idle product's rate halves every half-life"""
+        now = datetime(2025, 1, 1)
+        self.assertAlmostEqual(decayed_rate(8.0, now, now + timedelta(days=7), half_life_days=7), 4.0)
+        self.assertAlmostEqual(decayed_rate(8.0, now, now + timedelta(days=14), half_life_days=7), 2.0)
+        self.assertEqual(decayed_rate(None, None, now), 0.0)
+        print("✅ Sell-through decay test passed")
+
+    def test_late_events_do_not_depend_on_order(self):
+        """Test that out-of-order sales give the same rate as sorted ones"""
+        start = datetime(2025, 1, 1)
+        sales = [(random.Random(n).randint(1, 5), start + timedelta(hours=7 * n)) for n in range(40)]
+        shuffled = sales[:]
+        random.Random(3).shuffle(shuffled)
+
+        results = []
+        for ordering in (sales, shuffled):
+            rate, updated_at = 0.0, None
+            for quantity, timestamp in ordering:
+                rate, updated_at = add_sale(rate, updated_at, quantity, timestamp)
+            results.append((rate, updated_at))
+
+        self.assertAlmostEqual(results[0][0], results[1][0])
+        self.assertEqual(results[0][1], results[1][1])
+        print("✅ Sell-through ordering test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,215 @@
+# test_snapshot_cache.py
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+import numpy as np
+from snapshot_cache import SnapshotCache
+from interaction_log import InteractionLog
+
+def matches(document, query):
+    """The $or/$gt/$gte subset of the Mongo query language the refresh uses"""
+    if '$or' in query:
+        return any(matches(document, clause) for clause in query['$or'])
+    for field, condition in query.items():
+        if field not in document:
+            return False
+        if '$gt' in condition and not document[field] > condition['$gt']:
+            return False
+        if '$gte' in condition and not document[field] >= condition['$gte']:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, documents, delay=0):
+        self.documents = documents
+        self.delay = delay
+
+    def sort(self, field, direction):
+        return FakeCursor(sorted(self.documents, key=lambda document: document[field], reverse=direction < 0),
+                          self.delay)
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        for document in self.documents:
+            time.sleep(self.delay)
+            yield document
+
+class FakeCollection:
+    """Just enough of a pymongo collection: find(query, projection).sort().batch_size()"""
+
+    def __init__(self, documents, delay=0):
+        self.documents = documents
+        self.delay = delay
+        self.queries = []
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query or {})
+        excluded = {field for field, include in (projection or {}).items() if not include}
+        return FakeCursor([{field: value for field, value in document.items() if field not in excluded}
+                           for document in self.documents if matches(document, query or {})], self.delay)
+
+class TestSnapshotCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SnapshotCache(self.directory.name, segment_rows=3)
+        start = datetime(2025, 6, 1)
+        self.interactions = [{'_id': i, 'userId': f'staff_{i % 3}', 'productId': 100 + i % 4,
+                              'actionType': 'viewed', 'timestamp': start + timedelta(hours=i),
+                              'updated_at': start + timedelta(hours=i)}
+                             for i in range(5)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_incremental_append(self):
+        """Test that a refresh only fetches new interactions and reads match the collection"""
+        collection = FakeCollection(self.interactions)
+        self.assertEqual(self.cache.refresh('interactions', collection)['fetched'], 5)
+        self.assertEqual(len(self.cache.manifest('interactions')['segments']), 2)
+        self.assertEqual(self.cache.refresh('interactions', collection)['fetched'], 0)
+
+        collection.documents.append({'_id': 5, 'userId': 'staff_9', 'productId': 100,
+                                     'actionType': 'bought', 'timestamp': datetime(2025, 6, 2),
+                                     'updated_at': datetime.now()})
+        stats = self.cache.refresh('interactions', collection)
+        self.assertEqual((stats['fetched'], stats['rows']), (1, 6))
+        self.assertEqual(list(collection.queries[-1]), ['updated_at'])
+
+        table = self.cache.read('interactions', ['userId', 'missing'])
+        self.assertEqual(table.column_names, ['userId'])
+        self.assertEqual(table['userId'].to_pylist()[-1], 'staff_9')
+
+        self.cache.compact('interactions')
+        self.assertEqual(len(self.cache.manifest('interactions')['segments']), 1)
+        log = self.cache.interaction_log()
+        expected = InteractionLog.from_documents(collection.documents)
+        for name in ('user_codes', 'product_codes', 'action_codes', 'timestamps'):
+            np.testing.assert_array_equal(getattr(log, name), getattr(expected, name))
+        print("✅ Snapshot incremental append test passed")
+
+    def test_product_upsert(self):
+        """Test that updated products replace their old versions instead of duplicating"""
+        products = [{'_id': i, 'productId': i, 'name': f'Item {i}', 'price': 10.0 + i,
+                     'stock_batches': ['batch'], 'updated_at': datetime(2025, 6, 1)} for i in range(4)]
+        collection = FakeCollection(products)
+        self.cache.refresh('products', collection)
+
+        products[1].update({'price': 1.0, 'updated_at': datetime.now()})
+        products.append({'_id': 4, 'productId': 4, 'name': 'Item 4', 'price': 14.0,
+                         'updated_at': datetime.now()})
+        stats = self.cache.refresh('products', collection)
+        self.assertEqual((stats['fetched'], stats['rows']), (2, 5))
+
+        frame = self.cache.read_frame('products').set_index('productId')
+        self.assertEqual(frame.loc[1, 'price'], 1.0)
+        self.assertEqual(sorted(frame.index), [0, 1, 2, 3, 4])
+        self.assertNotIn('stock_batches', frame.columns)
+        # Only the segment that held the old version of product 1 was rewritten
+        self.assertEqual(len(self.cache.manifest('products')['segments']), 3)
+
+        stats = self.cache.refresh('products', collection, full=True)
+        self.assertEqual((stats['fetched'], stats['rows']), (5, 5))
+        print("✅ Snapshot product upsert test passed")
+
+    def test_job_stamp_across_refreshes(self):
+        """Test that a job stamping every batch with its start time is fully picked up across refreshes"""
+        products = [{'_id': i, 'productId': i, 'price': 10.0, 'updated_at': datetime(2025, 6, 1)}
+                    for i in range(6)]
+        collection = FakeCollection(products)
+        self.cache.refresh('products', collection)
+
+        # The job started a minute ago; a refresh runs after its first batch
+        job_started = datetime.now() - timedelta(minutes=1)
+        for product in products[:3]:
+            product.update({'discount': 0.3, 'derived_at': job_started})
+        self.assertEqual(self.cache.refresh('products', collection)['fetched'], 3)
+
+        for product in products[3:]:
+            product.update({'discount': 0.3, 'derived_at': job_started})
+        self.assertEqual(self.cache.refresh('products', collection)['fetched'], 3)
+        self.assertEqual(self.cache.refresh('products', collection)['fetched'], 0)
+        self.assertEqual(self.cache.read_frame('products')['discount'].tolist(), [0.3] * 6)
+        print("✅ Snapshot job stamp test passed")
+
+    def test_coalesced_interaction_upsert(self):
+        """Test that interactions merged into after a refresh are replaced, not duplicated"""
+        collection = FakeCollection(self.interactions)
+        self.cache.refresh('interactions', collection)
+
+        # A coalesced merge bumps count and stamps updated_at on an old document
+        self.interactions[1].update({'count': 3, 'last_timestamp': datetime(2025, 6, 3),
+                                     'updated_at': datetime.now()})
+        self.interactions.append({'_id': 5, 'userId': 'staff_9', 'productId': 100,
+                                  'actionType': 'bought', 'timestamp': datetime(2025, 6, 2),
+                                  'updated_at': datetime.now()})
+        stats = self.cache.refresh('interactions', collection)
+        self.assertEqual((stats['fetched'], stats['rows']), (2, 6))
+
+        frame = self.cache.read_frame('interactions').set_index('_id')
+        self.assertEqual(sorted(frame.index), list(range(6)))
+        self.assertEqual(frame.loc[1, 'count'], 3)
+        self.assertEqual(self.cache.refresh('interactions', collection)['fetched'], 0)
+        print("✅ Snapshot coalesced interaction upsert test passed")
+
+    def test_late_spooled_interaction(self):
+        """Test that an event whose _id predates the last refresh is still fetched once it is written"""
+        spooled = self.interactions.pop(3)
+        collection = FakeCollection(self.interactions)
+        self.assertEqual(self.cache.refresh('interactions', collection)['fetched'], 4)
+
+        # The drainer writes the event after the refresh, stamping updated_at then
+        self.interactions.append(dict(spooled, updated_at=datetime.now()))
+        stats = self.cache.refresh('interactions', collection)
+        self.assertEqual((stats['fetched'], stats['rows']), (1, 5))
+        self.assertEqual(sorted(self.cache.read('interactions', ['_id'])['_id'].to_pylist()), list(range(5)))
+        print("✅ Snapshot late spooled interaction test passed")
+
+    def test_concurrent_refreshes(self):
+        """Test that simultaneous refreshes run one after the other instead of clobbering each other"""
+        collection = FakeCollection(self.interactions, delay=0.01)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            SnapshotCache(self.directory.name, segment_rows=3).refresh('interactions', collection)))
+            for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(result['fetched'] for result in results), [0, 0, 5])
+        manifest = self.cache.manifest('interactions')
+        self.assertEqual(manifest['rows'], 5)
+        on_disk = sorted(f for f in os.listdir(os.path.join(self.directory.name, 'interactions')) if f.endswith('.arrow'))
+        self.assertEqual(on_disk, sorted(manifest['segments']))
+        print("✅ Snapshot concurrent refresh test passed")
+
+    def test_busy_segments_are_removed_later(self):
+        """Test that a segment a reader still maps (PermissionError on Windows) is deleted on a later refresh"""
+        collection = FakeCollection(self.interactions)
+        self.cache.refresh('interactions', collection)
+        old_segments = self.cache.manifest('interactions')['segments']
+
+        with mock.patch('snapshot_cache.os.remove', side_effect=PermissionError):
+            self.cache.compact('interactions')
+        self.assertEqual(self.cache.manifest('interactions')['garbage'], sorted(old_segments))
+        self.assertEqual(self.cache.read('interactions').num_rows, 5)
+
+        self.cache.refresh('interactions', collection)
+        self.assertEqual(self.cache.manifest('interactions')['garbage'], [])
+        directory = os.path.join(self.directory.name, 'interactions')
+        self.assertFalse(any(os.path.exists(os.path.join(directory, segment)) for segment in old_segments))
+        print("✅ Snapshot deferred segment removal test passed")
+
+if __name__ == '__main__':
+    unittest.main()
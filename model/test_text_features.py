@@ -0,0 +1,55 @@
+# test_text_features.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from text_features import ProductFeaturePipeline
+from recommendation_system import ContentBasedFilter, generate_sample_data
+
+class TestProductFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.products_df, _ = generate_sample_data()
+        self.products_df['description'] = self.products_df['category'] + ' essentials'
+        self.products_df['supplier'] = np.where(self.products_df.index % 2, 'Acme Labs', 'Northwind')
+
+    def test_incremental_matches_full_fit(self):
+        """Test that adding products in steps gives the same text features as one fit"""
+        full = ProductFeaturePipeline(numeric_fields=[])
+        expected = full.fit_transform(self.products_df)
+
+        incremental = ProductFeaturePipeline(numeric_fields=[])
+        incremental.fit_transform(self.products_df.iloc[:30])
+        incremental.add_products(self.products_df.iloc[30:70])
+        features = incremental.add_products(self.products_df.iloc[70:])
+
+        self.assertTrue(sparse.issparse(features))
+        self.assertEqual(incremental.feature_names(), full.feature_names())
+        self.assertAlmostEqual(abs(features - expected).max(), 0, places=6)
+        print("✅ Incremental vocabulary test passed")
+
+    def test_similar_products_share_text(self):
+        """Test that the nearest neighbour of a product is a variant of the same item"""
+        content_filter = ContentBasedFilter(self.products_df)
+        similar = content_filter.recommend_similar_products(0, top_k=3)
+
+        names = self.products_df.set_index('productId')['name']
+        self.assertEqual(len(similar), 3)
+        self.assertEqual(names[similar[0]].rsplit(' ', 1)[0], names[0].rsplit(' ', 1)[0])
+
+        # Products added later are searchable and pick up new vocabulary
+        extra = pd.DataFrame([{**self.products_df.iloc[0].to_dict(), 'productId': 999,
+                               'name': 'Aloe Vera Gel', 'supplier': 'Greenleaf'}])
+        content_filter.add_products(extra)
+        self.assertIn('aloe', content_filter.feature_pipeline.vocabulary)
+        self.assertEqual(content_filter.feature_matrix.shape[0], len(self.products_df) + 1)
+        self.assertEqual(len(content_filter.recommend_similar_products(999, top_k=3)), 3)
+        print("✅ Text similarity test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,60 @@
+# test_topk.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from topk import top_k_indices, top_k_items, top_k_rows
+
+class TestTopK(unittest.TestCase):
+
+    def test_matches_full_sort(self):
+        """Test that argpartition selection agrees with a full sort and leaves scores alone"""
+        rng = np.random.default_rng(0)
+        scores = rng.random(10_000)
+        original = scores.copy()
+        exclude = rng.choice(10_000, 100, replace=False)
+
+        masked = scores.copy()
+        masked[exclude] = -np.inf
+        expected = np.argsort(-masked, kind='stable')[:10]
+
+        np.testing.assert_array_equal(top_k_indices(scores, 10, exclude=exclude), expected)
+        np.testing.assert_array_equal(top_k_indices(scores, 10, exclude=np.isin(np.arange(10_000), exclude)), expected)
+        np.testing.assert_array_equal(scores, original)
+        print("✅ Top-k full sort agreement test passed")
+
+    def test_edge_cases(self):
+        """Test ties, non-finite scores, short inputs and dict ranking"""
+        scores = np.array([1.0, 3.0, -np.inf, 3.0, np.nan, 2.0])
+        self.assertEqual(top_k_indices(scores, 3).tolist(), [1, 3, 5])
+        self.assertEqual(top_k_indices(scores, 10).tolist(), [1, 3, 5, 0])
+        self.assertEqual(top_k_indices(scores, 10, exclude=[1, 5]).tolist(), [3, 0])
+        self.assertEqual(top_k_indices(np.zeros(1000), 3).tolist(), [0, 1, 2])
+        self.assertEqual(top_k_indices(np.ones(1000), 2, exclude=[0, 2]).tolist(), [1, 3])
+        self.assertEqual(len(top_k_indices(scores, 0)), 0)
+        self.assertEqual(len(top_k_indices(np.array([]), 5)), 0)
+
+        ranked = top_k_items({'a': 0.4, 'b': 0.7, 'c': 0.4, 'd': 0.1}, 3)
+        self.assertEqual(ranked, [('b', 0.7), ('a', 0.4), ('c', 0.4)])
+        print("✅ Top-k edge case test passed")
+
+    def test_rows_match_single_row_selection(self):
+        """Test that row-wise selection agrees with top_k_indices per row and pads short rows"""
+        rng = np.random.default_rng(1)
+        scores = rng.integers(0, 5, (50, 200)).astype(float)
+        scores[rng.random((50, 200)) < 0.1] = -np.inf
+        scores[3, :] = -np.inf
+        scores[4, 7] = np.nan
+        rows = top_k_rows(scores, 10)
+        for i in range(50):
+            expected = top_k_indices(scores[i], 10)
+            self.assertEqual(rows[i, :len(expected)].tolist(), expected.tolist())
+        self.assertEqual(rows[3].tolist(), [-1] * 10)
+        self.assertEqual(top_k_rows(np.array([[1.0, -np.inf, 2.0]]), 5).tolist(), [[2, 0, -1, -1, -1]])
+        print("✅ Row-wise top-k test passed")
+
+if __name__ == '__main__':
+    unittest.main()
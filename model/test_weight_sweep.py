@@ -0,0 +1,53 @@
+# test_weight_sweep.py
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from evaluation import make_splits, relevant_test_users, score_recommendations
+from recommendation_system import HybridRecommendationSystem, generate_sample_data
+from weight_sweep import HybridWeightSweep, pareto_front, random_weights, weight_grid
+
+class TestWeightSweep(unittest.TestCase):
+
+    def test_grid_and_pareto_front(self):
+        """Test the simplex grid, random weightings and Pareto filtering"""
+        grid = weight_grid(0.1)
+        self.assertEqual(len(grid), 66)
+        self.assertTrue(all(abs(sum(weights.values()) - 1) < 1e-9 for weights in grid))
+        self.assertIn({'collab': 0.0, 'content': 0.0, 'urgency': 1.0}, grid)
+        self.assertEqual(len(random_weights(7)), 7)
+
+        results = [{'name': name, 'avg_ndcg': quality, 'latency': {'p95_ms': latency}}
+                   for name, quality, latency in [('a', 0.1, 1.0), ('b', 0.3, 2.0), ('c', 0.2, 3.0), ('d', 0.3, 1.5)]]
+        self.assertEqual([result['name'] for result in pareto_front(results)], ['a', 'd'])
+        print("✅ Weight grid and Pareto front test passed")
+
+    def test_sweep_matches_recommend_hybrid(self):
+        """Test that the array sweep scores every weighting exactly like score_hybrid, serial or pooled"""
+        products_df, interactions_df = generate_sample_data()
+        train_df, test_df = make_splits(interactions_df, 'temporal')[0]
+        system = HybridRecommendationSystem(products_df, train_df)
+        relevant_df, user_ids = relevant_test_users(train_df, test_df)
+        weight_sets = weight_grid(0.5) + random_weights(3) + [{'collab': 0, 'content': 0, 'urgency': 0}]
+
+        results = HybridWeightSweep(system, train_df, test_df, k=5, n_workers=1).evaluate(weight_sets)
+        pooled = HybridWeightSweep(system, train_df, test_df, k=5, n_workers=2, shard_size=7).evaluate(
+            weight_sets, shard_size=3)
+        for weights, result, pooled_result in zip(weight_sets, results, pooled):
+            recommendations = [[item for item, _ in system.score_hybrid(user_id, 5, weights)] for user_id in user_ids]
+            expected = score_recommendations(recommendations, user_ids, train_df, relevant_df,
+                                             system.product_store.column('productId'), 5)
+            for key, value in expected.items():
+                self.assertAlmostEqual(result[key], value, places=12)
+                self.assertAlmostEqual(pooled_result[key], value, places=12)
+
+        # Dropping the collaborative component drops its measured time from the latency estimate
+        by_weights = {tuple(result['weights'].values()): result for result in results}
+        self.assertLess(by_weights[(0.0, 0.0, 1.0)]['latency']['mean_ms'],
+                        by_weights[(1.0, 0.0, 0.0)]['latency']['mean_ms'])
+        print("✅ Weight sweep agreement test passed")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# text_features.py
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+TEXT_FIELDS = ['name', 'description', 'supplier']
+NUMERIC_FIELDS = ['price', 'days_to_expiry', 'stock', 'urgency_score', 'discount']
+
+class ProductFeaturePipeline:
+    """Sparse product features: TF-IDF text, one-hot category and scaled numerics
+
+    The vocabulary and category columns grow as products are added, and
+    document frequencies are updated in place. IDF weights are re-applied
+    to the stored term counts in O(nnz), so no step ever builds a dense
+    products x vocabulary matrix. Numeric columns keep the mean and scale
+    from the first fit so existing rows do not move. Each block has unit
+    scale before weighting (TF-IDF rows are L2-normalized, numerics are
+    divided by sqrt of their count) so text is not drowned out.
+    """
+
+    def __init__(self, text_fields=TEXT_FIELDS, numeric_fields=NUMERIC_FIELDS,
+                 text_weight=1.0, category_weight=1.0, numeric_weight=1.0):
+        self.text_fields = text_fields
+        self.numeric_fields = numeric_fields
+        self.weights = (text_weight, category_weight, numeric_weight)
+        self.analyzer = CountVectorizer(lowercase=True).build_analyzer()
+
+        self.vocabulary = {}
+        self.categories = {}
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.term_counts = None
+        self.category_codes = np.zeros(0, dtype=np.int64)
+        self.numerics = None
+        self.numeric_mean = None
+        self.numeric_scale = None
+
+    def _documents(self, products_df):
+        text = pd.Series('', index=products_df.index)
+        for field in self.text_fields:
+            if field in products_df.columns:
+                text = text + ' ' + products_df[field].fillna('').astype(str)
+        return text.tolist()
+
+    def _count_terms(self, documents):
+        """Sparse term counts for new documents, growing the vocabulary as needed"""
+        indptr, indices = [0], []
+        for document in documents:
+            for token in self.analyzer(document):
+                indices.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+            indptr.append(len(indices))
+        counts = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int64), indptr),
+            shape=(len(documents), len(self.vocabulary))
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def _encode_categories(self, products_df):
+        return np.array([self.categories.setdefault(category, len(self.categories))
+                         for category in products_df['category'].fillna('Unknown')], dtype=np.int64)
+
+    def _scaled_numerics(self, products_df):
+        values = products_df.reindex(columns=self.numeric_fields).fillna(0).values.astype(np.float32)
+        if self.numeric_mean is None:
+            self.numeric_mean = values.mean(axis=0)
+            scale = values.std(axis=0)
+            self.numeric_scale = np.where(scale > 0, scale, 1).astype(np.float32)
+        return (values - self.numeric_mean) / self.numeric_scale
+
+    def idf(self):
+        """Smoothed inverse document frequency, as in scikit-learn's TfidfTransformer"""
+        n_documents = self.term_counts.shape[0]
+        return (np.log((1 + n_documents) / (1 + self.document_frequency)) + 1).astype(np.float32)
+
+    def fit_transform(self, products_df):
+        self.vocabulary, self.categories = {}, {}
+        self.numeric_mean = None
+        self.term_counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.category_codes = np.zeros(0, dtype=np.int64)
+        self.numerics = np.zeros((0, len(self.numeric_fields)), dtype=np.float32)
+        return self.add_products(products_df)
+
+    def add_products(self, products_df):
+        """Append products and return the feature matrix of the whole catalogue"""
+        counts = self._count_terms(self._documents(products_df))
+        n_terms = len(self.vocabulary)
+
+        self.term_counts.resize((self.term_counts.shape[0], n_terms))
+        self.term_counts = sparse.vstack([self.term_counts, counts], format='csr')
+        self.document_frequency = np.concatenate([
+            self.document_frequency, np.zeros(n_terms - len(self.document_frequency), dtype=np.int64)
+        ]) + np.bincount(counts.indices, minlength=n_terms)
+
+        self.category_codes = np.concatenate([self.category_codes, self._encode_categories(products_df)])
+        self.numerics = np.vstack([self.numerics, self._scaled_numerics(products_df)])
+        return self.features()
+
+    def update_products(self, rows, products_df):
+        """Recompute the features of existing rows in place and return the whole feature matrix"""
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = self._count_terms(self._documents(products_df))
+        n_rows, n_terms = self.term_counts.shape[0], len(self.vocabulary)
+
+        self.term_counts.resize((n_rows, n_terms))
+        document_frequency = np.concatenate([
+            self.document_frequency, np.zeros(n_terms - len(self.document_frequency), dtype=np.int64)
+        ])
+        self.document_frequency = (document_frequency - np.bincount(self.term_counts[rows].indices, minlength=n_terms)
+                                   + np.bincount(counts.indices, minlength=n_terms))
+
+        # Zero the old rows, then scatter the new counts into them
+        keep = np.ones(n_rows, dtype=np.float32)
+        keep[rows] = 0
+        scatter = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, np.arange(len(rows)))),
+                                    shape=(n_rows, len(rows)))
+        self.term_counts = (sparse.diags(keep) @ self.term_counts + scatter @ counts).tocsr()
+        self.term_counts.eliminate_zeros()
+
+        self.category_codes[rows] = self._encode_categories(products_df)
+        self.numerics[rows] = self._scaled_numerics(products_df)
+        return self.features()
+
+    def features(self):
+        text_weight, category_weight, numeric_weight = self.weights
+        n_rows = self.term_counts.shape[0]
+
+        if self.vocabulary:
+            tfidf = normalize(self.term_counts @ sparse.diags(self.idf()))
+        else:
+            tfidf = sparse.csr_matrix((n_rows, 0), dtype=np.float32)
+        one_hot = sparse.csr_matrix(
+            (np.ones(n_rows, dtype=np.float32), (np.arange(n_rows), self.category_codes)),
+            shape=(n_rows, len(self.categories))
+        )
+        return sparse.hstack([
+            tfidf * text_weight,
+            one_hot * category_weight,
+            sparse.csr_matrix(self.numerics) * (numeric_weight / np.sqrt(max(len(self.numeric_fields), 1)))
+        ], format='csr', dtype=np.float32)
+
+    def feature_names(self):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        categories = sorted(self.categories, key=self.categories.get)
+        return ([f'text:{t}' for t in terms] + [f'category:{c}' for c in categories]
+                + list(self.numeric_fields))
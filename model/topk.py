@@ -0,0 +1,87 @@
+# topk.py
+import numpy as np
+
+def top_k_indices(scores, k, exclude=None):
+    """Positions of the k largest scores, best first
+
+    Selects with argpartition in O(n) and sorts only the winners, so the
+    cost is O(n + k log k) instead of a full O(n log n) argsort. `exclude`
+    (positions or a boolean mask, e.g. items already interacted with) is
+    honoured by selecting k + len(exclude) and dropping those afterwards,
+    so the score vector is neither copied nor modified. -inf and NaN
+    scores are never returned. Ties keep the lower position first, also
+    across the cut: of a group tied at the k-th score, the lowest
+    positions are kept, whichever ones argpartition happened to pick.
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if exclude is None:
+        exclude = np.empty(0, dtype=np.intp)
+    else:
+        exclude = np.asarray(exclude)
+        if exclude.dtype == bool:
+            exclude = np.flatnonzero(exclude)
+
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    wanted = min(k + len(exclude), n)
+    while True:
+        if wanted < n:
+            top = np.argpartition(scores, n - wanted)[n - wanted:]
+        else:
+            top = np.arange(n)
+        if len(exclude):
+            top = top[~np.isin(top, exclude)]
+        valid = scores[top] > -np.inf  # Also drops NaN
+        # NaN sorts above every number, so widen the selection if any took a slot
+        n_nan = np.count_nonzero(np.isnan(scores[top[~valid]]))
+        top = top[valid]
+        if len(top) >= k or n_nan == 0 or wanted == n:
+            break
+        wanted = min(wanted + n_nan, n)
+
+    if len(top) >= k:
+        kth = np.partition(scores[top], len(top) - k)[len(top) - k]
+        above = top[scores[top] > kth]
+        tied = np.flatnonzero(scores == kth)
+        if len(exclude):
+            tied = tied[~np.isin(tied, exclude)]
+        top = np.concatenate([above, tied[:k - len(above)]])
+    top = top[np.lexsort((top, -scores[top]))]
+    return top[:k]
+
+def top_k_items(scored_items, k):
+    """The k (item, score) pairs with the highest scores from a dict, best first"""
+    items = list(scored_items)
+    scores = np.fromiter(scored_items.values(), dtype=np.float64, count=len(items))
+    return [(items[i], scores[i].item()) for i in top_k_indices(scores, k)]
+
+def top_k_rows(scores, k):
+    """top_k_indices for every row of a 2-D score matrix at once
+
+    One partition over the whole block instead of a call per row.
+    Returns an (n_rows, k) array, best first; rows with fewer than k
+    finite scores, or all rows when there are fewer than k columns, are
+    padded with -1. Ties keep the lower position first, also across the
+    cut, as in top_k_indices.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n_rows, n = scores.shape
+    width, k = max(k, 0), max(min(k, n), 0)
+    clean = np.where(np.isnan(scores), -np.inf, scores)
+    if k == 0:
+        return np.full((n_rows, width), -1, dtype=np.intp)
+    # Everything above each row's k-th score, then the lowest positions of the tied group
+    kth = -np.partition(-clean, k - 1, axis=1)[:, k - 1:k]
+    above = clean > kth
+    tied = clean == kth
+    selected = above | (tied & (np.cumsum(tied, axis=1) <= k - above.sum(axis=1, keepdims=True)))
+    top = np.nonzero(selected)[1].reshape(n_rows, k)
+    top_scores = np.take_along_axis(clean, top, axis=1)
+    order = np.lexsort((top, -top_scores))
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    top = np.where(top_scores > -np.inf, top, -1)
+    # Fewer than k columns to choose from: pad to k like rows with too few finite scores
+    return np.pad(top, ((0, 0), (0, width - k)), constant_values=-1)
@@ -0,0 +1,134 @@
+# two_stage.py
+import time
+import numpy as np
+import pandas as pd
+from topk import top_k_indices
+
+DEFAULT_RERANK_WEIGHTS = {'collab': 0.4, 'urgency': 0.3, 'preference': 0.2, 'popularity': 0.1}
+# Milliseconds allowed per stage; candidate generators past the budget are skipped
+DEFAULT_BUDGETS_MS = {'candidates': 20.0, 'rerank': 10.0, 'hydrate': 10.0}
+
+def normalized(values):
+    values = np.where(np.isfinite(values), values, 0.0)
+    top = values.max() if len(values) else 0.0
+    return values / top if top > 0 else np.zeros_like(values)
+
+class TwoStageRecommender:
+    """Candidate generation followed by a vectorized re-ranker
+
+    Stage 1 asks a few cheap generators (collaborative neighbours, the
+    per-category urgency ranking and global popularity) for at most
+    `per_generator` products each. Stage 2 scores only the union of those
+    candidates as arrays and stage 3 hydrates the top k rows. Every stage
+    is timed; generators are skipped once the candidate stage has used
+    its budget and any other stage that overruns is reported.
+    """
+
+    def __init__(self, system, per_generator=50, weights=None, budgets_ms=None, urgency_threshold=14):
+        self.system = system
+        self.per_generator = per_generator
+        self.weights = {**DEFAULT_RERANK_WEIGHTS, **(weights or {})}
+        self.budgets_ms = {**DEFAULT_BUDGETS_MS, **(budgets_ms or {})}
+        self.urgency_threshold = urgency_threshold
+
+        store = system.product_store
+        self.store = store
+        self.combined_score = store.column('combined_score')
+        self.category_codes = store.category_codes
+        self.in_stock = store.column('stock') > 0
+
+        collab = system.collaborative_filter
+        self.collab_positions = store.rows(collab.products.ids)
+        # Weighted interaction totals, on the same rows as products
+        totals = np.asarray(collab.interaction_matrix.sum(axis=0)).ravel()
+        self.popularity = np.zeros(len(store))
+        known = self.collab_positions >= 0
+        self.popularity[self.collab_positions[known]] = totals[known]
+        self.popular = top_k_indices(np.where(self.in_stock, self.popularity, -np.inf), per_generator)
+
+        self.generators = [
+            ('collaborative', self._collaborative_candidates),
+            ('category_urgency', self._urgency_candidates),
+            ('popularity', lambda context: self.popular)
+        ]
+
+    def _collaborative_candidates(self, context):
+        backend = self.system.config['collaborative_backend']
+        scores = self.system.collaborative_filter.score_items(context['user_id'], backend)
+        if scores is None:
+            return np.array([], dtype=int)
+        top = top_k_indices(scores, self.per_generator)
+        positions = self.collab_positions[top]
+        known = positions >= 0
+        context['collab_rows'] = pd.Index(positions[known])
+        context['collab_scores'] = scores[top][known]
+        return positions[known]
+
+    def _urgency_candidates(self, context):
+        content_filter = self.system.content_filter
+        product_ids = content_filter.recommend_by_category_urgency(
+            context['preferences'], self.per_generator, self.urgency_threshold
+        )
+        return self.store.rows(product_ids)
+
+    def rerank(self, candidates, context):
+        """Score candidate rows as arrays; returns (rows, scores) best first"""
+        candidates = candidates[self.in_stock[candidates]]
+        # get_indexer gives -1 for candidates without a collaborative score, which picks the trailing 0
+        found = context['collab_rows'].get_indexer(candidates)
+        collab = np.append(context['collab_scores'], 0.0)[found]
+        preferred = np.isin(self.category_codes[candidates], context['preference_codes']).astype(float)
+
+        weights = self.weights
+        scores = (weights['collab'] * normalized(collab)
+                  + weights['urgency'] * normalized(self.combined_score[candidates])
+                  + weights['preference'] * preferred
+                  + weights['popularity'] * normalized(self.popularity[candidates]))
+        order = top_k_indices(scores, len(scores))
+        return candidates[order], scores[order]
+
+    def recommend(self, user_id, top_k=10):
+        """Return (recommendations DataFrame, stage report)"""
+        started = time.perf_counter()
+        report = {'candidates': {}, 'skipped': [], 'over_budget': []}
+        context = {'user_id': user_id, 'collab_rows': pd.Index([], dtype=int), 'collab_scores': np.zeros(0),
+                   'preferences': self.system.get_user_preferences(user_id)}
+        context['preference_codes'] = self.store.codes_for(context['preferences'])
+
+        # Stage 1: bounded candidate sets
+        stage_start = time.perf_counter()
+        pools = []
+        for name, generator in self.generators:
+            # The first generator always runs so a tight budget still returns something
+            if pools and (time.perf_counter() - stage_start) * 1000 > self.budgets_ms['candidates']:
+                report['skipped'].append(name)
+                continue
+            generator_start = time.perf_counter()
+            positions = np.asarray(generator(context), dtype=int)
+            positions = positions[positions >= 0]
+            pools.append(positions)
+            report['candidates'][name] = {'count': len(positions),
+                                          'ms': (time.perf_counter() - generator_start) * 1000}
+        candidates = np.unique(np.concatenate(pools)) if pools else np.array([], dtype=int)
+        self._close_stage(report, 'candidates', stage_start)
+        report['candidate_count'] = len(candidates)
+
+        # Stage 2: vectorized re-ranking of the candidates only
+        stage_start = time.perf_counter()
+        rows, scores = self.rerank(candidates, context)
+        rows, scores = rows[:top_k], scores[:top_k]
+        self._close_stage(report, 'rerank', stage_start)
+
+        # Stage 3: hydrate the winners
+        stage_start = time.perf_counter()
+        result_df = self.store.hydrate(rows, recommendation_score=scores)
+        self._close_stage(report, 'hydrate', stage_start)
+
+        report['total_ms'] = (time.perf_counter() - started) * 1000
+        return result_df, report
+
+    def _close_stage(self, report, stage, stage_start):
+        elapsed = (time.perf_counter() - stage_start) * 1000
+        report[f'{stage}_ms'] = elapsed
+        if elapsed > self.budgets_ms[stage]:
+            report['over_budget'].append(stage)
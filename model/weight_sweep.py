@@ -0,0 +1,179 @@
+# weight_sweep.py
+import json
+import time
+from datetime import datetime
+import numpy as np
+from evaluation import encode_items, make_splits, map_shards, relevant_test_users, summarize_metrics
+from recommendation_system import HybridRecommendationSystem, generate_sample_data
+
+COMPONENTS = ['collab', 'content', 'urgency']
+# Per-request work timed during precomputation; preferences feed both content and urgency
+STAGES = ['collab', 'preferences', 'content', 'urgency']
+
+def weight_grid(step=0.1):
+    """Every collab/content/urgency weighting on a grid of `step` that sums to 1 (66 at 0.1)"""
+    n = int(round(1 / step))
+    return [{'collab': round(i / n, 6), 'content': round(j / n, 6), 'urgency': round((n - i - j) / n, 6)}
+            for i in range(n + 1) for j in range(n + 1 - i)]
+
+def random_weights(n, seed=42):
+    """n weightings drawn uniformly from the simplex"""
+    samples = np.random.default_rng(seed).dirichlet(np.ones(len(COMPONENTS)), n)
+    return [dict(zip(COMPONENTS, np.round(sample, 6).tolist())) for sample in samples]
+
+def pareto_front(results, quality='avg_ndcg', latency='p95_ms'):
+    """Results no other result beats on both quality (higher) and latency (lower), fastest first"""
+    ranked = sorted(results, key=lambda result: (result['latency'][latency], -result[quality]))
+    front, best = [], -np.inf
+    for result in ranked:
+        if result[quality] > best:
+            front.append(result)
+            best = result[quality]
+    return front
+
+def _component_shard(system, shard):
+    """Candidate lists of every hybrid component for a shard of users, with per-stage timings"""
+    user_ids, k = shard
+    candidates, timings = [], np.zeros((len(user_ids), len(STAGES)))
+    for i, user_id in enumerate(user_ids):
+        marks = [time.perf_counter()]
+        try:
+            collab = system.collaborative_candidates(user_id, k)
+        except Exception:
+            collab = []
+        marks.append(time.perf_counter())
+        user_prefs = system.get_user_preferences(user_id)
+        marks.append(time.perf_counter())
+        content = system.content_filter.recommend_by_category_urgency(user_prefs, k) if user_prefs else []
+        marks.append(time.perf_counter())
+        urgency = system.content_filter.recommend_by_category_urgency(user_prefs, k, urgency_threshold=14)
+        marks.append(time.perf_counter())
+        timings[i] = np.diff(marks)
+        candidates.append((collab, content, urgency))
+    return candidates, timings
+
+def _score_shard(sweep, weight_sets):
+    return [sweep.score(weights) for weights in weight_sets]
+
+class HybridWeightSweep:
+    """Evaluate many recommend_hybrid weightings from one pass over the users
+
+    Every component (collaborative, content, urgency) is run once per
+    user and its candidates are stored as a (users x candidates x 3)
+    position tensor. A weighting is then scored for the whole population
+    with array operations: membership x weights gives the blended score,
+    a lexsort on (score, insertion order) reproduces score_hybrid's
+    ranking, and the metrics come from summarize_metrics. A component with
+    a zero weight is skipped, as in score_hybrid, and its measured time
+    is left out of the latency estimate, so the sweep can trade quality
+    for latency. Latencies are the component stages only (no blending or
+    hydration) and are most faithful when precomputed with one worker.
+    """
+
+    def __init__(self, system, train_df, test_df, k=5, n_workers=None, shard_size=500):
+        self.k = k
+        self.n_workers = n_workers
+        relevant_df, self.user_ids = relevant_test_users(train_df, test_df)
+        shards = [(self.user_ids[start:start + shard_size], k) for start in range(0, len(self.user_ids), shard_size)]
+        parts = map_shards(_component_shard, system, shards, n_workers)
+        candidates = [user_candidates for part in parts for user_candidates in part[0]]
+        self.timings = np.vstack([part[1] for part in parts]) if parts else np.zeros((0, len(STAGES)))
+
+        # Candidates of each user in the order score_hybrid inserts them into its dict
+        unions = [list(dict.fromkeys(collab + content + urgency)) for collab, content, urgency in candidates]
+        self.width = max([k] + [len(union) for union in unions])
+        fallback = system.content_filter.recommend_by_category_urgency([], k)
+        codes, self.relevant, self.popularity = encode_items(
+            [item for union in unions for item in union] + fallback, self.user_ids, train_df, relevant_df,
+            system.product_store.column('productId'))
+        self.catalogue_size = len(system.product_store)
+        self.fallback_codes = codes[len(codes) - len(fallback):]
+
+        # positions[u, c, j]: rank of candidate c in component j's list for user u, width if absent
+        self.candidate_codes = np.full((len(unions), self.width), -1, dtype=np.int64)
+        self.positions = np.full((len(unions), self.width, len(COMPONENTS)), self.width, dtype=np.int64)
+        offset = 0
+        for u, (union, lists) in enumerate(zip(unions, candidates)):
+            self.candidate_codes[u, :len(union)] = codes[offset:offset + len(union)]
+            offset += len(union)
+            column = {item: c for c, item in enumerate(union)}
+            for j, items in enumerate(lists):
+                for rank, item in enumerate(items):
+                    self.positions[u, column[item], j] = min(rank, self.positions[u, column[item], j])
+        self.membership = self.positions < self.width
+
+    def score(self, weights):
+        """Metrics and estimated per-request latency of one weighting"""
+        w = np.array([weights[component] for component in COMPONENTS], dtype=np.float64)
+        present = self.membership & (w != 0)
+        candidate = present.any(axis=2)
+        scores = np.where(candidate, (present * w).sum(axis=2), -np.inf)
+
+        # Ties go to the earlier insertion: first used component holding the item, then its rank there
+        n_components = len(COMPONENTS)
+        insertion = np.where(present, np.arange(n_components) * self.width + self.positions,
+                             n_components * self.width).min(axis=2)
+        top = np.lexsort((insertion, -scores))[:, :self.k]
+        recommended = np.where(np.take_along_axis(candidate, top, axis=1),
+                               np.take_along_axis(self.candidate_codes, top, axis=1), -1)
+        # Users none of the used components had anything for get the most urgent items
+        empty = ~candidate.any(axis=1)
+        recommended[empty] = -1
+        recommended[np.ix_(empty, np.arange(len(self.fallback_codes)))] = self.fallback_codes
+
+        result = {'weights': dict(weights),
+                  **summarize_metrics(recommended, self.relevant, self.popularity, self.catalogue_size)}
+        stages = np.array([w[0] != 0, w[1] != 0 or w[2] != 0, w[1] != 0, w[2] != 0], dtype=np.float64)
+        ms = self.timings @ stages * 1000
+        result['latency'] = {'mean_ms': float(ms.mean()) if len(ms) else 0.0,
+                             'p50_ms': float(np.percentile(ms, 50)) if len(ms) else 0.0,
+                             'p95_ms': float(np.percentile(ms, 95)) if len(ms) else 0.0}
+        return result
+
+    def evaluate(self, weight_sets, shard_size=50):
+        """score() for every weighting, sharded over forked worker processes"""
+        shards = [weight_sets[start:start + shard_size] for start in range(0, len(weight_sets), shard_size)]
+        return [result for part in map_shards(_score_shard, self, shards, self.n_workers) for result in part]
+
+def run_sweep(products_df=None, interactions_df=None, step=0.1, n_random=0, k=5, split='temporal',
+              quality='avg_ndcg', config=None, n_workers=None, output='weight_sweep.json'):
+    """Grid (and optionally random) search of hybrid weights; writes a JSON report with the Pareto front"""
+    if products_df is None or interactions_df is None:
+        products_df, interactions_df = generate_sample_data()
+    train_df, test_df = make_splits(interactions_df, split)[0]
+    system = HybridRecommendationSystem(products_df, train_df, config=config)
+
+    start = time.perf_counter()
+    sweep = HybridWeightSweep(system, train_df, test_df, k, n_workers)
+    precompute_seconds = time.perf_counter() - start
+    weight_sets = weight_grid(step) + (random_weights(n_random) if n_random else [])
+    start = time.perf_counter()
+    results = sweep.evaluate(weight_sets)
+    sweep_seconds = time.perf_counter() - start
+
+    front = pareto_front(results, quality)
+    print(f"🔄 {len(results)} weightings over {len(sweep.user_ids):,} users: precompute "
+          f"{precompute_seconds:.2f}s, sweep {sweep_seconds:.2f}s")
+    for result in front:
+        print(f"📊 {result['weights']}  {quality} {result[quality]:.4f}  p95 {result['latency']['p95_ms']:.2f}ms")
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'split': split,
+        'k': k,
+        'quality_metric': quality,
+        'users': len(sweep.user_ids),
+        'precompute_seconds': precompute_seconds,
+        'sweep_seconds': sweep_seconds,
+        'results': results,
+        'pareto_front': front,
+        'best': max(results, key=lambda result: result[quality]) if results else None
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report saved to {output}")
+    return report
+
+if __name__ == '__main__':
+    run_sweep()